@@ -1,11 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import csv
 import datetime as dt
+import functools
+import json
+import math
+import struct
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Callable, Iterable
+from typing import Awaitable, Optional, Callable, Iterable
 
-from fastapi import FastAPI, HTTPException
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 app = FastAPI()
@@ -23,33 +35,50 @@ CONDITION_MAP = {
 
 
 # ---------- Pydantic Schemas ----------
-class ExperimentStart(BaseModel):
+class Idempotent(BaseModel):
+    """api_client 送出的紀錄類請求都帶 client_id（每個 client 行程一個）與遞增的 seq，供去重。"""
+
+    client_id: Optional[str] = None
+    seq: Optional[int] = Field(None, ge=0)
+
+
+class ExperimentStart(Idempotent):
     user_id: int
     condition: int
     total_rounds: int = 3
     notes: str = ""
     exp_start_time: Optional[str] = None  # ISO string; if None, use now
+    audio_buffer: Optional[int] = None  # mixer buffer（樣本數）
+    audio_latency_ms: Optional[float] = None  # 啟動時量測的提示音延遲
+    clock_offset_ns: Optional[int] = None  # client session 時鐘 -> server 時鐘的 offset
+    clock_rtt_ms: Optional[float] = None  # 該次時鐘同步的 RTT
+    telemetry: Optional[str] = None  # 事件取樣設定，例如 "level=standard;ball_spawn=5/10"
 
 
-class ExperimentEnd(BaseModel):
+class ExperimentEnd(Idempotent):
     user_id: int
     condition: int
     exp_start_time: Optional[str] = None  # send back the original start or leave None
     exp_end_time: Optional[str] = None  # if None, use now
     total_rounds: Optional[int] = None
     notes: str = ""
+    telemetry_dropped: Optional[str] = None  # 各 event_type 被取樣設定擋下的數量
+    # 時鐘同步在 client 背景進行，開始時可能還沒有 offset：結束時補上最後一次的結果
+    clock_offset_ns: Optional[int] = None
+    clock_rtt_ms: Optional[float] = None
 
 
-class RoundStart(BaseModel):
+class RoundStart(Idempotent):
     user_id: int
     condition: int
     round_id: int
     agent_active: bool = False
     human_active: bool = False
     round_start_time: Optional[str] = None  # ISO
+    client_ns: Optional[int] = None  # client session 單調時鐘（奈秒）
 
 
-class RoundEnd(BaseModel):
+class RoundEnd(Idempotent):
     user_id: int
     condition: int
     round_id: int
@@ -64,9 +93,10 @@ class RoundEnd(BaseModel):
     ball_miss: int = 0
     agent_active: bool = False
     human_active: bool = False
+    client_ns: Optional[int] = None  # client session 單調時鐘（奈秒），回合結束的時間
 
 
-class EventLog(BaseModel):
+class EventLog(Idempotent):
     user_id: int
     condition: int
     round_id: int
@@ -83,6 +113,75 @@ class EventLog(BaseModel):
     dir_ratio: Optional[float] = None
     ball_speed: Optional[float] = None
     ball_angle: Optional[float] = None
+    ball_id: Optional[int] = None  # 多球模式下的球編號
+    client_ns: Optional[int] = None  # client session 單調時鐘（奈秒），事件發生的時間
+    clock_offset_ns: Optional[int] = None  # 送出時 client 使用的時鐘 offset
+    # 同一時鐘上實際送出（每次重試重新蓋）的時間；與 client_ns 的差是 client 端排隊 / 重試的時間
+    client_send_ns: Optional[int] = None
+    round_ms: Optional[float] = None  # 回合內的遊戲時間（毫秒，不含暫停）
+
+
+class ClockSyncRequest(BaseModel):
+    client_ns: int
+
+
+class RoundProfile(Idempotent):
+    user_id: int
+    condition: int
+    round_id: int
+    frames: int = 0
+    mean_frame_ms: float = 0.0
+    p50_frame_ms: float = 0.0
+    p95_frame_ms: float = 0.0
+    p99_frame_ms: float = 0.0
+    max_frame_ms: float = 0.0
+    missed_deadlines: int = 0
+    events_ms: float = 0.0
+    update_ms: float = 0.0
+    collisions_ms: float = 0.0
+    api_ms: float = 0.0
+    draw_ms: float = 0.0
+    flip_ms: float = 0.0
+    audio_cues: int = 0
+    audio_start_ms: float = 0.0  # 提示音觸發到開始播放的平均時間
+
+
+class AgentState(BaseModel):
+    """代理決策用的狀態快照（座標為遊戲視窗像素，速度為 px / frame）。"""
+
+    station_id: str  # 每台遊戲電腦 / 每個 process 一個 id
+    seq: int  # 同一 station 遞增；較舊的 seq 視為過期請求
+    ball_x: float
+    ball_y: float
+    ball_vx: float
+    ball_vy: float
+    agent_x: float
+    agent_y: float
+    width: int = 1280
+    height: int = 720
+    paddle_h: int = 20
+    ball_r: int = 10
+    home_ratio: float = 0.75
+    client_stale: int = 0  # client 端累計使用過期 / 備援決策的 frame 數
+
+
+class NetSample(BaseModel):
+    """區網雙人模式：server 每個 tick、每位玩家一筆網路狀態。"""
+
+    round_id: int
+    tick: int
+    player: int  # 0 = 人類 paddle、1 = 第二位玩家（代理 paddle 位置）
+    rtt_ms: float
+    jitter_ms: float
+    input_queue: int  # server 端等待處理的輸入數
+    pred_err_px: float  # client 預測與 server 狀態的差距
+    snapshot_bytes: int  # 最近一個送給該玩家的 snapshot 大小
+
+
+class NetStats(Idempotent):
+    user_id: int
+    condition: int
+    samples: list[NetSample]
 
 
 # ---------- Helpers ----------
@@ -96,12 +195,36 @@ def ensure_dir(user_id: int, condition: int) -> Path:
     return path
 
 
+# 本次執行中已確認 header 為最新的檔案，避免每筆事件都重讀檔頭
+_HEADER_CHECKED: set[Path] = set()
+
+
 def ensure_csv(file_path: Path, header: list[str]) -> None:
     if not file_path.exists():
         file_path.parent.mkdir(parents=True, exist_ok=True)
         with file_path.open("w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(header)
+        _HEADER_CHECKED.add(file_path)
+        return
+    if file_path not in _HEADER_CHECKED:
+        upgrade_header(file_path, header)
+        _HEADER_CHECKED.add(file_path)
+
+
+def upgrade_header(file_path: Path, header: list[str]) -> None:
+    """舊檔案的欄位是新 header 的前綴時（新版加了欄位），補上新欄位並把舊列補 NA。"""
+    with file_path.open("r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        old_header = next(reader, [])
+        if old_header == header or old_header != header[: len(old_header)]:
+            return
+        rows = list(reader)
+    pad = ["NA"] * (len(header) - len(old_header))
+    with file_path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(row + pad for row in rows)
 
 
 def append_row(file_path: Path, row: Iterable) -> None:
@@ -137,10 +260,641 @@ def update_row(
     return updated
 
 
+def append_chunk(file_path: Path, data: bytes) -> None:
+    """附加一個二進位 chunk，前綴 <I> 長度（與 game/trajectory.py 的 iter_file_chunks 對應）。"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with file_path.open("ab") as f:
+        f.write(struct.pack("<I", len(data)))
+        f.write(data)
+
+
+def decide_batch(states: list[AgentState]) -> np.ndarray:
+    """向量化的攔截策略（與 game/physics.predict_crossing + InterceptPolicy 相同）。
+
+    回傳 shape (n, 2) 的目標位置（paddle 中心）。
+    """
+    arr = np.array(
+        [(s.ball_x, s.ball_y, s.ball_vx, s.ball_vy, s.width, s.height, s.paddle_h, s.ball_r, s.home_ratio) for s in states],
+        dtype=np.float64,
+    )
+    bx, by, vx, vy, width, height, paddle_h, r, home_ratio = arr.T
+    home_y = height * home_ratio + paddle_h / 2
+    line_y = home_y - paddle_h / 2 - r
+    down = vy > 0
+    # 碰牆反彈方向隨機，只預測到第一次碰牆：往下到線為止、往上到頂部為止
+    dist = np.where(down, line_y - by, np.maximum(by - r, 0.0))
+    valid = (vy != 0) & ~(down & (by > line_y))
+    t = np.where(valid, dist / np.where(vy == 0, 1.0, np.abs(vy)), 0.0)
+    # 先碰到側牆時停在碰牆點
+    side = np.where(vx > 0, width - r - bx, bx - r)
+    t_side = np.where(vx == 0, np.inf, np.maximum(side, 0.0) / np.where(vx == 0, 1.0, np.abs(vx)))
+    t = np.minimum(t, t_side)
+    return np.column_stack((np.where(valid, bx + vx * t, bx), home_y))
+
+
+class AgentBatcher:
+    """跨 session 的微批次：同一時間窗內到達的請求合併成一次向量化計算。
+
+    第一個請求到達時排程 window_s 後 flush；累積到 max_batch 則立刻 flush。
+    全部在 event loop 上執行，不需要鎖。
+    """
+
+    def __init__(self, window_s: float = 0.002, max_batch: int = 256, history: int = 10000) -> None:
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.pending: list[tuple[AgentState, asyncio.Future, float]] = []
+        self._handle: Optional[asyncio.Handle] = None
+        self.latency_ms: deque = deque(maxlen=history)
+        self.last_seq: dict[str, int] = {}
+        self.client_stale: dict[str, int] = {}
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.stale_requests = 0
+
+    async def submit(self, state: AgentState) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.requests += 1
+        last = self.last_seq.get(state.station_id)
+        if last is not None and state.seq <= last:
+            self.stale_requests += 1  # 亂序到達：仍回覆，但 client 會丟棄
+        else:
+            self.last_seq[state.station_id] = state.seq
+        self.client_stale[state.station_id] = state.client_stale
+        self.pending.append((state, future, time.perf_counter()))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self._handle is None:
+            # window_s = 0：在本輪 event loop 已就緒的請求都處理完後 flush（負載越高批次越大）
+            if self.window_s > 0:
+                self._handle = loop.call_later(self.window_s, self.flush)
+            else:
+                self._handle = loop.call_soon(self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            targets = decide_batch([state for state, _, _ in batch])
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        done = time.perf_counter()
+        for (state, future, t0), (tx, ty) in zip(batch, targets.tolist()):
+            server_ms = (done - t0) * 1000
+            self.latency_ms.append(server_ms)
+            if not future.done():
+                future.set_result(
+                    {
+                        "seq": state.seq,
+                        "target_x": tx,
+                        "target_y": ty,
+                        "batch_size": len(batch),
+                        "server_ms": round(server_ms, 3),
+                    }
+                )
+
+    def stats(self) -> dict:
+        lat = np.fromiter(self.latency_ms, dtype=np.float64)
+        p50, p99 = np.percentile(lat, [50, 99]) if lat.size else (0.0, 0.0)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "p50_server_ms": round(float(p50), 3),
+            "p99_server_ms": round(float(p99), 3),
+            "stations": len(self.last_seq),
+            "stale_requests": self.stale_requests,
+            "client_stale_frames": sum(self.client_stale.values()),
+        }
+
+
+AGENT_BATCHER = AgentBatcher(window_s=0.0)
+
+
+class LiveFeed:
+    """即時監看用的廣播環形緩衝（SSE /live）。
+
+    寫入端（各 endpoint，可能在 threadpool 執行緒）只在鎖內 append 一筆並喚醒正在等待的
+    訂閱者，不做序列化、不等任何訂閱者；每個訂閱者自己記著讀到的 id，從環形緩衝往後讀。
+    讀太慢而被覆蓋的部分直接跳過（送一個 gap 事件告知漏了幾筆），不會拖慢寫入。
+    """
+
+    def __init__(self, size: int = 4096) -> None:
+        self.ring: deque = deque(maxlen=size)  # (id, (condition, user_id), kind, data)
+        self.next_id = 1
+        self._lock = threading.Lock()
+        self._waiters: dict[asyncio.Event, asyncio.AbstractEventLoop] = {}  # 只含正在等待的訂閱者
+        self.subscribers = 0
+
+    def publish(self, condition: int, user_id: int, kind: str, data: dict) -> None:
+        with self._lock:
+            self.ring.append((self.next_id, (condition, user_id), kind, data))
+            self.next_id += 1
+            waiters, self._waiters = self._waiters, {}
+        for event, loop in waiters.items():
+            loop.call_soon_threadsafe(event.set)
+
+    def read(self, after: int, event: asyncio.Event) -> tuple[list, int]:
+        """回傳 (id > after 的項目, 被覆蓋而漏掉的筆數)；沒有新項目時登記 event 等待喚醒。"""
+        with self._lock:
+            if self.next_id - 1 <= after:
+                event.clear()
+                self._waiters[event] = asyncio.get_running_loop()
+                return [], 0
+            first = self.ring[0][0]
+            missed = max(0, first - after - 1)
+            return list(islice(self.ring, max(0, after + 1 - first), None)), missed
+
+    def unsubscribe(self, event: asyncio.Event) -> None:
+        with self._lock:
+            self._waiters.pop(event, None)
+
+    def last_id(self) -> int:
+        return self.next_id - 1
+
+
+LIVE_FEED = LiveFeed()
+LIVE_KEEPALIVE_S = 15.0
+
+
+class RollingCounters:
+    """跨 session 的滾動統計：每個 condition 一組固定大小的時間桶環形計數器。
+
+    第 k 個時間桶放在 slot k % n，epochs 記著 slot 目前屬於哪個桶；寫入時發現是舊桶就先
+    歸零再累加。查詢只看 epochs 落在視窗內的 slot，成本是 O(桶數)，與資料量無關。
+    """
+
+    METRICS = (
+        "ball_spawn",
+        "ball_catch",
+        "ball_miss",
+        "paddle_collision",
+        "human_catch",
+        "agent_catch",
+        "rounds",
+        "round_score",
+        "round_errors",
+    )
+    WINDOWS = {"5m": 300, "15m": 900, "60m": 3600}
+
+    def __init__(self, bucket_s: float = 10.0, horizon_s: float = 3600.0) -> None:
+        self.bucket_s = bucket_s
+        self.n = int(np.ceil(horizon_s / bucket_s))
+        self.index = {name: i for i, name in enumerate(self.METRICS)}
+        self.counts: dict[int, np.ndarray] = {}
+        self.epochs: dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def add(self, condition: int, now: Optional[float] = None, **increments: int) -> None:
+        bucket = int((time.monotonic() if now is None else now) // self.bucket_s)
+        slot = bucket % self.n
+        with self._lock:
+            counts = self.counts.get(condition)
+            if counts is None:
+                counts = self.counts[condition] = np.zeros((self.n, len(self.METRICS)), dtype=np.int64)
+                self.epochs[condition] = np.full(self.n, -1, dtype=np.int64)
+            epochs = self.epochs[condition]
+            if epochs[slot] != bucket:
+                counts[slot] = 0
+                epochs[slot] = bucket
+            for name, value in increments.items():
+                counts[slot, self.index[name]] += value
+
+    def totals(self, condition: int, seconds: float, now: Optional[float] = None) -> dict:
+        bucket = int((time.monotonic() if now is None else now) // self.bucket_s)
+        first = bucket - int(np.ceil(seconds / self.bucket_s)) + 1
+        with self._lock:
+            epochs = self.epochs[condition]
+            sums = self.counts[condition][(epochs >= first) & (epochs <= bucket)].sum(axis=0)
+        return dict(zip(self.METRICS, sums.tolist()))
+
+    def snapshot(self, condition: Optional[int] = None, now: Optional[float] = None) -> dict:
+        now = time.monotonic() if now is None else now
+        conditions = sorted(self.counts) if condition is None else [c for c in [condition] if c in self.counts]
+        out = {}
+        for cond in conditions:
+            entry = {"name": CONDITION_MAP.get(cond, f"cond_{cond}")}
+            for label, seconds in self.WINDOWS.items():
+                entry[label] = rolling_rates(self.totals(cond, seconds, now))
+            out[str(cond)] = entry
+        return {"bucket_s": self.bucket_s, "conditions": out}
+
+
+def rolling_rates(t: dict) -> dict:
+    """計數加上比率：接球 / 漏球 / 碰撞率以已結束的球（接到 + 漏掉）為分母。"""
+    resolved = t["ball_catch"] + t["ball_miss"]
+
+    def ratio(num: int, den: int) -> Optional[float]:
+        return round(num / den, 4) if den else None
+
+    return {
+        **t,
+        "catch_rate": ratio(t["ball_catch"], resolved),
+        "miss_rate": ratio(t["ball_miss"], resolved),
+        "collision_rate": ratio(t["paddle_collision"], resolved),
+        "human_catch_share": ratio(t["human_catch"], t["ball_catch"]),
+        "agent_catch_share": ratio(t["agent_catch"], t["ball_catch"]),
+    }
+
+
+ROLLING = RollingCounters()
+
+
+class DuplicateCatches:
+    """單球模式中人類與代理同一 tick 接到球時 client 會各送一筆 ball_catch，只有人類那次得分
+    （game/main.py 的 check_collisions）。記住每個 session 最近一筆事件是否為人類接球：緊接其後、
+    同回合同位置、沒有 ball_id 的代理接球視為重複，不計入 ROLLING（規則同 viewer 的 _duplicate_catch）。
+    """
+
+    def __init__(self, max_sessions: int = 4096) -> None:
+        self.max_sessions = max_sessions
+        self.last_human: OrderedDict = OrderedDict()  # (user_id, condition) -> (round_id, ball_x, ball_y)
+        self._lock = threading.Lock()
+
+    def check(self, ev: EventLog) -> bool:
+        """記錄這筆事件；是重複的代理接球時回傳 True。"""
+        key = (ev.user_id, ev.condition)
+        mark = (ev.round_id, ev.ball_x, ev.ball_y)
+        with self._lock:
+            prev = self.last_human.pop(key, None)
+            if ev.event_type != "ball_catch":
+                return False
+            if ev.triggered_by == "human":
+                self.last_human[key] = mark
+                if len(self.last_human) > self.max_sessions:
+                    self.last_human.popitem(last=False)
+                return False
+            return ev.triggered_by == "agent" and ev.ball_id is None and prev == mark
+
+
+DUPLICATE_CATCHES = DuplicateCatches()
+
+
+class IngestDedup:
+    """紀錄類請求的去重：每個 (user_id, condition, client_id, endpoint) 串流一個滑動視窗位元圖。
+
+    串流只記最大的 seq 與一個 window 位元的整數（第 i 位 = seq max - i 已收過），
+    與 IPsec 的 anti-replay 視窗相同，記憶體固定，亂序與重送都能判斷。比視窗還舊的
+    seq 無法判斷，照常寫入並計入 outside_window。串流數超過 max_streams 時淘汰最久沒用的。
+    先 claim 再寫檔；寫檔失敗時 release，讓 client 的重試仍能寫入。
+
+    每個 endpoint 各自一條串流：api_client 的 lifecycle 與 bulk 兩條佇列各自編 seq、各自
+    延遲，混在一起的話落後的那條會掉出視窗。window 至少要涵蓋 client 的 outbox
+    （api_client.OUTBOX_SIZE = 10000），重新連線後補送整個 outbox 時才都還在視窗內。
+    比目前最大 seq 超前一整個視窗以上的 seq 先隔離（照常寫入、不前進）：一個錯誤的超大
+    seq 不能把串流推走、讓之後正常的 seq 全部掉出視窗；要再有一個落在它附近的 seq，才承認
+    client 真的跳過了一大段（例如 outbox 滿時丟掉的請求）。
+    """
+
+    def __init__(self, window: int = 16384, max_streams: int = 16384) -> None:
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.max_streams = max_streams
+        self.streams: OrderedDict = OrderedDict()  # key -> [max_seq, bits, 隔離中的 seq]
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.untracked = 0  # 沒帶 client_id / seq 的請求（舊版 client）
+        self.outside_window = 0
+        self.jumps = 0  # 被隔離的超前 seq
+        self.duplicates: Counter = Counter()  # endpoint -> 重複次數
+
+    def claim(self, endpoint: str, key: tuple, seq: Optional[int]) -> bool:
+        """第一次看到這個 seq 回傳 True；重複回傳 False。key = (user_id, condition, client_id)。"""
+        with self._lock:
+            if seq is None or key[-1] is None:
+                self.untracked += 1
+                return True
+            key = (*key, endpoint)
+            state = self.streams.get(key)
+            if state is None:
+                state = self.streams[key] = [seq, 0, None]
+                if len(self.streams) > self.max_streams:
+                    self.streams.popitem(last=False)
+            else:
+                self.streams.move_to_end(key)
+            top, bits, pending = state
+            if seq - top >= self.window:
+                if seq == pending:
+                    self.duplicates[endpoint] += 1
+                    return False
+                if pending is not None and abs(seq - pending) < self.window:
+                    # 第二個落在同一區的 seq：串流確實跳過去了（舊位元全部移出，不必真的位移）
+                    low, high = sorted((seq, pending))
+                    state[:] = [high, 1 | (1 << (high - low)), None]
+                else:
+                    state[2] = seq
+                    self.jumps += 1
+            elif seq > top:
+                state[0], state[1] = seq, ((bits << (seq - top)) | 1) & self.mask
+            elif top - seq >= self.window:
+                self.outside_window += 1
+            elif bits >> (top - seq) & 1:
+                self.duplicates[endpoint] += 1
+                return False
+            else:
+                state[1] = bits | (1 << (top - seq))
+            self.accepted += 1
+            return True
+
+    def release(self, endpoint: str, key: tuple, seq: Optional[int]) -> None:
+        if seq is None or key[-1] is None:
+            return
+        with self._lock:
+            state = self.streams.get((*key, endpoint))
+            if state is None:
+                return
+            if seq == state[2]:
+                state[2] = None
+            elif 0 <= state[0] - seq < self.window:
+                state[1] &= ~(1 << (state[0] - seq))
+
+    def stats(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "untracked": self.untracked,
+            "outside_window": self.outside_window,
+            "jumps": self.jumps,
+            "duplicates": sum(self.duplicates.values()),
+            "duplicates_by_endpoint": dict(self.duplicates),
+            "streams": len(self.streams),
+            "window": self.window,
+        }
+
+
+INGEST_DEDUP = IngestDedup()
+
+
+class AdmissionControl:
+    """紀錄類請求的准入控制：限制同時處理的數量，超過的在有界佇列等待，優先放行生命週期請求。
+
+    同步 endpoint 都在 threadpool（預設 40 條執行緒）執行；大量 /log_event（例如 client 重新連線
+    後補送）若全部放進去，/start_round、/end_round 也得排在後面。這裡最多同時處理 slots 個，
+    其中 bulk 類最多 bulk_slots 個，剩下的名額永遠留給 lifecycle。有名額空出時先叫醒 lifecycle
+    的等待者。佇列滿回 429，等待超過 max_wait_s 回 503，兩者都帶 Retry-After（依目前佇列長度
+    與平均處理時間估計）。等待中 client 斷線就放棄這個請求（不再佔名額處理沒人要的回覆）。
+    全部在 event loop 上執行，不需要鎖。
+
+    max_wait_s 必須明顯短於 client 的逾時（api_client.DEFAULT_TIMEOUT = 1.5 s）：client 要收到
+    帶 Retry-After 的 503 才會退避，自己先逾時的話只會照一般重試馬上再送一次。
+    """
+
+    PRIORITY = ("lifecycle", "bulk")
+
+    def __init__(
+        self,
+        slots: int = 32,
+        bulk_slots: int = 24,
+        queue_limits: Optional[dict] = None,
+        max_wait_s: float = 1.0,
+    ) -> None:
+        self.slots = slots
+        self.bulk_slots = bulk_slots
+        self.queue_limits = queue_limits or {"lifecycle": 64, "bulk": 256}
+        self.max_wait_s = max_wait_s
+        self.in_use = {cls: 0 for cls in self.PRIORITY}
+        self.waiters: dict[str, deque] = {cls: deque() for cls in self.PRIORITY}
+        self.service_s = 0.005  # 每個請求處理時間的 EWMA
+        self.admitted: Counter = Counter()
+        self.queued: Counter = Counter()
+        self.rejected: Counter = Counter()  # (class, status) -> 次數
+        self.abandoned: Counter = Counter()  # 等待中 client 斷線
+        self.max_queue: Counter = Counter()
+
+    def _can_run(self, cls: str) -> bool:
+        if sum(self.in_use.values()) >= self.slots:
+            return False
+        return cls == "lifecycle" or self.in_use["bulk"] < self.bulk_slots
+
+    def _take(self, cls: str) -> None:
+        self.in_use[cls] += 1
+        self.admitted[cls] += 1
+
+    async def acquire(self, cls: str, watch: Optional[Callable[[], Awaitable]] = None) -> Optional[int]:
+        """取得處理名額；回傳 None 表示放行，否則為應回覆的狀態碼（429 / 503），
+        等待中 client 斷線時回傳 CLIENT_CLOSED（不必回覆）。
+
+        watch：排隊時在背景執行、client 斷線時結束的 coroutine function（見 AdmissionMiddleware）。
+        """
+        ahead = self.waiters[cls] if cls == "bulk" else ()
+        if self._can_run(cls) and not self.waiters["lifecycle"] and not ahead:
+            self._take(cls)
+            return None
+        queue = self.waiters[cls]
+        if len(queue) >= self.queue_limits[cls]:
+            self.rejected[(cls, 429)] += 1
+            return 429
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self.queued[cls] += 1
+        self.max_queue[cls] = max(self.max_queue[cls], len(queue))
+        watcher = asyncio.ensure_future(watch()) if watch is not None else None
+        try:
+            waiting = [future] if watcher is None else [future, watcher]
+            await asyncio.wait(waiting, timeout=self.max_wait_s, return_when=asyncio.FIRST_COMPLETED)
+            if watcher is not None and watcher.done():
+                if future.done():
+                    self.release(cls, self.service_s)  # 名額剛好分配到：還回去
+                self.abandoned[cls] += 1
+                return CLIENT_CLOSED
+            if future.done():
+                return None
+            self.rejected[(cls, 503)] += 1
+            return 503
+        except asyncio.CancelledError:
+            # 整個請求被取消：若名額剛好已分配給這個請求，要還回去
+            if future.done() and not future.cancelled():
+                self.release(cls, self.service_s)
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if not future.done():
+                future.cancel()
+            if future.cancelled():
+                try:
+                    queue.remove(future)
+                except ValueError:
+                    pass
+
+    def release(self, cls: str, elapsed_s: float) -> None:
+        self.in_use[cls] -= 1
+        self.service_s += 0.05 * (elapsed_s - self.service_s)
+        for name in self.PRIORITY:
+            queue = self.waiters[name]
+            while queue and self._can_run(name):
+                future = queue.popleft()
+                if not future.done():
+                    self._take(name)
+                    future.set_result(None)
+
+    def retry_after(self, cls: str) -> int:
+        """估計佇列排空所需秒數（至少 1 秒）。"""
+        backlog = len(self.waiters["lifecycle"]) + (len(self.waiters["bulk"]) if cls == "bulk" else 0)
+        slots = self.slots if cls == "lifecycle" else self.bulk_slots
+        return max(1, math.ceil(backlog * self.service_s / slots))
+
+    def stats(self) -> dict:
+        return {
+            "in_use": dict(self.in_use),
+            "waiting": {cls: len(queue) for cls, queue in self.waiters.items()},
+            "admitted": dict(self.admitted),
+            "queued": dict(self.queued),
+            "rejected": {f"{cls}_{status}": n for (cls, status), n in self.rejected.items()},
+            "abandoned": dict(self.abandoned),
+            "max_queue": dict(self.max_queue),
+            "mean_service_ms": round(self.service_s * 1000, 3),
+            "slots": self.slots,
+            "bulk_slots": self.bulk_slots,
+        }
+
+
+CLIENT_CLOSED = 499  # 慣例（nginx）：client 在回覆前就斷線
+ADMISSION = AdmissionControl()
+ADMISSION_CLASSES = {
+    "/start_experiment": "lifecycle",
+    "/end_experiment": "lifecycle",
+    "/start_round": "lifecycle",
+    "/end_round": "lifecycle",
+    "/log_event": "bulk",
+    "/round_profile": "bulk",
+    "/trajectory": "bulk",
+    "/net_stats": "bulk",
+}
+
+
+class AdmissionMiddleware:
+    """純 ASGI middleware：只攔 ADMISSION_CLASSES 中的路徑，其他請求（代理決策、時鐘同步）不受影響。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        cls = ADMISSION_CLASSES.get(scope["path"]) if scope["type"] == "http" else None
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+        # 排隊期間由 watch 讀 receive()：request body 先存起來，放行後再交給 app；
+        # 讀到 http.disconnect 表示 client 已經放棄（例如逾時）
+        buffered: list = []
+
+        async def watch() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                buffered.append(message)
+
+        async def replay():
+            return buffered.pop(0) if buffered else await receive()
+
+        status = await ADMISSION.acquire(cls, watch)
+        if status == CLIENT_CLOSED:
+            return
+        if status is not None:
+            detail = "too many queued requests" if status == 429 else "server overloaded"
+            response = JSONResponse(
+                {"detail": detail, "class": cls},
+                status_code=status,
+                headers={"Retry-After": str(ADMISSION.retry_after(cls))},
+            )
+            await response(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            ADMISSION.release(cls, time.perf_counter() - t0)
+
+
+app.add_middleware(AdmissionMiddleware)
+
+
+def idempotent(endpoint: Callable) -> Callable:
+    """紀錄類 endpoint 的去重包裝：重複的請求不再寫入，直接回覆成功。"""
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        req = args[0] if args else next(iter(kwargs.values()))
+        key = (req.user_id, req.condition, req.client_id)
+        if not INGEST_DEDUP.claim(endpoint.__name__, key, req.seq):
+            return {"status": "ok", "duplicate": True}
+        try:
+            return endpoint(*args, **kwargs)
+        except BaseException:
+            INGEST_DEDUP.release(endpoint.__name__, key, req.seq)
+            raise
+
+    return wrapper
+
+
+def sse_message(event_id: int, kind: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def live_stream(request: Request, key: Optional[tuple[int, int]], after: int):
+    """SSE 產生器：key 為 None 時送出所有 session 的事件。"""
+    event = asyncio.Event()
+    LIVE_FEED.subscribers += 1
+    try:
+        yield f"retry: 2000\n: live feed, last id {LIVE_FEED.last_id()}\n\n"
+        while True:
+            items, missed = LIVE_FEED.read(after, event)
+            if missed:
+                yield sse_message(after + missed, "gap", {"missed": missed})
+            for event_id, item_key, kind, data in items:
+                if key is None or item_key == key:
+                    yield sse_message(event_id, kind, data)
+                after = event_id
+            if items:
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), LIVE_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+    finally:
+        LIVE_FEED.unsubscribe(event)
+        LIVE_FEED.subscribers -= 1
+
+
+def live_response(request: Request, key: Optional[tuple[int, int]], last_event_id: Optional[str]) -> StreamingResponse:
+    # 重新連線時瀏覽器的 EventSource 會帶 Last-Event-ID；沒帶時只送之後的新事件
+    header = request.headers.get("last-event-id") or last_event_id
+    try:
+        after = int(header) if header is not None else LIVE_FEED.last_id()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid Last-Event-ID")
+    if not 0 <= after <= LIVE_FEED.last_id():
+        after = 0  # backend 重啟過（id 從頭編號）：從緩衝中最舊的一筆開始補送
+    return StreamingResponse(
+        live_stream(request, key, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 def now_iso() -> str:
     return dt.datetime.utcnow().isoformat() + "Z"
 
 
+def server_ns() -> int:
+    """server 單調時鐘（奈秒），時鐘同步與單向延遲都以它為準。"""
+    return time.perf_counter_ns()
+
+
 # ---------- Endpoints ----------
 @app.get("/health")
 def health_check():
@@ -148,6 +902,7 @@ def health_check():
 
 
 @app.post("/start_experiment")
+@idempotent
 def start_experiment(req: ExperimentStart):
     exp_start = req.exp_start_time or now_iso()
     dir_path = ensure_dir(req.user_id, req.condition)
@@ -161,6 +916,12 @@ def start_experiment(req: ExperimentStart):
             "exp_end_time",
             "total_rounds",
             "notes",
+            "audio_buffer",
+            "audio_latency_ms",
+            "clock_offset_ns",
+            "clock_rtt_ms",
+            "telemetry",
+            "telemetry_dropped",
         ],
     )
     append_row(
@@ -172,12 +933,25 @@ def start_experiment(req: ExperimentStart):
             "",
             req.total_rounds,
             req.notes,
+            req.audio_buffer if req.audio_buffer is not None else "NA",
+            req.audio_latency_ms if req.audio_latency_ms is not None else "NA",
+            req.clock_offset_ns if req.clock_offset_ns is not None else "NA",
+            req.clock_rtt_ms if req.clock_rtt_ms is not None else "NA",
+            req.telemetry or "NA",
+            "",
         ],
     )
+    LIVE_FEED.publish(
+        req.condition,
+        req.user_id,
+        "experiment_start",
+        {"user_id": req.user_id, "condition": req.condition, "exp_start_time": exp_start, "total_rounds": req.total_rounds},
+    )
     return {"status": "ok", "exp_start_time": exp_start}
 
 
 @app.post("/end_experiment")
+@idempotent
 def end_experiment(req: ExperimentEnd):
     exp_end = req.exp_end_time or now_iso()
     dir_path = ensure_dir(req.user_id, req.condition)
@@ -191,6 +965,12 @@ def end_experiment(req: ExperimentEnd):
             "exp_end_time",
             "total_rounds",
             "notes",
+            "audio_buffer",
+            "audio_latency_ms",
+            "clock_offset_ns",
+            "clock_rtt_ms",
+            "telemetry",
+            "telemetry_dropped",
         ],
     )
 
@@ -209,6 +989,11 @@ def end_experiment(req: ExperimentEnd):
             row["notes"] = req.notes
         if req.exp_start_time:
             row["exp_start_time"] = req.exp_start_time
+        if req.telemetry_dropped is not None:
+            row["telemetry_dropped"] = req.telemetry_dropped
+        if req.clock_offset_ns is not None:
+            row["clock_offset_ns"] = str(req.clock_offset_ns)
+            row["clock_rtt_ms"] = str(req.clock_rtt_ms) if req.clock_rtt_ms is not None else "NA"
         return row
 
     updated = update_row(exp_file, match, updater)
@@ -223,12 +1008,25 @@ def end_experiment(req: ExperimentEnd):
                 exp_end,
                 req.total_rounds or "",
                 req.notes,
+                "NA",
+                "NA",
+                req.clock_offset_ns if req.clock_offset_ns is not None else "NA",
+                req.clock_rtt_ms if req.clock_rtt_ms is not None else "NA",
+                "NA",
+                req.telemetry_dropped if req.telemetry_dropped is not None else "NA",
             ],
         )
+    LIVE_FEED.publish(
+        req.condition,
+        req.user_id,
+        "experiment_end",
+        {"user_id": req.user_id, "condition": req.condition, "exp_end_time": exp_end},
+    )
     return {"status": "ok", "exp_end_time": exp_end}
 
 
 @app.post("/start_round")
+@idempotent
 def start_round(req: RoundStart):
     start_time = req.round_start_time or now_iso()
     dir_path = ensure_dir(req.user_id, req.condition)
@@ -250,6 +1048,8 @@ def start_round(req: RoundStart):
             "signal_sent",
             "ball_catch",
             "ball_miss",
+            "round_start_ns",
+            "round_end_ns",
         ],
     )
     append_row(
@@ -269,12 +1069,16 @@ def start_round(req: RoundStart):
             0,
             0,
             0,
+            req.client_ns if req.client_ns is not None else "NA",
+            "NA",
         ],
     )
+    LIVE_FEED.publish(req.condition, req.user_id, "round_start", {**req.model_dump(), "round_start_time": start_time})
     return {"status": "ok", "round_start_time": start_time}
 
 
 @app.post("/end_round")
+@idempotent
 def end_round(req: RoundEnd):
     end_time = req.round_end_time or now_iso()
     dir_path = ensure_dir(req.user_id, req.condition)
@@ -296,6 +1100,8 @@ def end_round(req: RoundEnd):
             "signal_sent",
             "ball_catch",
             "ball_miss",
+            "round_start_ns",
+            "round_end_ns",
         ],
     )
 
@@ -320,6 +1126,8 @@ def end_round(req: RoundEnd):
         row["ball_miss"] = str(req.ball_miss)
         if req.round_start_time:
             row["round_start_time"] = req.round_start_time
+        if req.client_ns is not None:
+            row["round_end_ns"] = str(req.client_ns)
         return row
 
     updated = update_row(round_file, match, updater)
@@ -341,15 +1149,33 @@ def end_round(req: RoundEnd):
                 req.signal_sent,
                 req.ball_catch,
                 req.ball_miss,
+                "NA",
+                req.client_ns if req.client_ns is not None else "NA",
             ],
         )
 
+    ROLLING.add(req.condition, rounds=1, round_score=req.score, round_errors=req.errors)
+    LIVE_FEED.publish(req.condition, req.user_id, "round_end", {**req.model_dump(), "round_end_time": end_time})
     return {"status": "ok", "round_end_time": end_time}
 
 
+@app.post("/clock_sync")
+async def clock_sync(req: ClockSyncRequest):
+    # async 且不碰檔案：收到與回覆之間不經過 threadpool 排隊，量到的 RTT 才乾淨
+    recv_ns = server_ns()
+    return {"client_ns": req.client_ns, "server_recv_ns": recv_ns, "server_send_ns": server_ns()}
+
+
 @app.post("/log_event")
+@idempotent
 def log_event(ev: EventLog):
+    recv_ns = server_ns()
     ts = ev.timestamp or now_iso()
+    one_way_ms = "NA"
+    # 單向延遲從實際送出算起（舊 client 沒有 client_send_ns 時才用事件時間，會包含排隊時間）
+    sent_ns = ev.client_send_ns if ev.client_send_ns is not None else ev.client_ns
+    if sent_ns is not None and ev.clock_offset_ns is not None:
+        one_way_ms = round((recv_ns - (sent_ns + ev.clock_offset_ns)) / 1e6, 3)
     dir_path = ensure_dir(ev.user_id, ev.condition)
     events_file = dir_path / "events.csv"
     ensure_csv(
@@ -371,6 +1197,13 @@ def log_event(ev: EventLog):
             "dir_ratio",
             "ball_speed",
             "ball_angle",
+            "ball_id",
+            "client_ns",
+            "clock_offset_ns",
+            "server_ns",
+            "one_way_ms",
+            "client_send_ns",
+            "round_ms",
         ],
     )
     append_row(
@@ -392,6 +1225,107 @@ def log_event(ev: EventLog):
             ev.dir_ratio if ev.dir_ratio is not None else "NA",
             ev.ball_speed if ev.ball_speed is not None else "NA",
             ev.ball_angle if ev.ball_angle is not None else "NA",
+            ev.ball_id if ev.ball_id is not None else "NA",
+            ev.client_ns if ev.client_ns is not None else "NA",
+            ev.clock_offset_ns if ev.clock_offset_ns is not None else "NA",
+            recv_ns,
+            one_way_ms,
+            ev.client_send_ns if ev.client_send_ns is not None else "NA",
+            ev.round_ms if ev.round_ms is not None else "NA",
         ],
     )
+    duplicate = DUPLICATE_CATCHES.check(ev)
+    if ev.event_type in ("ball_spawn", "ball_miss", "paddle_collision"):
+        ROLLING.add(ev.condition, **{ev.event_type: 1})
+    elif ev.event_type == "ball_catch" and not duplicate:
+        catcher = f"{ev.triggered_by}_catch"
+        ROLLING.add(ev.condition, ball_catch=1, **({catcher: 1} if catcher in ROLLING.index else {}))
+    LIVE_FEED.publish(ev.condition, ev.user_id, "event", {**ev.model_dump(), "timestamp": ts, "one_way_ms": one_way_ms})
     return {"status": "ok", "timestamp": ts}
+
+
+@app.post("/round_profile")
+@idempotent
+def round_profile(req: RoundProfile):
+    dir_path = ensure_dir(req.user_id, req.condition)
+    profile_file = dir_path / "profile.csv"
+    fields = [name for name in RoundProfile.model_fields if name not in Idempotent.model_fields]
+    ensure_csv(profile_file, ["recorded_time"] + fields)
+    row = req.model_dump()
+    append_row(profile_file, [now_iso()] + [row[name] for name in fields])
+    return {"status": "ok"}
+
+
+TRAJECTORY_MAGIC = (b"TRJ1", b"TRJ2")  # game/trajectory.py 的 LEGACY_MAGIC / MAGIC
+
+
+@app.post("/trajectory")
+async def upload_trajectory(
+    request: Request,
+    user_id: int,
+    condition: int,
+    round_id: int,
+    chunk_index: int,
+    client_id: Optional[str] = None,
+    seq: Optional[int] = Query(None, ge=0),
+):
+    data = await request.body()
+    if not data.startswith(TRAJECTORY_MAGIC):
+        raise HTTPException(status_code=400, detail="not a trajectory chunk")
+    key = (user_id, condition, client_id)
+    if not INGEST_DEDUP.claim("upload_trajectory", key, seq):
+        return {"status": "ok", "duplicate": True, "round_id": round_id, "chunk_index": chunk_index}
+    dir_path = ensure_dir(user_id, condition)
+    traj_file = dir_path / "trajectory" / f"round_{round_id}.trj"
+    try:
+        await run_in_threadpool(append_chunk, traj_file, data)
+    except BaseException:
+        INGEST_DEDUP.release("upload_trajectory", key, seq)
+        raise
+    return {"status": "ok", "round_id": round_id, "chunk_index": chunk_index, "bytes": len(data)}
+
+
+@app.post("/agent/decide")
+async def agent_decide(state: AgentState):
+    return await AGENT_BATCHER.submit(state)
+
+
+@app.get("/agent/stats")
+def agent_stats():
+    return AGENT_BATCHER.stats()
+
+
+@app.get("/live")
+async def live_all(request: Request, last_event_id: Optional[str] = None):
+    return live_response(request, None, last_event_id)
+
+
+@app.get("/live/{condition}/{user_id}")
+async def live_session(request: Request, condition: int, user_id: int, last_event_id: Optional[str] = None):
+    return live_response(request, (condition, user_id), last_event_id)
+
+
+@app.get("/ingest/stats")
+def ingest_stats():
+    return {**INGEST_DEDUP.stats(), "admission": ADMISSION.stats()}
+
+
+@app.get("/stats/rolling")
+def rolling_stats(condition: Optional[int] = None):
+    return ROLLING.snapshot(condition)
+
+
+@app.post("/net_stats")
+@idempotent
+def net_stats(req: NetStats):
+    dir_path = ensure_dir(req.user_id, req.condition)
+    net_file = dir_path / "net.csv"
+    fields = list(NetSample.model_fields)
+    ensure_csv(net_file, ["recorded_time"] + fields)
+    recorded = now_iso()
+    with net_file.open("a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for sample in req.samples:
+            row = sample.model_dump()
+            writer.writerow([recorded] + [row[name] for name in fields])
+    return {"status": "ok", "rows": len(req.samples)}
@@ -0,0 +1,175 @@
+"""代理 paddle 的決策策略。
+
+策略只回傳目標位置（paddle 中心），實際移動速度與工作區域限制仍由
+Game.update_round 處理。各 condition 使用哪個策略由 Game(agent_policies=...) 決定。
+"""
+import os
+import socket
+import threading
+import time
+
+import physics
+
+
+class AgentPolicy:
+    name = "base"
+
+    def reset(self) -> None:
+        """新回合 / 新實驗開始時呼叫。"""
+
+    def target(self, game) -> tuple[float, float]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """策略不再使用時呼叫（釋放背景執行緒等資源）。"""
+
+
+class ChasePolicy(AgentPolicy):
+    """原本的規則：水平追球，垂直追球的位置加上隨機抖動。"""
+
+    name = "chase"
+
+    def target(self, game) -> tuple[float, float]:
+        t = game.tuning
+        jitter = game.rng.uniform(-t["agent_jitter"], t["agent_jitter"])
+        return game.ball_x, game.ball_y + jitter * t["agent_jitter_px"]
+
+
+class InterceptPolicy(AgentPolicy):
+    """在固定高度等球：解析計算球落到該高度的位置。
+
+    碰牆反彈的方向是隨機的，球會先碰牆時只預測到碰牆點（先往那一側移動）；
+    預測結果依球速快取，速度改變（反彈、旋轉、接球、重生）時就重算。
+    """
+
+    name = "intercept"
+    home_ratio = 0.75  # 代理等球的高度（與起始位置相同）
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self._key = None
+        self._target_x = None
+        self.recomputes = 0
+
+    def target(self, game) -> tuple[float, float]:
+        width, height = game.playfield()
+        t = game.tuning
+        ball_r, paddle_h = t["ball_r"], t["paddle_h"]
+        home_y = height * self.home_ratio + paddle_h / 2
+
+        key = (game.ball_vx, game.ball_vy, game.round_ball_spawn, width, height)
+        if key != self._key:
+            self._key = key
+            self.recomputes += 1
+            line_y = home_y - paddle_h / 2 - ball_r  # 球底碰到 paddle 上緣時的球心高度
+            hit = physics.predict_crossing(
+                game.ball_x, game.ball_y, game.ball_vx, game.ball_vy, line_y, ball_r, width - ball_r, ball_r
+            )
+            self._target_x = hit[0] if hit is not None else None
+
+        target_x = self._target_x if self._target_x is not None else game.ball_x
+        return target_x, home_y
+
+
+class RemotePolicy(AgentPolicy):
+    """由 backend /agent/decide 決策（多台電腦的請求在 server 端合併批次計算）。
+
+    每個 tick 只把最新狀態放進單格信箱，背景執行緒一次送一個請求；遊戲迴圈永遠
+    使用手上最新的決策，不等網路。沒有決策或決策太舊時改用本機 InterceptPolicy，
+    並計入 stale_frames。
+    """
+
+    name = "remote"
+    max_age_s = 0.05  # 超過約 3 frame 的決策視為過期
+
+    def __init__(self, api=None) -> None:
+        self._decide = getattr(api, "agent_decide", None)
+        self.station_id = f"{socket.gethostname()}-{os.getpid()}-{id(self):x}"
+        self.fallback = InterceptPolicy()
+        self._cond = threading.Condition()
+        self._snapshot = None
+        self._closed = False
+        self._thread = None
+        self._decision = None  # (target_x, target_y, 收到的 perf_counter 時間)
+        self.seq = 0
+        self.frames = 0
+        self.stale_frames = 0
+        self.failures = 0
+
+    def reset(self) -> None:
+        self.fallback.reset()
+        self._decision = None
+
+    def target(self, game) -> tuple[float, float]:
+        self.frames += 1
+        if self._decide is not None:
+            self._post_snapshot(game)
+        decision = self._decision
+        if decision is None or time.perf_counter() - decision[2] > self.max_age_s:
+            self.stale_frames += 1
+            return self.fallback.target(game)
+        return decision[0], decision[1]
+
+    def _post_snapshot(self, game) -> None:
+        width, height = game.playfield()
+        self.seq += 1
+        snapshot = {
+            "station_id": self.station_id,
+            "seq": self.seq,
+            "ball_x": game.ball_x,
+            "ball_y": game.ball_y,
+            "ball_vx": game.ball_vx,
+            "ball_vy": game.ball_vy,
+            "agent_x": game.agent_x,
+            "agent_y": game.agent_y,
+            "width": width,
+            "height": height,
+            "paddle_h": game.tuning["paddle_h"],
+            "ball_r": game.tuning["ball_r"],
+            "home_ratio": InterceptPolicy.home_ratio,
+            "client_stale": self.stale_frames,
+        }
+        with self._cond:
+            self._snapshot = snapshot  # 覆蓋尚未送出的舊狀態
+            self._cond.notify()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="agent-remote", daemon=True)
+            self._thread.start()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while self._snapshot is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                snapshot, self._snapshot = self._snapshot, None
+            result = self._decide(snapshot)
+            if result is None:
+                self.failures += 1
+                time.sleep(1.0)  # backend 沒回應：先用本機策略，稍後再試
+                continue
+            self._decision = (result["target_x"], result["target_y"], time.perf_counter())
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+
+POLICIES = {
+    ChasePolicy.name: ChasePolicy,
+    InterceptPolicy.name: InterceptPolicy,
+    RemotePolicy.name: RemotePolicy,
+}
+
+
+def make_policy(name: str, api=None) -> AgentPolicy:
+    """api 只有 RemotePolicy 會用到（需要 agent_decide）；None 時 remote 退回本機計算。"""
+    try:
+        cls = POLICIES[name]
+    except KeyError:
+        raise ValueError(f"unknown agent policy {name!r} (choose from {sorted(POLICIES)})") from None
+    return cls(api) if cls is RemotePolicy else cls()
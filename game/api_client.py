@@ -1,21 +1,168 @@
+import atexit
+import itertools
 import json
+import queue
+import threading
+import time
+import uuid
 from typing import Any, Dict, Optional
 
-import requests
+# requests 在第一次送出時才 import（約 100 ms），不拖慢遊戲啟動；
+# Game 在第一個畫面出現後會以背景執行緒呼叫 warm_up() 預先載入。
+#
+# 紀錄類請求（實驗 / 回合 / 事件 / 軌跡）都帶 client_id + seq：client_id 每個行程一個，
+# seq 在每條佇列（lifecycle / bulk）內遞增。backend 依此去重，所以逾時或連線失敗可以放心重送。這些請求放進佇列由
+# 背景執行緒依序送出（呼叫端不等網路），失敗時依 RETRY_DELAYS 重試。
 
 API_BASE = "http://127.0.0.1:8000"
-DEFAULT_TIMEOUT = 1.5
+DEFAULT_TIMEOUT = 1.5  # 須長於 backend 准入控制的最長排隊時間（AdmissionControl.max_wait_s = 1 s）
+AGENT_TIMEOUT = 0.25
+RETRY_DELAYS = (0.1, 0.3, 1.0, 3.0)
+# backend 過載（429 / 503）時依 Retry-After 等待後重送；這類等待另計，總共最多 OVERLOAD_BUDGET 秒
+OVERLOAD_STATUS = (429, 503)
+MAX_RETRY_AFTER = 30.0
+OVERLOAD_BUDGET = 120.0
+OUTBOX_SIZE = 10000  # 不可超過 backend 去重視窗（IngestDedup.window）
+FLUSH_TIMEOUT = 5.0
+# backend 停掉時代理決策每幀都會失敗：只印第一次，之後每 FAILURE_LOG_INTERVAL 秒印一次累計次數
+FAILURE_LOG_INTERVAL = 10.0
+
+# 實驗 / 回合的開始與結束走自己的佇列與送出執行緒（對應 backend 的 ADMISSION_CLASSES）：
+# 大量的事件 / 軌跡被節流而等待 Retry-After 時，不會卡住這些少量但重要的請求
+LIFECYCLE_PATHS = frozenset({"/start_experiment", "/end_experiment", "/start_round", "/end_round"})
+
+CLIENT_ID = uuid.uuid4().hex[:16]
+# 每條佇列各自編號：兩條佇列的送出進度可能差很多（bulk 被節流時），共用一個計數器的話
+# backend 的去重視窗會被領先的那條推走
+_seqs = {"lifecycle": itertools.count(1), "bulk": itertools.count(1)}
+_outboxes: Dict[str, "queue.Queue"] = {
+    "lifecycle": queue.Queue(maxsize=OUTBOX_SIZE),
+    "bulk": queue.Queue(maxsize=OUTBOX_SIZE),
+}
+_senders: Dict[str, threading.Thread] = {}
+_sender_lock = threading.Lock()
+
+# 代理決策請求頻繁，重用同一條 keep-alive 連線（只在 RemotePolicy 的背景執行緒使用）
+_agent_session = None
+_agent_failures = 0  # 連續失敗次數
+_agent_failure_logged = 0.0  # 上次印出失敗訊息的 monotonic 時間
+# 時鐘同步的探測也重用連線：新連線的建立時間會讓 RTT 偏大
+_clock_session = None
+
+
+def warm_up() -> None:
+    import requests  # noqa: F401
+
+
+def _lane(path: str) -> str:
+    return "lifecycle" if path in LIFECYCLE_PATHS else "bulk"
+
+
+def next_id(path: str) -> Dict[str, Any]:
+    return {"client_id": CLIENT_ID, "seq": next(_seqs[_lane(path)])}
 
 
 def _post(path: str, payload: Dict[str, Any]) -> None:
-    url = f"{API_BASE}{path}"
+    _enqueue(path, {"json": {**payload, **next_id(path)}})
+
+
+def _enqueue(path: str, request: Dict[str, Any]) -> None:
+    lane = _lane(path)
+    outbox = _outboxes[lane]
+    if lane not in _senders:
+        with _sender_lock:
+            if lane not in _senders:
+                sender = threading.Thread(target=_send_loop, args=(outbox,), name=f"api-sender-{lane}", daemon=True)
+                sender.start()
+                _senders[lane] = sender
     try:
-        requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
-    except Exception as exc:
-        print(f"[api] POST {path} failed: {exc}")
+        outbox.put_nowait((path, request, time.perf_counter_ns()))
+    except queue.Full:
+        print(f"[api] outbox full, dropped POST {path}")
 
 
-def start_experiment(user_id: int, condition: int, total_rounds: int, notes: str, exp_start_time: str) -> None:
+def _send_loop(outbox: "queue.Queue") -> None:
+    import requests
+
+    session = requests.Session()
+    while True:
+        path, request, queued_ns = outbox.get()
+        try:
+            _send(session, path, request, queued_ns)
+        finally:
+            outbox.task_done()
+
+
+def retry_after(resp, default: float) -> float:
+    try:
+        return min(max(float(resp.headers.get("Retry-After", default)), 0.0), MAX_RETRY_AFTER)
+    except ValueError:
+        return default
+
+
+def _send(session, path: str, request: Dict[str, Any], queued_ns: Optional[int] = None) -> None:
+    """送出一個請求；連線錯誤、逾時與 5xx 重試（backend 會去重），其他錯誤不重試。
+
+    429 / 503 是 backend 的准入控制在擋：照 Retry-After 等，不消耗一般的重試次數。
+    等待期間同一條佇列後面的請求也一起暫停（留在 outbox），另一條佇列照常送出。
+
+    帶 client_ns 的請求每次送出前蓋上 client_send_ns（同一個 session 時鐘上的送出時間 =
+    client_ns + 從放進 outbox 到現在經過的時間），backend 以此計算單向延遲，不含排隊與重試。
+    """
+    body = request.get("json")
+    stamp = queued_ns is not None and body is not None and body.get("client_ns") is not None
+    delays = iter(RETRY_DELAYS)
+    overload_wait = 0.0
+    while True:
+        if stamp:
+            body["client_send_ns"] = body["client_ns"] + time.perf_counter_ns() - queued_ns
+        try:
+            resp = session.post(f"{API_BASE}{path}", timeout=DEFAULT_TIMEOUT, **request)
+            if resp.status_code in OVERLOAD_STATUS and overload_wait < OVERLOAD_BUDGET:
+                wait = retry_after(resp, 1.0)
+                overload_wait += wait
+                time.sleep(wait)
+                continue
+            if resp.status_code < 500:
+                if resp.status_code >= 400:
+                    print(f"[api] POST {path} rejected: {resp.status_code} {resp.text[:200]}")
+                return
+            error = f"HTTP {resp.status_code}"
+        except Exception as exc:
+            error = exc
+        delay = next(delays, None)
+        if delay is None:
+            print(f"[api] POST {path} failed after {len(RETRY_DELAYS) + 1} attempts: {error}")
+            return
+        time.sleep(delay)
+
+
+def flush(timeout: float = FLUSH_TIMEOUT) -> bool:
+    """等佇列中的請求送完（最多 timeout 秒）；全部送完回傳 True。"""
+    deadline = time.monotonic() + timeout
+    while pending := sum(outbox.unfinished_tasks for outbox in _outboxes.values()):
+        if time.monotonic() >= deadline:
+            print(f"[api] {pending} request(s) not sent before exit")
+            return False
+        time.sleep(0.01)
+    return True
+
+
+atexit.register(flush)
+
+
+def start_experiment(
+    user_id: int,
+    condition: int,
+    total_rounds: int,
+    notes: str,
+    exp_start_time: str,
+    audio_buffer: Optional[int] = None,
+    audio_latency_ms: Optional[float] = None,
+    clock_offset_ns: Optional[int] = None,
+    clock_rtt_ms: Optional[float] = None,
+    telemetry: Optional[str] = None,
+) -> None:
     _post(
         "/start_experiment",
         {
@@ -24,11 +171,26 @@ def start_experiment(user_id: int, condition: int, total_rounds: int, notes: str
             "total_rounds": total_rounds,
             "notes": notes,
             "exp_start_time": exp_start_time,
+            "audio_buffer": audio_buffer,
+            "audio_latency_ms": audio_latency_ms,
+            "clock_offset_ns": clock_offset_ns,
+            "clock_rtt_ms": clock_rtt_ms,
+            "telemetry": telemetry,
         },
     )
 
 
-def end_experiment(user_id: int, condition: int, exp_start_time: str, exp_end_time: str, total_rounds: int, notes: str) -> None:
+def end_experiment(
+    user_id: int,
+    condition: int,
+    exp_start_time: str,
+    exp_end_time: str,
+    total_rounds: int,
+    notes: str,
+    telemetry_dropped: Optional[str] = None,
+    clock_offset_ns: Optional[int] = None,
+    clock_rtt_ms: Optional[float] = None,
+) -> None:
     _post(
         "/end_experiment",
         {
@@ -38,11 +200,22 @@ def end_experiment(user_id: int, condition: int, exp_start_time: str, exp_end_ti
             "exp_end_time": exp_end_time,
             "total_rounds": total_rounds,
             "notes": notes,
+            "telemetry_dropped": telemetry_dropped,
+            "clock_offset_ns": clock_offset_ns,
+            "clock_rtt_ms": clock_rtt_ms,
         },
     )
 
 
-def start_round(user_id: int, condition: int, round_id: int, agent_active: bool, human_active: bool, round_start_time: str) -> None:
+def start_round(
+    user_id: int,
+    condition: int,
+    round_id: int,
+    agent_active: bool,
+    human_active: bool,
+    round_start_time: str,
+    client_ns: Optional[int] = None,
+) -> None:
     _post(
         "/start_round",
         {
@@ -52,6 +225,7 @@ def start_round(user_id: int, condition: int, round_id: int, agent_active: bool,
             "agent_active": agent_active,
             "human_active": human_active,
             "round_start_time": round_start_time,
+            "client_ns": client_ns,
         },
     )
 
@@ -71,6 +245,7 @@ def end_round(
     ball_miss: int,
     agent_active: bool,
     human_active: bool,
+    client_ns: Optional[int] = None,
 ) -> None:
     _post(
         "/end_round",
@@ -89,9 +264,76 @@ def end_round(
             "ball_miss": ball_miss,
             "agent_active": agent_active,
             "human_active": human_active,
+            "client_ns": client_ns,
         },
     )
 
 
+def round_profile(user_id: int, condition: int, round_id: int, summary: Dict[str, Any]) -> None:
+    _post(
+        "/round_profile",
+        {
+            "user_id": user_id,
+            "condition": condition,
+            "round_id": round_id,
+            **summary,
+        },
+    )
+
+
+def upload_trajectory(user_id: int, condition: int, round_id: int, chunk_index: int, data: bytes) -> None:
+    """送出一個已壓縮的軌跡 chunk（由 trajectory.TrajectoryRecorder 的背景執行緒呼叫）。"""
+    params = {"user_id": user_id, "condition": condition, "round_id": round_id, "chunk_index": chunk_index, **next_id("/trajectory")}
+    _enqueue("/trajectory", {"params": params, "data": data, "headers": {"Content-Type": "application/octet-stream"}})
+
+
+def net_stats(user_id: int, condition: int, samples: list) -> None:
+    """區網雙人模式的逐 tick 網路紀錄（由 net_server 的背景執行緒整批送出）。"""
+    _post("/net_stats", {"user_id": user_id, "condition": condition, "samples": samples})
+
+
+def agent_decide(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """向 backend 要代理目標位置；失敗回傳 None（呼叫端改用本機策略）。"""
+    import requests
+
+    global _agent_session, _agent_failures, _agent_failure_logged
+    if _agent_session is None:
+        _agent_session = requests.Session()
+    try:
+        resp = _agent_session.post(f"{API_BASE}/agent/decide", json=state, timeout=AGENT_TIMEOUT)
+        resp.raise_for_status()
+        decision = resp.json()
+    except Exception as exc:
+        _agent_failures += 1
+        now = time.monotonic()
+        if _agent_failures == 1:
+            print(f"[api] POST /agent/decide failed: {exc}")
+            _agent_failure_logged = now
+        elif now - _agent_failure_logged >= FAILURE_LOG_INTERVAL:
+            print(f"[api] POST /agent/decide still failing ({_agent_failures} failures): {exc}")
+            _agent_failure_logged = now
+        return None
+    if _agent_failures:
+        print(f"[api] POST /agent/decide recovered after {_agent_failures} failures")
+        _agent_failures = 0
+    return decision
+
+
+def clock_sync(client_ns: int) -> Optional[Dict[str, Any]]:
+    """一次時鐘同步探測（見 session_clock.py）；失敗回傳 None。"""
+    import requests
+
+    global _clock_session
+    if _clock_session is None:
+        _clock_session = requests.Session()
+    try:
+        resp = _clock_session.post(f"{API_BASE}/clock_sync", json={"client_ns": client_ns}, timeout=AGENT_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as exc:
+        print(f"[api] POST /clock_sync failed: {exc}")
+        return None
+
+
 def log_event(payload: Dict[str, Any]) -> None:
     _post("/log_event", payload)
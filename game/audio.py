@@ -1,30 +1,196 @@
+"""音效：背景執行緒解碼、PCM 快取、每個提示音有保留的 mixer channel。
+
+MP3 第一次解碼後把 mixer 格式的原始 PCM 存到 .cache/pcm/；之後啟動時只要
+來源檔的 mtime / 大小與 mixer 格式沒變，就直接讀 PCM，不必再解碼。
+遊戲不等音效載入完成；載入前觸發的提示音直接略過。
+
+延遲量測：比 mixer buffer 短的靜音 click 會在取走它的那次 mixer callback 中播完，
+其 channel 結束事件即標記「mixer 開始播放」的時刻。啟動時 calibrate() 連續量測
+觸發到該事件的時間，再加上一個 buffer 的輸出時間，作為實驗的音訊延遲。遊戲中每個
+提示音與 click 同時觸發，記錄觸發時間與 click 結束事件被處理的時間（事件在主迴圈
+處理，因此為上限，含最多約一個 frame 的等待）。
+"""
 import os
+import statistics
+import struct
+import threading
+import time
+from collections import deque
+from typing import Optional
+
 import pygame as pg
 
+# 提示音名稱 -> source/ 底下的檔案
+CUES = {
+    "drum": "small_drum.mp3",  # 接到球
+    "denied": "denied.mp3",  # 漏接
+    "wrong": "wrong.mp3",  # paddle 互撞
+}
+CHANNELS_PER_CUE = 2  # 同一提示音重疊時輪流使用，不會被其他聲音搶走
+# 低延遲模式的 mixer buffer（樣本數）；0 表示使用 pygame 預設值
+DEFAULT_BUFFER = 256
+_buffer_setting = 512  # 實際使用的 buffer；pygame 沒有公開此值，以 pre_init 設定為準
+
+PCM_MAGIC = b"PCM1"
+# magic、來源 mtime_ns、來源大小、mixer 頻率、樣本格式、聲道數
+_PCM_HEADER = struct.Struct("<4sQqihH")
+
+
+def pre_init(buffer: int = DEFAULT_BUFFER) -> None:
+    """必須在 pg.init() 之前呼叫，mixer 才會用指定的 buffer 開啟。"""
+    global _buffer_setting
+    if buffer > 0:
+        pg.mixer.pre_init(44100, -16, 2, buffer)
+        _buffer_setting = buffer
+
+
+def buffer_samples() -> int:
+    return _buffer_setting
+
 
 class AudioManager:
-    def __init__(self, base_dir: str) -> None:
+    def __init__(self, base_dir: str, enabled: bool = True, cache_dir: Optional[str] = None) -> None:
         self.base_dir = base_dir
-        self.snd_wrong = None
-        self.snd_drum = None
-        self.snd_denied = None
-        self.load()
+        self.cache_dir = cache_dir or os.path.join(base_dir, ".cache", "pcm")
+        self.sounds: dict[str, pg.mixer.Sound] = {}
+        self.channels: dict[str, list] = {}
+        self._next_channel: dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.loaded = threading.Event()
+        self.load_ms: Optional[float] = None  # 背景載入耗時
+        # 量測：click 所在 channel 與其結束事件；等待 click 被 mixer 取走的 (cue, 觸發 ns)
+        self._marker = None
+        self._marker_channel = None
+        self._marker_event = None
+        self._marker_busy = False
+        self._pending: list[tuple[str, int]] = []
+        self.cue_log: deque = deque(maxlen=512)  # (cue, 觸發 ns, 估計開始播放 ns)
+        self._round_delays: list[float] = []
+        # enabled=False：headless 模擬時不載入音效，play() 一律略過
+        if enabled and pg.mixer.get_init():
+            self.reserve_channels()
+            self.load()
+        else:
+            self.loaded.set()
+
+    def reserve_channels(self) -> None:
+        """前 N 個 channel 保留給提示音（find_channel / Sound.play 不會用到）。"""
+        reserved = len(CUES) * CHANNELS_PER_CUE + 1  # 最後一個給量測用的 click
+        if pg.mixer.get_num_channels() < reserved + 4:
+            pg.mixer.set_num_channels(reserved + 4)
+        pg.mixer.set_reserved(reserved)
+        for i, name in enumerate(CUES):
+            first = i * CHANNELS_PER_CUE
+            self.channels[name] = [pg.mixer.Channel(first + k) for k in range(CHANNELS_PER_CUE)]
+            self._next_channel[name] = 0
+        _, fmt, n_channels = pg.mixer.get_init()
+        self._marker = pg.mixer.Sound(buffer=bytes(abs(fmt) // 8 * n_channels * 32))  # 32 個樣本的靜音
+        self._marker_channel = pg.mixer.Channel(reserved - 1)
+        self._marker_event = pg.event.custom_type()
+        self._marker_channel.set_endevent(self._marker_event)
 
     def load(self) -> None:
-        def safe(path: str):
-            if not os.path.exists(path):
-                print(f"Sound not found: {path}")
-                return None
-            try:
-                return pg.mixer.Sound(path)
-            except Exception as exc:
-                print(f"Load sound failed {path}: {exc}")
-                return None
-
-        self.snd_wrong = safe(os.path.join(self.base_dir, "source", "wrong.mp3"))
-        self.snd_drum = safe(os.path.join(self.base_dir, "source", "small_drum.mp3"))
-        self.snd_denied = safe(os.path.join(self.base_dir, "source", "denied.mp3"))
-
-    def play(self, snd):
-        if snd:
-            snd.play()
+        """在背景執行緒載入；立即返回。"""
+        self._thread = threading.Thread(target=self._load_all, name="audio-load", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.loaded.wait(timeout)
+
+    def _load_all(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            for name, filename in CUES.items():
+                sound = self._load(os.path.join(self.base_dir, "source", filename))
+                if sound is not None:
+                    self.sounds[name] = sound
+        finally:
+            self.load_ms = (time.perf_counter() - t0) * 1000
+            self.loaded.set()
+
+    def _load(self, path: str) -> Optional[pg.mixer.Sound]:
+        if not os.path.exists(path):
+            print(f"Sound not found: {path}")
+            return None
+        st = os.stat(path)
+        fmt = pg.mixer.get_init()
+        cache_path = os.path.join(self.cache_dir, os.path.basename(path) + ".pcm")
+        key = (st.st_mtime_ns, st.st_size, *fmt)
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+            magic, *cached_key = _PCM_HEADER.unpack_from(data)
+            if magic == PCM_MAGIC and tuple(cached_key) == key:
+                return pg.mixer.Sound(buffer=data[_PCM_HEADER.size:])
+        except (OSError, struct.error):
+            pass
+        except Exception as exc:
+            print(f"PCM cache unusable {cache_path}: {exc}")
+
+        try:
+            sound = pg.mixer.Sound(path)
+        except Exception as exc:
+            print(f"Load sound failed {path}: {exc}")
+            return None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = cache_path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(_PCM_HEADER.pack(PCM_MAGIC, *key))
+                f.write(sound.get_raw())
+            os.replace(tmp, cache_path)
+        except OSError as exc:
+            print(f"Write PCM cache failed {cache_path}: {exc}")
+        return sound
+
+    def play(self, cue: str) -> None:
+        sound = self.sounds.get(cue)
+        if sound is None:
+            return
+        channels = self.channels[cue]
+        i = self._next_channel[cue]
+        self._next_channel[cue] = (i + 1) % len(channels)
+        self._pending.append((cue, time.perf_counter_ns()))
+        channels[i].play(sound)
+        if not self._marker_busy:
+            self._marker_busy = True
+            self._marker_channel.play(self._marker)
+
+    def handle_event(self, event) -> bool:
+        """處理量測 click 的結束事件；不是的話回傳 False。"""
+        if self._marker_event is None or event.type != self._marker_event:
+            return False
+        started_ns = time.perf_counter_ns()
+        for cue, trigger_ns in self._pending:
+            self.cue_log.append((cue, trigger_ns, started_ns))
+            self._round_delays.append((started_ns - trigger_ns) / 1e6)
+        self._pending = []
+        self._marker_busy = False
+        return True
+
+    def round_summary(self) -> dict:
+        delays = self._round_delays
+        return {
+            "audio_cues": len(delays),
+            "audio_start_ms": round(statistics.fmean(delays), 3) if delays else 0.0,
+        }
+
+    def reset_round(self) -> None:
+        self._round_delays = []
+
+    def calibrate(self, trials: int = 5, timeout: float = 0.5) -> Optional[float]:
+        """量測觸發到聲音輸出的延遲（ms，取中位數）；沒有 mixer 或量不到時回傳 None。"""
+        if self._marker is None:
+            return None
+        samples = []
+        for _ in range(trials):
+            t0 = time.perf_counter_ns()
+            self._marker_channel.play(self._marker)
+            while not pg.event.get(self._marker_event):
+                if time.perf_counter_ns() - t0 > timeout * 1e9:
+                    return None
+                time.sleep(0.0002)
+            samples.append((time.perf_counter_ns() - t0) / 1e6)
+        # mixer 取走聲音後還要經過一個 buffer 才會送到輸出裝置
+        buffer_ms = _buffer_setting / pg.mixer.get_init()[0] * 1000
+        return round(statistics.median(samples) + buffer_ms, 3)
@@ -0,0 +1,366 @@
+"""Benchmark：backend 寫入、遊戲 tick、回合繪圖與 api_client 呼叫成本。
+
+結果寫成 JSON，並與存下的 baseline 比較；任何一項比 baseline 差超過門檻（預設 20%）
+即視為退步，結束碼為 1。baseline 與機器有關，請在實驗用的電腦上建立。
+
+用法（於 game/ 目錄下）::
+
+    python bench.py --save-baseline                  # 建立 / 更新 bench_baseline.json
+    python bench.py                                  # 跑全部並與 baseline 比較
+    python bench.py --cases backend --rows 1000,100000
+    python bench.py --cases game,draw --threshold 0.1 --out results.json
+
+案例：
+    backend  /log_event、/end_round 在既有 1k / 100k / 1M 列的 CSV 上的每次請求時間（TestClient）
+    game     headless Game.update（update_round + check_collisions）ticks/sec，以及單獨 check_collisions
+    draw     SDL dummy driver 上 Game.draw 回合畫面 frames/sec（完整重畫與 dirty-rect）
+    api      api_client.log_event 在呼叫端（遊戲主執行緒）花的時間（本機 uvicorn）
+"""
+import os
+
+# 必須在 import pygame 之前設定
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import datetime as dt
+import importlib.util
+import json
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pygame as pg
+
+import api_client
+import main as game_main
+from main import Game, GameState
+from sweep import scripted_human
+
+GAME_DIR = Path(__file__).resolve().parent
+BACKEND_MAIN = GAME_DIR.parent / "backend" / "main.py"
+DEFAULT_BASELINE = GAME_DIR / "bench_baseline.json"
+DEFAULT_ROWS = (1_000, 100_000, 1_000_000)
+CASES = ("backend", "game", "draw", "api")
+
+SAMPLE_EVENT = {
+    "user_id": 1,
+    "condition": 4,
+    "round_id": 1,
+    "timestamp": "2026-01-01T12:00:00.000000Z",
+    "event_type": "ball_catch",
+    "ball_x": 640,
+    "ball_y": 560,
+    "human_x": 600,
+    "human_y": 590,
+    "agent_x": 500,
+    "agent_y": 540,
+    "triggered_by": "human",
+    "signal_type": "NA",
+    "dir_ratio": None,
+    "ball_speed": 9.5,
+    "ball_angle": -45.0,
+    "ball_id": None,
+    "client_ns": None,
+    "clock_offset_ns": None,
+    "round_ms": 1234.5,
+}
+
+
+def result(value: float, unit: str, higher_is_better: bool, **extra) -> dict:
+    return {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better, **extra}
+
+
+def median_of(repeat: int, fn) -> float:
+    return statistics.median(fn() for _ in range(repeat))
+
+
+# --- backend ---
+
+
+def load_backend(data_dir: Path):
+    """以檔案路徑載入 backend/main.py（與 game/main.py 同名），資料寫到 data_dir。"""
+    spec = importlib.util.spec_from_file_location("backend_main", BACKEND_MAIN)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["backend_main"] = module
+    spec.loader.exec_module(module)
+    module.DATA_DIR = data_dir
+    return module
+
+
+def fill_csv(path: Path, header: list, row: list, n: int) -> None:
+    """直接寫入 n 列既有資料（不經 API，才能快速建立 1M 列）。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = ",".join(str(v) for v in row) + "\r\n"
+    with path.open("w", newline="", encoding="utf-8") as f:
+        f.write(",".join(header) + "\r\n")
+        block = line * 10_000
+        for _ in range(n // 10_000):
+            f.write(block)
+        f.write(line * (n % 10_000))
+
+
+def bench_backend(rows: list[int], repeat: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_backend_") as tmp:
+        backend = load_backend(Path(tmp))
+        client = TestClient(backend.app)
+        event_fields = [
+            "user_id", "condition", "round_id", "timestamp", "event_type", "ball_x", "ball_y", "human_x",
+            "human_y", "agent_x", "agent_y", "triggered_by", "signal_type", "dir_ratio", "ball_speed",
+            "ball_angle", "ball_id", "client_ns", "clock_offset_ns", "server_ns", "one_way_ms",
+            "client_send_ns", "round_ms",
+        ]
+        round_fields = [
+            "user_id", "condition", "round_id", "round_start_time", "round_end_time", "score", "errors",
+            "agent_active", "human_active", "ball_spawn", "paddle_collision", "signal_sent", "ball_catch",
+            "ball_miss", "round_start_ns", "round_end_ns",
+        ]
+        for i, n in enumerate(rows):
+            user_id = 1000 + i
+            user_dir = backend.ensure_dir(user_id, 4)
+            event = {**SAMPLE_EVENT, "user_id": user_id}
+            fill_csv(user_dir / "events.csv", event_fields, [("NA" if event.get(f) is None else event[f]) for f in event_fields], n)
+            done_round = [user_id, 4, 1, "2026-01-01T12:00:00Z", "2026-01-01T12:01:00Z", 5, 1, 1, 1, 3, 0, 0, 5, 1, "NA", "NA"]
+            fill_csv(user_dir / "round.csv", round_fields, done_round, n)
+            # 大檔每次請求都很慢：請求數隨列數減少，總時間大致固定
+            count = max(3, min(300, 300_000 // n))
+            round_count = max(1, min(100, 100_000 // n))  # end_round 每次都重寫整個 round.csv
+
+            def log_events():
+                t0 = time.perf_counter()
+                for _ in range(count):
+                    client.post("/log_event", json=event).raise_for_status()
+                return (time.perf_counter() - t0) / count * 1000
+
+            def end_rounds():
+                total = 0.0
+                for k in range(round_count):
+                    start = f"2026-01-02T00:00:{k % 60:02d}Z"
+                    client.post(
+                        "/start_round",
+                        json={"user_id": user_id, "condition": 4, "round_id": 2, "agent_active": True,
+                              "human_active": True, "round_start_time": start},
+                    ).raise_for_status()
+                    t0 = time.perf_counter()
+                    client.post(
+                        "/end_round",
+                        json={"user_id": user_id, "condition": 4, "round_id": 2, "round_start_time": start,
+                              "round_end_time": start, "score": 1, "errors": 0, "collisions": 0, "ball_spawn": 1,
+                              "signal_sent": 0, "ball_catch": 1, "ball_miss": 0, "agent_active": True,
+                              "human_active": True},
+                    ).raise_for_status()
+                    total += time.perf_counter() - t0
+                return total / round_count * 1000
+
+            label = f"{n // 1000}k" if n < 1_000_000 else f"{n // 1_000_000}M"
+            ms = median_of(repeat, log_events)
+            results[f"backend.log_event.{label}"] = result(ms, "ms/request", False, rows=n, requests=count)
+            ms = median_of(repeat, end_rounds)
+            results[f"backend.end_round.{label}"] = result(ms, "ms/request", False, rows=n, requests=round_count)
+            print(f"  backend rows={n}: done")
+    return results
+
+
+# --- game ---
+
+
+def make_round_game(headless: bool, dirty_rects: bool = False) -> Game:
+    game = Game(headless=headless, api=None, human_policy=scripted_human, dirty_rects=dirty_rects)
+    game.total_rounds = 10 ** 6  # 回合結束時直接進下一回合
+    game.begin_experiment(1, 4, seed=12345)
+    return game
+
+
+def step(game: Game) -> None:
+    game.update(1.0 / game_main.FPS)
+    if game.state == GameState.BREAK:
+        game.go_next_round_or_done()
+
+
+def bench_game(ticks: int, repeat: int) -> dict:
+    def ticks_per_sec():
+        game = make_round_game(headless=True)
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            step(game)
+        return ticks / (time.perf_counter() - t0)
+
+    def collisions_per_sec():
+        game = make_round_game(headless=True)
+        for _ in range(120):
+            step(game)
+        n = ticks * 4
+        t0 = time.perf_counter()
+        for _ in range(n):
+            game.check_collisions()
+        return n / (time.perf_counter() - t0)
+
+    return {
+        "game.update.ticks_per_sec": result(median_of(repeat, ticks_per_sec), "ticks/s", True, ticks=ticks),
+        "game.check_collisions.calls_per_sec": result(
+            median_of(repeat, collisions_per_sec), "calls/s", True, calls=ticks * 4
+        ),
+    }
+
+
+def bench_draw(frames: int, repeat: int) -> dict:
+    results = {}
+    for name, dirty in (("full", False), ("dirty_rects", True)):
+        game = make_round_game(headless=False, dirty_rects=dirty)
+
+        def frames_per_sec():
+            t0 = time.perf_counter()
+            for _ in range(frames):
+                step(game)
+                game.draw()
+            return frames / (time.perf_counter() - t0)
+
+        results[f"draw.round.{name}.fps"] = result(median_of(repeat, frames_per_sec), "frames/s", True, frames=frames)
+    pg.quit()
+    return results
+
+
+# --- api_client ---
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_api(calls: int, repeat: int) -> dict:
+    import uvicorn
+
+    with tempfile.TemporaryDirectory(prefix="bench_api_") as tmp:
+        backend = load_backend(Path(tmp))
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        old_base = api_client.API_BASE
+        api_client.API_BASE = f"http://127.0.0.1:{port}"
+        try:
+            api_client.warm_up()
+            api_client.log_event(SAMPLE_EVENT)  # 建立檔案與連線
+            api_client.flush()
+
+            def per_call_ms():
+                t0 = time.perf_counter()
+                for _ in range(calls):
+                    api_client.log_event(SAMPLE_EVENT)
+                ms = (time.perf_counter() - t0) / calls * 1000
+                api_client.flush()  # 背景送出不計入呼叫端時間，但每輪都要送完
+                return ms
+
+            ms = median_of(repeat, per_call_ms)
+        finally:
+            api_client.flush()
+            api_client.API_BASE = old_base
+            server.should_exit = True
+            thread.join(5)
+    return {"api.log_event.caller_ms": result(ms, "ms/call", False, calls=calls)}
+
+
+# --- 比較 ---
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """回傳退步的項目；只比較兩邊都有的案例。"""
+    regressions = []
+    print(f"{'case':<40}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if base is None or not base["value"]:
+            print(f"{name:<40}{'-':>12}{cur['value']:>12.4g}{'new':>9}")
+            continue
+        change = cur["value"] / base["value"] - 1
+        worse = -change if cur["higher_is_better"] else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        print(f"{name:<40}{base['value']:>12.4g}{cur['value']:>12.4g}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare against a baseline.")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"comma-separated subset of {', '.join(CASES)}")
+    parser.add_argument("--rows", default=",".join(str(n) for n in DEFAULT_ROWS), help="existing CSV rows for backend cases")
+    parser.add_argument("--ticks", type=int, default=20_000, help="ticks for the game case")
+    parser.add_argument("--frames", type=int, default=600, help="frames for the draw case")
+    parser.add_argument("--calls", type=int, default=200, help="calls for the api case")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per case (median is reported)")
+    parser.add_argument("--out", type=Path, default=None, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed slowdown before failing (0.20 = 20%%)")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {sorted(unknown)}")
+
+    results = {}
+    t0 = time.perf_counter()
+    if "backend" in cases:
+        print("Running backend ...")
+        results.update(bench_backend([int(n) for n in args.rows.split(",")], args.repeat))
+    if "game" in cases:
+        print("Running game ...")
+        results.update(bench_game(args.ticks, args.repeat))
+    if "draw" in cases:
+        print("Running draw ...")
+        results.update(bench_draw(args.frames, args.repeat))
+    if "api" in cases:
+        print("Running api ...")
+        results.update(bench_api(args.calls, args.repeat))
+
+    report = {
+        "meta": {
+            "time": dt.datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "pygame": pg.version.ver,
+            "platform": platform.platform(),
+            "machine": platform.node(),
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+            "elapsed_s": round(time.perf_counter() - t0, 1),
+        },
+        "threshold": args.threshold,
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Results written to {args.out}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        for name, r in results.items():
+            print(f"  {name}: {r['value']:.4g} {r['unit']}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
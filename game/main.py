@@ -1,7 +1,13 @@
+import time
+
+STARTUP_T0 = time.perf_counter_ns()  # 啟動計時起點（含以下 import）
+
+import argparse
 import sys
 import random
 import math
 import os
+import threading
 from pathlib import Path
 import datetime as dt
 from typing import Optional
@@ -9,11 +15,23 @@ import pygame as pg
 from enum import Enum, auto
 
 import api_client
+import recording
+import physics
+from agent_policy import POLICIES, AgentPolicy, make_policy
+from multiball import BallField
+import audio
 from audio import AudioManager
+from profiler import FrameProfiler, StartupTimer
+from render_cache import SpriteCache, TextCache, load_font
+from session_clock import SessionClock
+from telemetry import LEVELS, Telemetry, parse_rate_args
+from trajectory import TrajectoryRecorder, round_key
 
 # === 基本設定 ===
+# 邏輯畫面尺寸：所有繪圖與物理都在此座標系，視窗大小只影響最後的縮放
 WIDTH, HEIGHT = 1280, 720
 FPS = 60
+IDLE_REDRAW_MS = 500  # 靜態畫面（HOME / BREAK / DONE / 暫停）沒有輸入時的重畫間隔
 
 # 顏色
 WHITE = (255, 255, 255)
@@ -31,6 +49,32 @@ TOTAL_ROUNDS = 3
 PADDLE_W, PADDLE_H = 100, 20
 BALL_R = 10
 
+# 難度 / 代理參數預設值；Game(tuning=...) 可逐項覆寫（參數掃描用，見 sweep.py）
+DEFAULT_TUNING = {
+    "paddle_w": PADDLE_W,
+    "paddle_h": PADDLE_H,
+    "ball_r": BALL_R,
+    "max_speed": 12,
+    "min_speed": 2.0,
+    "human_speed": 3.5,
+    "agent_speed": 3,
+    "agent_jitter": 1.5,  # target_y 抖動 = uniform(±agent_jitter) * agent_jitter_px
+    "agent_jitter_px": 40,
+    "hit_cooldown_ms": 250,
+    "conflict_freeze_ms": 300,
+}
+
+# 各 condition 的代理策略（agent_policy.POLICIES 的名稱）；Game(agent_policies=...) 可覆寫
+DEFAULT_AGENT_POLICIES = {
+    1: "chase",
+    2: "chase",
+    3: "chase",
+    4: "chase",
+}
+
+# 人類方向鍵狀態的位元遮罩（真人鍵盤與模擬玩家共用）
+KEY_LEFT, KEY_RIGHT, KEY_UP, KEY_DOWN = 1, 2, 4, 8
+
 
 class GameState(Enum):
     HOME = auto()
@@ -48,38 +92,166 @@ CONDITIONS = {
 }
 
 
-def draw_text(surface, text, font, color, pos, center=False):
-    img = font.render(text, True, color)
+# 文字 / 圖形快取：固定標籤只 rasterize 一次，視窗縮放時清空
+TEXT_CACHE = TextCache(maxsize=256)
+SPRITES = SpriteCache()
+
+
+def text_sprite(text, font, color, pos, center=False):
+    """回傳 (surface, rect)，供 draw_text 與 dirty-rect 繪圖共用。"""
+    img = TEXT_CACHE.render(text, font, color)
     rect = img.get_rect()
     if center:
         rect.center = pos
     else:
         rect.topleft = pos
+    return img, rect
+
+
+def draw_text(surface, text, font, color, pos, center=False):
+    img, rect = text_sprite(text, font, color, pos, center)
     surface.blit(img, rect)
 
 
+def move_by_keys(x, y, keys, speed):
+    """依方向鍵位元遮罩移動 paddle（範圍限制另由 clamp_paddle 處理）。"""
+    if keys & KEY_LEFT:
+        x -= speed
+    if keys & KEY_RIGHT:
+        x += speed
+    if keys & KEY_UP:
+        y -= speed
+    if keys & KEY_DOWN:
+        y += speed
+    return x, y
+
+
+def clamp_paddle(x, y, who, paddle_w, paddle_h):
+    """限制在人類 / 代理各自的工作區域（下半部；代理更貼近下方，不要卡在頂端）。"""
+    min_y = HEIGHT // 2 if who == "human" else int(HEIGHT * 0.55)
+    return max(0, min(WIDTH - paddle_w, x)), max(min_y, min(HEIGHT - paddle_h, y))
+
+
 class Game:
-    def __init__(self):
-        pg.init()
-        try:
-            pg.mixer.init()
-        except Exception as e:
-            print("Audio init failed:", e)
-        global WIDTH, HEIGHT
-        # 視窗模式（保留標題列），允許調整大小
-        self.screen = pg.display.set_mode((WIDTH, HEIGHT), pg.RESIZABLE)
-        # 取得實際視窗大小，覆蓋全域常數，讓 UI 依視窗尺度調整
-        WIDTH, HEIGHT = self.screen.get_size()
-        self.clock = pg.time.Clock()
-
-        # 字型
-        self.font_large = pg.font.SysFont("arial", 40)
-        self.font_medium = pg.font.SysFont("arial", 28)
-        self.font_small = pg.font.SysFont("arial", 22)
+    def __init__(
+        self,
+        headless: bool = False,
+        tuning: Optional[dict] = None,
+        api=api_client,
+        human_policy=None,
+        record_dir: Optional[Path] = None,
+        dirty_rects: bool = False,
+        trajectory: bool = False,
+        dt_physics: bool = False,
+        multiball: int = 0,
+        agent_policies: Optional[dict] = None,
+        audio_buffer: int = audio.DEFAULT_BUFFER,
+        idle: bool = True,
+        second_player=None,
+        telemetry: Optional[Telemetry] = None,
+    ):
+        """headless=True 時不開視窗、不載音效，只跑遊戲邏輯（模擬 / 參數掃描用）。
+
+        api: 具備 api_client 介面的物件，None 表示不送出任何資料。
+        human_policy: callable(game) -> 方向鍵位元遮罩，取代鍵盤輸入（模擬玩家 / 重播）。
+        record_dir: 設定後每個 session 的輸入會錄製到此目錄（見 recording.py）。
+        dirty_rects: 回合畫面只重畫有變動的區域（低階電腦用）。
+        trajectory: 逐 tick 紀錄球 / paddle 軌跡，分塊壓縮後於背景送到 backend。
+        dt_physics: 物理依 dt 推進（預設每 tick 固定一個 frame）；headless 可用大 step。
+        multiball: > 0 時啟用多球模式，場上同時有這麼多顆球（見 multiball.py）。
+        agent_policies: condition -> 策略名稱，覆寫 DEFAULT_AGENT_POLICIES 的部分項目。
+        audio_buffer: mixer buffer 樣本數（低延遲提示音）；0 使用 pygame 預設值。
+        idle: 靜態畫面改為等待事件，不以固定幀率空轉。
+        second_player: callable(game) -> 方向鍵位元遮罩；設定時代理 paddle 改由第二位玩家
+            以方向鍵控制（區網雙人模式，見 net_server.py），不使用代理策略。
+        telemetry: 事件紀錄等級與各 event_type 的速率上限（見 telemetry.py）；None 為全部送出。
+        """
+        self.startup = StartupTimer(STARTUP_T0)
+        self.startup.mark("import")
+        self._startup_done = False
+        unknown = set(tuning or {}) - set(DEFAULT_TUNING)
+        if unknown:
+            raise ValueError(f"unknown tuning keys: {sorted(unknown)}")
+        self.tuning = {**DEFAULT_TUNING, **(tuning or {})}
+        self.headless = headless
+        self.dt_physics = dt_physics
+        self.multiball = multiball
+        self.agent_policies = {**DEFAULT_AGENT_POLICIES, **(agent_policies or {})}
+        self.agent_policy: AgentPolicy = make_policy(DEFAULT_AGENT_POLICIES[1])
+        self.balls: Optional[BallField] = BallField(multiball, self.tuning["ball_r"]) if multiball > 0 else None
+        # 常駐的逐階段計時；api 呼叫經由代理計入 "api" 階段
+        self.profiler = FrameProfiler()
+        self.show_profiler = False  # F3 切換效能資訊
+        self._profiler_lines: list[str] = []
+        self.api = self.profiler.wrap_api(api) if api is not None else None
+        self.raw_api = api  # 背景執行緒用（不經 profiler）
+        # 事件的單調時間戳與 backend 時鐘同步（api 沒有 clock_sync 時只記單調時間）
+        self.session_clock = SessionClock(getattr(api, "clock_sync", None))
+        self.telemetry = telemetry or Telemetry()
+        # 軌跡 chunk 在背景執行緒送出，直接用原始 api（profiler 只計主執行緒）
+        self.trajectory: Optional[TrajectoryRecorder] = None
+        if trajectory and api is not None:
+            self.trajectory = TrajectoryRecorder(
+                ship=lambda ctx, round_id, idx, data: api.upload_trajectory(ctx[0], ctx[1], round_id, idx, data)
+            )
+        self.human_policy = human_policy
+        self.record_dir = Path(record_dir) if record_dir else None
+        self.recorder: Optional[recording.SessionRecorder] = None
+
+        # 每個 session 使用獨立、可設定 seed 的亂數來源，才能重現 / 重播
+        self.rng = random.Random()
+        self.session_seed: Optional[int] = None
+        self.human_keys = 0  # 本 tick 的方向鍵狀態
+        self.second_player = second_player
+        self.agent_keys = 0  # 第二位玩家本 tick 的方向鍵狀態
+
+        self._resize_pending = False
+        self.idle = idle
+        # 主迴圈各模式累計的 [實際時間, CPU 時間]（秒），結束時印出
+        self.loop_time = {"active": [0.0, 0.0], "idle": [0.0, 0.0]}
+        # dirty-rect 繪圖：上一幀各元素的 (surface, rect)；None 表示下一幀需整張重畫
+        self.dirty_rects = dirty_rects
+        self._dirty_items: Optional[dict] = None
+        self._drawn_state: Optional[GameState] = None
 
         # 路徑 / 音效
         self.base_dir = Path(__file__).resolve().parent
-        self.audio = AudioManager(str(self.base_dir))
+
+        if headless:
+            self.screen = None
+            self.window = None
+            self.clock = None
+            self.audio = AudioManager(str(self.base_dir), enabled=False)
+            self.audio_buffer = None
+            self.audio_latency_ms = None
+        else:
+            audio.pre_init(audio_buffer)  # 必須在 mixer 初始化之前
+            # 只初始化用得到的模組（pg.init 還會初始化搖桿等，較慢）
+            pg.display.init()
+            pg.font.init()
+            try:
+                pg.mixer.init()
+            except Exception as e:
+                print("Audio init failed:", e)
+            # 視窗模式（保留標題列），允許調整大小；畫面輸出見 setup_window
+            pg.display.set_mode((WIDTH, HEIGHT), pg.RESIZABLE)
+            self.screen = None
+            self.setup_window()
+            self.clock = pg.time.Clock()
+            self.startup.mark("display")
+
+            # 字型（路徑快取在 .cache/fonts.json）
+            font_cache = str(self.base_dir / ".cache" / "fonts.json")
+            self.font_large = load_font("arial", 40, font_cache)
+            self.font_medium = load_font("arial", 28, font_cache)
+            self.font_small = load_font("arial", 22, font_cache)
+            self.startup.mark("fonts")
+
+            # 音效在背景載入；延遲校正等第一個畫面出現後再做（finish_startup）
+            self.audio = AudioManager(str(self.base_dir))
+            self.audio_buffer = audio.buffer_samples() if pg.mixer.get_init() else None
+            self.audio_latency_ms = None
+            self.startup.mark("audio")
 
         # 狀態相關
         self.state = GameState.HOME
@@ -109,13 +281,11 @@ class Game:
         self.total_score = 0
         self.total_errors = 0
 
-        # 計時與暫停
-        self.round_start_ms = None
+        # 計時與暫停（回合時間由每個 tick 的 dt 累加，暫停時不累加）
+        self.round_elapsed_ms = 0.0
         self.round_start_iso: Optional[str] = None
         self.round_end_iso: Optional[str] = None
         self.round_paused = False
-        self.round_pause_start_ms = None
-        self.round_total_paused_ms = 0
 
         # 球與 paddle
         self.reset_round_objects()
@@ -130,17 +300,23 @@ class Game:
     def reset_round_objects(self):
         """重置球與 paddle 的位置與速度"""
         # 球位置與速度改為隨機，避免每次都相同
-        self.reset_ball_random()
+        if self.balls is not None:
+            self.spawn_balls(self.multiball)
+        else:
+            self.reset_ball_random()
 
         # paddle 起始位置：人類在下半
-        self.human_x = WIDTH // 2 - PADDLE_W // 2
+        paddle_w = self.tuning["paddle_w"]
+        self.human_x = WIDTH // 2 - paddle_w // 2
         self.human_y = int(HEIGHT * 0.82)
 
-        self.agent_x = WIDTH // 2 - PADDLE_W // 2
+        self.agent_x = WIDTH // 2 - paddle_w // 2
         self.agent_y = int(HEIGHT * 0.75)
         self.hit_cooldown_ms = 0  # 防止同一接觸重複計分
+        self.conflict_freeze_ms = 0
 
     def reset_round_stats(self):
+        self.telemetry.reset_round()
         self.round_score = 0
         self.round_errors = 0
         self.round_collisions = 0
@@ -148,42 +324,186 @@ class Game:
         self.round_signal_sent = 0
         self.round_ball_catch = 0
         self.round_ball_miss = 0
-        self.round_start_ms = pg.time.get_ticks()
+        self.round_elapsed_ms = 0.0
         self.round_start_iso = dt.datetime.utcnow().isoformat() + "Z"
-        self.round_total_paused_ms = 0
         self.round_paused = False
-        self.round_pause_start_ms = None
         self.reset_round_objects()
         self.conflict_flash_ms = 0
+        self.agent_policy.reset()
+        self.profiler.reset_round()
+        self.audio.reset_round()
+        if self.trajectory is not None:
+            self.trajectory.start_round(
+                self.current_round, (self.current_user_id, self.condition_code), round_key(self.round_start_iso)
+            )
 
     def get_elapsed_ms(self):
         """回傳本回合已經過的毫秒數（扣掉暫停時間）"""
-        if self.round_start_ms is None:
+        return self.round_elapsed_ms
+
+    def playfield(self) -> tuple[int, int]:
+        """物理邊界（寬, 高），固定為邏輯畫面尺寸，與視窗大小無關。"""
+        return WIDTH, HEIGHT
+
+    def read_human_keys(self) -> int:
+        """取得本 tick 人類 paddle 的方向鍵狀態（KEY_* 位元遮罩）。"""
+        if self.human_policy is not None:
+            return self.human_policy(self)
+        if self.headless:
             return 0
-        now = pg.time.get_ticks()
-        if self.round_paused and self.round_pause_start_ms is not None:
-            paused_duration = now - self.round_pause_start_ms
-        else:
-            paused_duration = 0
-        return now - self.round_start_ms - self.round_total_paused_ms - paused_duration
-
-    def run(self):
-        while self.running:
-            dt = self.clock.tick(FPS) / 1000.0
-            self.handle_events()
-            self.update(dt)
-            self.draw()
+        keys = pg.key.get_pressed()
+        mask = 0
+        if keys[pg.K_LEFT]:
+            mask |= KEY_LEFT
+        if keys[pg.K_RIGHT]:
+            mask |= KEY_RIGHT
+        if keys[pg.K_UP]:
+            mask |= KEY_UP
+        if keys[pg.K_DOWN]:
+            mask |= KEY_DOWN
+        return mask
+
+    def start_recording(self):
+        self.stop_recording()
+        if self.record_dir is None:
+            return
+        stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        path = (
+            self.record_dir
+            / CONDITIONS[self.condition_code][0]
+            / str(self.current_user_id)
+            / f"session_{stamp}.rec.gz"
+        )
+        self.recorder = recording.SessionRecorder(
+            path,
+            {
+                "seed": self.session_seed,
+                "user_id": self.current_user_id,
+                "condition": self.condition_code,
+                "total_rounds": self.total_rounds,
+                "tuning": self.tuning,
+                "width": WIDTH,
+                "height": HEIGHT,
+                "fps": FPS,
+                "multiball": self.multiball,
+                "agent_policy": self.agent_policy.name,
+                "second_player": self.second_player is not None,
+                "telemetry": self.telemetry.header(),
+                "start_time": dt.datetime.utcnow().isoformat() + "Z",
+            },
+        )
+        print(f"Recording session to {path}")
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def finish_startup(self):
+        """第一個畫面出現後才做的初始化：音訊延遲校正、背景預載網路模組，並印出啟動計時。"""
+        if self._startup_done:
+            return
+        self._startup_done = True
+        if self.headless:
+            return
+        self.audio_latency_ms = self.audio.calibrate()
+        if self.audio_latency_ms is not None:
+            print(f"Audio latency: {self.audio_latency_ms:.1f} ms (buffer {self.audio_buffer})")
+        self.startup.mark("audio_calibrate")
+        warm_up = getattr(self.raw_api, "warm_up", None)
+        if warm_up is not None:
+            threading.Thread(target=warm_up, name="api-warm-up", daemon=True).start()
+        report = self.startup.report()
+        if self.audio.load_ms is not None:
+            report += f" (audio load {self.audio.load_ms:.1f}ms in background)"
+        print(report)
+
+    def run(self, max_frames: Optional[int] = None):
+        """主迴圈；max_frames 用於只量測啟動（--startup-only 時為 0）。"""
+        prof = self.profiler
+        # 先顯示 HOME 畫面，再做非必要的初始化
+        self.draw()
+        self.startup.mark("first_frame")
+        self.finish_startup()
+        self.clock.tick()  # 啟動時間不算進第一幀的 dt
+        frames = 0
+        while self.running and (max_frames is None or frames < max_frames):
+            wall, cpu = time.perf_counter(), time.process_time()
+            if self.is_idle():
+                mode = "idle"
+                self.idle_step()
+            else:
+                mode = "active"
+                dt = self.clock.tick(FPS) / 1000.0
+                prof.begin_frame()
+                prof.enter("events")
+                self.handle_events()
+                prof.exit()
+                prof.enter("update")
+                self.update(dt)
+                prof.exit()
+                prof.enter("draw")
+                self.draw()
+                prof.exit()
+                prof.end_frame()
+            spent = self.loop_time[mode]
+            spent[0] += time.perf_counter() - wall
+            spent[1] += time.process_time() - cpu
+            frames += 1
+        print(self.loop_report())
+        self.stop_recording()
+        self.session_clock.stop()
+        self.agent_policy.close()
+        if self.trajectory is not None:
+            self.trajectory.close()
         pg.quit()
         sys.exit()
 
+    def is_idle(self) -> bool:
+        """畫面只會因輸入而改變的狀態。"""
+        if not self.idle:
+            return False
+        return self.state != GameState.ROUND or self.round_paused
+
+    def idle_step(self):
+        """阻塞等待事件（最多 IDLE_REDRAW_MS），醒來後處理事件並重畫一次。"""
+        event = pg.event.wait(IDLE_REDRAW_MS)
+        prof = self.profiler
+        prof.begin_frame()
+        prof.enter("events")
+        self.handle_events([event] if event.type != pg.NOEVENT else [])
+        prof.exit()
+        prof.enter("draw")
+        self.draw()
+        prof.exit()
+        prof.end_frame()
+        # 回到固定幀率時，第一幀的 dt 從這裡起算（不含等待時間）
+        self.clock.tick()
+
+    def loop_report(self) -> str:
+        parts = []
+        for mode, (wall, cpu) in self.loop_time.items():
+            share = cpu / wall * 100 if wall > 0 else 0.0
+            parts.append(f"{mode} {wall:.1f}s wall / {cpu:.1f}s cpu ({share:.0f}%)")
+        return "[loop] " + ", ".join(parts)
+
     # --- 事件處理 ---
 
-    def handle_events(self):
-        for event in pg.event.get():
+    def handle_events(self, pending=()):
+        """pending：已經從佇列取出的事件（idle_step 等待到的那一個）。"""
+        for event in [*pending, *pg.event.get()]:
             if event.type == pg.QUIT:
                 self.running = False
+            elif self.audio.handle_event(event):
+                continue
             elif event.type == pg.VIDEORESIZE:
-                self.handle_resize(event)
+                self._resize_pending = True  # 拖曳視窗時合併成每幀最多一次
+                continue
+            elif event.type in (pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.MOUSEMOTION):
+                event = pg.event.Event(event.type, {**event.dict, "pos": self.to_logical(event.pos)})
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                self.show_profiler = not self.show_profiler
+                self._dirty_items = None
 
             if self.state == GameState.HOME:
                 self.handle_events_home(event)
@@ -220,11 +540,48 @@ class Game:
             # 目前僅保留 Enter 啟動，按鈕已移除
             pass
 
-    def handle_resize(self, event):
-        """視窗縮放時重新取得尺寸，讓 UI 保持置中。"""
-        global WIDTH, HEIGHT
-        WIDTH, HEIGHT = event.w, event.h
-        self.screen = pg.display.set_mode((WIDTH, HEIGHT), pg.RESIZABLE)
+    def setup_window(self):
+        """依目前視窗大小決定畫面輸出方式。
+
+        視窗與邏輯尺寸相同時直接畫在視窗上；否則畫在固定尺寸的 canvas，每幀縮放一次
+        貼到視窗中央（保持比例，多出的部分留黑邊）。pygame 2 的 RESIZABLE 視窗會自動
+        調整 display surface，不需要 set_mode。
+        """
+        self._resize_pending = False
+        self.window = pg.display.get_surface()
+        win_w, win_h = self.window.get_size()
+        if (win_w, win_h) == (WIDTH, HEIGHT):
+            self.screen = self.window
+            self.viewport = self.window.get_rect()
+            self._viewport_surface = None
+        else:
+            if self.screen is None or self.screen.get_size() != (WIDTH, HEIGHT) or self.screen is self.window:
+                self.screen = pg.Surface((WIDTH, HEIGHT)).convert()
+            scale = min(win_w / WIDTH, win_h / HEIGHT)
+            w, h = max(1, round(WIDTH * scale)), max(1, round(HEIGHT * scale))
+            self.viewport = pg.Rect((win_w - w) // 2, (win_h - h) // 2, w, h)
+            self.window.fill(BLACK)
+            self._viewport_surface = self.window.subsurface(self.viewport)
+        self._dirty_items = None
+
+    def to_logical(self, pos):
+        """視窗座標 -> 邏輯畫面座標（滑鼠事件用）。"""
+        vx, vy, vw, vh = self.viewport
+        return (pos[0] - vx) * WIDTH // vw, (pos[1] - vy) * HEIGHT // vh
+
+    def present(self, dirty=None):
+        """把這一幀送到視窗；dirty 為 None 表示整個畫面。"""
+        self.profiler.enter("flip")
+        if self._viewport_surface is None:
+            if dirty is None:
+                pg.display.flip()
+            else:
+                pg.display.update(dirty)
+        else:
+            # 最近鄰縮放：約 1 ms（smoothscale 在實驗室電腦上要 5 ms 以上）
+            pg.transform.scale(self.screen, self.viewport.size, self._viewport_surface)
+            pg.display.flip()
+        self.profiler.exit()
 
     def try_start_experiment(self):
         user_id_str = self.user_id_input.strip()
@@ -254,8 +611,26 @@ class Game:
             print("condition must be between 1 and 4.")
             return
 
-        self.current_user_id = user_id_val
-        self.condition_code = cond_val
+        self.begin_experiment(user_id_val, cond_val)
+
+    def begin_experiment(self, user_id: int, condition: int, seed: Optional[int] = None):
+        """設定受試者與 condition，送出實驗開始並進入第一回合。
+
+        seed 為 None 時隨機產生；實際使用的 seed 會寫進錄製檔 header。
+        """
+        self.finish_startup()  # 未經 run() 直接開始時（測試 / 腳本）
+        self.current_user_id = user_id
+        self.condition_code = condition
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.session_seed = seed
+        self.rng.seed(seed)
+        self.agent_policy.close()
+        self.agent_policy = make_policy(self.agent_policies[condition], api=self.raw_api)
+        self.session_clock.reset()
+        self.session_clock.start_periodic()  # 第一次同步也在背景執行緒，不卡住這一幀
+        self.telemetry.reset_experiment()
+        self.start_recording()
         self.current_round = 1
         # 重置總成績
         self.total_score = 0
@@ -265,45 +640,89 @@ class Game:
         self.reset_round_stats()
         self.start_round_api()
         self.state = GameState.ROUND
-        print(
-            f"Start experiment: user_id={self.current_user_id}, "
-            f"condition={self.condition_code} ({CONDITIONS[self.condition_code][0]})"
-        )
+        if not self.headless:
+            print(
+                f"Start experiment: user_id={self.current_user_id}, "
+                f"condition={self.condition_code} ({CONDITIONS[self.condition_code][0]})"
+            )
+
+    def random_ball_state(self) -> tuple[float, float, float, float]:
+        """隨機產生球的位置與速度 (x, y, vx, vy)。"""
+        ball_r = self.tuning["ball_r"]
+        rng = self.rng
+        x = rng.randint(ball_r + 10, WIDTH - ball_r - 10)
+        y = rng.randint(HEIGHT // 6, HEIGHT // 3)
+        # 隨機速度與方向，確保 vy 往下（整體慢一些）
+        speed_x = rng.randint(2, 7)
+        speed_y = rng.randint(2, 6)
+        vx = speed_x if rng.choice([True, False]) else -speed_x
+        vx, vy = self.clamped(vx, speed_y)
+        return x, y, vx, vy
 
     def reset_ball_random(self):
         """球落地或回合開始時，隨機重生球的位置與速度。"""
-        self.ball_x = random.randint(BALL_R + 10, WIDTH - BALL_R - 10)
-        self.ball_y = random.randint(HEIGHT // 6, HEIGHT // 3)
-        # 隨機速度與方向，確保 vy 往下（整體慢一些）
-        speed_x = random.randint(2, 7)
-        speed_y = random.randint(2, 6)
-        self.ball_vx = speed_x if random.choice([True, False]) else -speed_x
-        self.ball_vy = speed_y
-        self.clamp_ball_speed()
+        self.ball_x, self.ball_y, self.ball_vx, self.ball_vy = self.random_ball_state()
         self.round_ball_spawn += 1
         self.log_event("ball_spawn", triggered_by="system")
 
-    def clamp_ball_speed(self):
+    def clamped(self, vx: float, vy: float) -> tuple[float, float]:
         """避免速度過低或過高，控制在合理範圍。"""
-        max_speed = 12
-        min_speed = 2.0
-        self.ball_vx = max(-max_speed, min(max_speed, self.ball_vx))
-        self.ball_vy = max(-max_speed, min(max_speed, self.ball_vy))
-        if 0 < abs(self.ball_vx) < min_speed:
-            self.ball_vx = min_speed if self.ball_vx >= 0 else -min_speed
-        if 0 < abs(self.ball_vy) < min_speed:
-            self.ball_vy = min_speed if self.ball_vy >= 0 else -min_speed
+        max_speed = self.tuning["max_speed"]
+        min_speed = self.tuning["min_speed"]
+        vx = max(-max_speed, min(max_speed, vx))
+        vy = max(-max_speed, min(max_speed, vy))
+        if 0 < abs(vx) < min_speed:
+            vx = min_speed if vx >= 0 else -min_speed
+        if 0 < abs(vy) < min_speed:
+            vy = min_speed if vy >= 0 else -min_speed
+        return vx, vy
 
-    def rotate_velocity(self, deg_min: float = 30, deg_max: float = 50) -> None:
+    def clamp_ball_speed(self):
+        self.ball_vx, self.ball_vy = self.clamped(self.ball_vx, self.ball_vy)
+
+    def rotated(self, vx: float, vy: float, deg_min: float = 30, deg_max: float = 50) -> tuple[float, float]:
         """將速度向量旋轉一個隨機角度（deg_min~deg_max），增加角度變化。"""
-        angle_deg = random.uniform(deg_min, deg_max)
-        angle_deg *= 1 if random.choice([True, False]) else -1
+        angle_deg = self.rng.uniform(deg_min, deg_max)
+        angle_deg *= 1 if self.rng.choice([True, False]) else -1
         angle_rad = math.radians(angle_deg)
         cos_a = math.cos(angle_rad)
         sin_a = math.sin(angle_rad)
-        vx, vy = self.ball_vx, self.ball_vy
-        self.ball_vx = vx * cos_a - vy * sin_a
-        self.ball_vy = vx * sin_a + vy * cos_a
+        return vx * cos_a - vy * sin_a, vx * sin_a + vy * cos_a
+
+    def rotate_velocity(self, deg_min: float = 30, deg_max: float = 50) -> None:
+        self.ball_vx, self.ball_vy = self.rotated(self.ball_vx, self.ball_vy, deg_min, deg_max)
+
+    # --- 多球模式 ---
+
+    def spawn_balls(self, count: int) -> None:
+        self.balls.clear()
+        for _ in range(count):
+            self.balls.add(*self.random_ball_state())
+            self.round_ball_spawn += 1
+            self.log_event("ball_spawn", triggered_by="system", ball_index=self.balls.n - 1)
+        self.sync_focus_ball()
+
+    def sync_focus_ball(self) -> None:
+        """把最需要處理的球同步到 ball_x / ball_y…，讓代理與單球邏輯照常運作。"""
+        if self.balls.n:
+            self.ball_x, self.ball_y, self.ball_vx, self.ball_vy = self.balls.state(self.balls.focus_index())
+
+    def multiball_caught(self, i: int, who: str) -> None:
+        vx, vy = self.rotated(self.balls.vx[i], -abs(self.balls.vy[i]), 30, 50)
+        self.balls.vx[i], self.balls.vy[i] = self.clamped(vx, -abs(vy))
+        self.round_score += 1
+        self.round_ball_catch += 1
+        self.audio.play("drum")
+        self.log_event("ball_catch", triggered_by=who, ball_index=i)
+
+    def multiball_missed(self, i: int) -> None:
+        self.round_errors += 1
+        self.round_ball_miss += 1
+        self.audio.play("denied")
+        self.log_event("ball_miss", triggered_by="system", ball_index=i)
+        self.balls.set_ball(i, *self.random_ball_state())
+        self.round_ball_spawn += 1
+        self.log_event("ball_spawn", triggered_by="system", ball_index=i)
 
     # --- API / LOGGING ---
     def _agent_human_flags(self) -> tuple[bool, bool]:
@@ -323,19 +742,32 @@ class Game:
         triggered_by: str = "system",
         signal_type: str = "NA",
         dir_ratio: Optional[float] = None,
+        ball_index: Optional[int] = None,
     ) -> None:
+        """ball_index：多球模式下事件所屬的球（在 self.balls 中的位置），記錄其 id 與狀態。"""
+        if self.api is None:
+            return
         if self.current_user_id is None or self.condition_code is None or self.current_round is None:
             return
-        speed = math.sqrt(self.ball_vx ** 2 + self.ball_vy ** 2)
-        angle = math.degrees(math.atan2(self.ball_vy, self.ball_vx))
+        # 取樣設定在組 payload 之前判斷：被擋下的事件不花任何序列化 / 網路成本
+        if not self.telemetry.allow(event_type, self.round_elapsed_ms):
+            return
+        if ball_index is None:
+            ball_id = None
+            ball_x, ball_y, ball_vx, ball_vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+        else:
+            ball_id = self.balls.ids[ball_index]
+            ball_x, ball_y, ball_vx, ball_vy = self.balls.state(ball_index)
+        speed = math.sqrt(ball_vx ** 2 + ball_vy ** 2)
+        angle = math.degrees(math.atan2(ball_vy, ball_vx))
         payload = {
             "user_id": self.current_user_id,
             "condition": self.condition_code,
             "round_id": self.current_round,
             "timestamp": dt.datetime.utcnow().isoformat() + "Z",
             "event_type": event_type,
-            "ball_x": int(self.ball_x),
-            "ball_y": int(self.ball_y),
+            "ball_x": int(ball_x),
+            "ball_y": int(ball_y),
             "human_x": int(self.human_x),
             "human_y": int(self.human_y),
             "agent_x": int(self.agent_x),
@@ -345,55 +777,80 @@ class Game:
             "dir_ratio": dir_ratio,
             "ball_speed": round(speed, 3),
             "ball_angle": round(angle, 3),
+            "ball_id": ball_id,
+            "client_ns": self.session_clock.now_ns(),
+            "clock_offset_ns": self.session_clock.offset_ns,
+            # 回合內的遊戲時間（不含暫停，與軌跡檔的時間軸相同）
+            "round_ms": round(self.round_elapsed_ms, 3),
         }
-        api_client.log_event(payload)
+        self.api.log_event(payload)
 
     def start_experiment_api(self):
+        if self.api is None:
+            self.exp_start_iso = dt.datetime.utcnow().isoformat() + "Z"
+            self.exp_logged = False
+            return
         if self.current_user_id is None or self.condition_code is None:
             return
         self.exp_start_iso = dt.datetime.utcnow().isoformat() + "Z"
         self.exp_logged = False
-        api_client.start_experiment(
+        self.api.start_experiment(
             self.current_user_id,
             self.condition_code,
             self.total_rounds,
             notes="",
             exp_start_time=self.exp_start_iso,
+            audio_buffer=self.audio_buffer,
+            audio_latency_ms=self.audio_latency_ms,
+            clock_offset_ns=self.session_clock.offset_ns,
+            clock_rtt_ms=self.session_clock.rtt_ms,
+            telemetry=self.telemetry.describe(),
         )
 
     def end_experiment_api(self):
+        if self.api is None:
+            self.exp_logged = True
+            return
         if self.current_user_id is None or self.condition_code is None or self.exp_start_iso is None:
             return
         exp_end = dt.datetime.utcnow().isoformat() + "Z"
-        api_client.end_experiment(
+        self.api.end_experiment(
             self.current_user_id,
             self.condition_code,
             self.exp_start_iso,
             exp_end,
             self.total_rounds,
             notes="",
+            telemetry_dropped=self.telemetry.describe_dropped(),
+            clock_offset_ns=self.session_clock.offset_ns,
+            clock_rtt_ms=self.session_clock.rtt_ms,
         )
         self.exp_logged = True
 
     def start_round_api(self):
+        if self.api is None:
+            return
         if self.current_user_id is None or self.condition_code is None or self.round_start_iso is None:
             return
         agent_active, human_active = self._agent_human_flags()
-        api_client.start_round(
+        self.api.start_round(
             self.current_user_id,
             self.condition_code,
             self.current_round,
             agent_active,
             human_active,
             self.round_start_iso,
+            client_ns=self.session_clock.now_ns(),
         )
 
     def end_round_api(self):
+        if self.api is None:
+            return
         if self.current_user_id is None or self.condition_code is None or self.round_start_iso is None:
             return
         agent_active, human_active = self._agent_human_flags()
         round_end = dt.datetime.utcnow().isoformat() + "Z"
-        api_client.end_round(
+        self.api.end_round(
             self.current_user_id,
             self.condition_code,
             self.current_round,
@@ -408,6 +865,20 @@ class Game:
             self.round_ball_miss,
             agent_active,
             human_active,
+            client_ns=self.session_clock.now_ns(),
+        )
+
+    def round_profile_api(self):
+        """把本回合的效能摘要與回合資料一起送出。"""
+        if self.api is None:
+            return
+        if self.current_user_id is None or self.condition_code is None:
+            return
+        self.api.round_profile(
+            self.current_user_id,
+            self.condition_code,
+            self.current_round,
+            {**self.profiler.round_summary(), **self.audio.round_summary()},
         )
 
     def handle_events_round(self, event):
@@ -444,20 +915,15 @@ class Game:
                 self.go_home()
 
     def toggle_pause(self):
-        if not self.round_paused:
-            # 進入暫停
-            self.round_paused = True
-            self.round_pause_start_ms = pg.time.get_ticks()
-        else:
-            # 結束暫停，補償時間
-            now = pg.time.get_ticks()
-            if self.round_pause_start_ms is not None:
-                self.round_total_paused_ms += now - self.round_pause_start_ms
-            self.round_pause_start_ms = None
-            self.round_paused = False
+        # 暫停期間 update_round 不累加回合時間，不需另外補償
+        self.round_paused = not self.round_paused
+        if self.recorder is not None:
+            self.recorder.command(recording.OP_PAUSE)
 
     def go_home(self):
         # 回首頁時重置狀態，但保留已輸入的 user_id / condition（你要清空也可以改這裡）
+        if self.recorder is not None:
+            self.recorder.command(recording.OP_HOME)
         if self.state == GameState.ROUND:
             self.finish_round()
         if self.exp_start_iso and not self.exp_logged:
@@ -466,38 +932,55 @@ class Game:
         self.current_user_id = None
         self.condition_code = None
         self.current_round = 0
-        self.round_start_ms = None
+        self.round_elapsed_ms = 0.0
         self.round_paused = False
-        self.round_pause_start_ms = None
-        self.round_total_paused_ms = 0
         self.total_score = 0
         self.total_errors = 0
-        print("Return to HOME")
+        self.stop_recording()
+        self.session_clock.stop()
+        if not self.headless:
+            print("Return to HOME")
 
     def go_next_round_or_done(self):
+        if self.recorder is not None:
+            self.recorder.command(recording.OP_NEXT)
         if self.current_round < self.total_rounds:
             self.current_round += 1
             self.reset_round_stats()
             self.start_round_api()
             self.state = GameState.ROUND
-            print(f"Start round {self.current_round}")
+            if not self.headless:
+                print(f"Start round {self.current_round}")
         else:
             # 結束實驗
             if not self.exp_logged and self.exp_start_iso:
                 self.end_experiment_api()
             self.state = GameState.DONE
-            print("Experiment DONE")
+            self.stop_recording()
+            self.session_clock.stop()
+            if not self.headless:
+                print("Experiment DONE")
 
     def finish_round(self):
         self.round_end_iso = dt.datetime.utcnow().isoformat() + "Z"
         self.total_score += self.round_score
         self.total_errors += self.round_errors
         self.end_round_api()
+        self.round_profile_api()
+        if self.trajectory is not None:
+            self.trajectory.flush()
 
     # --- 更新邏輯 ---
 
     def update(self, dt):
         if self.state == GameState.ROUND:
+            # 每個 tick 只讀一次輸入，錄製與物理使用同一份狀態
+            self.human_keys = self.read_human_keys()
+            if self.second_player is not None:
+                self.agent_keys = self.second_player(self)
+            if self.recorder is not None:
+                # 低 4 位元為人類、高 4 位元為第二位玩家的方向鍵
+                self.recorder.tick(dt, self.human_keys | self.agent_keys << 4)
             self.update_round(dt)
 
     def update_round(self, dt):
@@ -505,12 +988,19 @@ class Game:
         if self.round_paused:
             return
 
-        # 接球冷卻（避免單次重疊多次得分）
-        if getattr(self, "hit_cooldown_ms", 0) > 0:
+        t = self.tuning
+        paddle_w, paddle_h = t["paddle_w"], t["paddle_h"]
+        self.round_elapsed_ms += dt * 1000
+        # 本 step 的物理長度（frame）；預設每 tick 一個 frame，dt_physics 時依 dt 換算
+        frames = dt * FPS if self.dt_physics else 1.0
+
+        # 接球冷卻（避免單次重疊多次得分）；cool_frames = 本 step 內冷卻結束的時間點
+        cool_frames = self.hit_cooldown_ms / (1000 / FPS)
+        if self.hit_cooldown_ms > 0:
             self.hit_cooldown_ms = max(0, self.hit_cooldown_ms - dt * 1000)
 
         # 衝突暫停：只凍結 paddle，球照常運動
-        freeze_active = getattr(self, "conflict_freeze_ms", 0) > 0
+        freeze_active = self.conflict_freeze_ms > 0
         if freeze_active:
             self.conflict_freeze_ms = max(0, self.conflict_freeze_ms - dt * 1000)
 
@@ -518,56 +1008,37 @@ class Game:
         if self.conflict_flash_ms > 0:
             self.conflict_flash_ms = max(0, self.conflict_flash_ms - dt * 1000)
 
-        # 更新球
-        self.ball_x += self.ball_vx
-        self.ball_y += self.ball_vy
-
-        # 邊界反彈
-        if self.ball_x - BALL_R <= 0 or self.ball_x + BALL_R >= WIDTH:
-            self.ball_vx *= -1
-            # 每次反彈旋轉角度 30~50 度
-            self.rotate_velocity(30, 50)
-            self.clamp_ball_speed()
-        if self.ball_y - BALL_R <= 0:
-            self.ball_vy *= -1
-            self.rotate_velocity(30, 50)
-            # 反彈後仍確保往下
-            self.ball_vy = abs(self.ball_vy)
-            self.clamp_ball_speed()
+        # 更新球：連續碰撞，依撞擊時間處理牆 / paddle / 落地（一個 step 內可多次反彈）
+        if self.balls is not None:
+            self.balls.step(self, frames, WIDTH, HEIGHT)
+            self.sync_focus_ball()
+        else:
+            self.sweep_ball(frames, cool_frames)
 
         if not freeze_active:
-            keys = pg.key.get_pressed()
             # 人類 paddle 控制：上下左右
-            speed = 3.5
-            if keys[pg.K_LEFT]:
-                self.human_x -= speed
-            if keys[pg.K_RIGHT]:
-                self.human_x += speed
-            if keys[pg.K_UP]:
-                self.human_y -= speed
-            if keys[pg.K_DOWN]:
-                self.human_y += speed
-
-            # 代理 AI：朝球靠近，限制在下半部，增加 y 軸隨機性
-            agent_speed = 3
-            if self.ball_x > self.agent_x + PADDLE_W / 2:
-                self.agent_x += agent_speed
-            elif self.ball_x < self.agent_x + PADDLE_W / 2:
-                self.agent_x -= agent_speed
-            jitter = random.uniform(-1.5, 1.5)
-            target_y = self.ball_y + jitter * 40
-            if target_y > self.agent_y + PADDLE_H / 2:
-                self.agent_y += agent_speed
-            elif target_y < self.agent_y + PADDLE_H / 2:
-                self.agent_y -= agent_speed
+            speed = t["human_speed"] * frames
+            self.human_x, self.human_y = move_by_keys(self.human_x, self.human_y, self.human_keys, speed)
 
-        # 限制在人類/代理的工作區域（下半部）
-        self.human_x = max(0, min(WIDTH - PADDLE_W, self.human_x))
-        self.human_y = max(HEIGHT // 2, min(HEIGHT - PADDLE_H, self.human_y))
+            if self.second_player is not None:
+                # 第二位玩家：與人類相同的方向鍵控制與速度
+                self.agent_x, self.agent_y = move_by_keys(self.agent_x, self.agent_y, self.agent_keys, speed)
+            else:
+                # 代理 AI：朝策略給的目標靠近（見 agent_policy.py）
+                agent_speed = t["agent_speed"] * frames
+                target_x, target_y = self.agent_policy.target(self)
+                if target_x > self.agent_x + paddle_w / 2:
+                    self.agent_x += agent_speed
+                elif target_x < self.agent_x + paddle_w / 2:
+                    self.agent_x -= agent_speed
+                if target_y > self.agent_y + paddle_h / 2:
+                    self.agent_y += agent_speed
+                elif target_y < self.agent_y + paddle_h / 2:
+                    self.agent_y -= agent_speed
 
-        min_agent_y = int(HEIGHT * 0.55)  # 讓代理更貼近下方，不要卡在頂端
-        self.agent_x = max(0, min(WIDTH - PADDLE_W, self.agent_x))
-        self.agent_y = max(min_agent_y, min(HEIGHT - PADDLE_H, self.agent_y))
+        # 限制在人類/代理的工作區域（下半部）
+        self.human_x, self.human_y = clamp_paddle(self.human_x, self.human_y, "human", paddle_w, paddle_h)
+        self.agent_x, self.agent_y = clamp_paddle(self.agent_x, self.agent_y, "agent", paddle_w, paddle_h)
 
         # Agent 暫時固定不動（之後換成 DIR + rule-based 移動）
         # self.agent_x += 4
@@ -575,60 +1046,136 @@ class Game:
         #     self.agent_x = max(0, min(WIDTH - PADDLE_W, self.agent_x))
 
         # 碰撞檢查（簡單版）
+        self.profiler.enter("collisions")
         self.check_collisions()
+        self.profiler.exit()
+
+        if self.trajectory is not None:
+            self.trajectory.record(
+                self.round_elapsed_ms,
+                self.ball_x,
+                self.ball_y,
+                self.human_x,
+                self.human_y,
+                self.agent_x,
+                self.agent_y,
+                self.human_keys,
+            )
 
         # 檢查回合時間是否結束
         elapsed = self.get_elapsed_ms()
         if elapsed >= ROUND_DURATION_MS:
             self.finish_round()
             self.state = GameState.BREAK
-            print(
-                f"End round {self.current_round}: score={self.round_score}, "
-                f"errors={self.round_errors}"
-            )
+            if not self.headless:
+                print(
+                    f"End round {self.current_round}: score={self.round_score}, "
+                    f"errors={self.round_errors}"
+                )
+
+    def sweep_ball(self, frames: float, cool_frames: float) -> None:
+        """把球往前推進 frames 個 frame，依最早撞擊時間逐一處理事件。
+
+        paddle 以本 step 開始時的位置計算；cool_frames 之前不會判定接球（接球冷卻）。
+        """
+        t = self.tuning
+        ball_r, paddle_w, paddle_h = t["ball_r"], t["paddle_w"], t["paddle_h"]
+        ms_per_frame = 1000 / FPS
+        paddles = (("human", self.human_x, self.human_y), ("agent", self.agent_x, self.agent_y))
+        now = 0.0
+        for _ in range(physics.MAX_SWEEP_EVENTS):
+            remaining = frames - now
+            x, y, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+            hit_t, hit = remaining, None
+
+            side = physics.wall_toi(x, vx, ball_r, WIDTH - ball_r)
+            if side is not None and side[0] <= hit_t:
+                hit_t, hit = side[0], ("left" if side[1] < 0 else "right")
+            vert = physics.wall_toi(y, vy, ball_r, HEIGHT + ball_r)
+            if vert is not None and vert[0] <= hit_t:
+                hit_t, hit = vert[0], ("top" if vert[1] < 0 else "miss")
+            for who, px, py in paddles:
+                span = physics.ray_aabb(
+                    x, y, vx, vy, px - ball_r, py - ball_r, px + paddle_w + ball_r, py + paddle_h + ball_r
+                )
+                if span is None:
+                    continue
+                t_hit = max(span[0], cool_frames - now, 0.0)
+                if t_hit <= span[1] and t_hit < hit_t:
+                    hit_t, hit = t_hit, who
+
+            self.ball_x = x + vx * hit_t
+            self.ball_y = y + vy * hit_t
+            now += hit_t
+            if hit is None:
+                return
+
+            if hit in ("left", "right"):
+                # 每次反彈旋轉角度 30~50 度，並確保離開牆面
+                self.ball_vx = -self.ball_vx
+                self.rotate_velocity(30, 50)
+                self.ball_vx = abs(self.ball_vx) if hit == "left" else -abs(self.ball_vx)
+                self.clamp_ball_speed()
+            elif hit == "top":
+                self.ball_vy *= -1
+                self.rotate_velocity(30, 50)
+                # 反彈後仍確保往下
+                self.ball_vy = abs(self.ball_vy)
+                self.clamp_ball_speed()
+            elif hit == "miss":
+                self.ball_missed()
+            else:
+                self.ball_caught(hit, count=True)
+                cool_frames = now + t["hit_cooldown_ms"] / ms_per_frame
+                # 冷卻從撞擊當下起算，扣掉 step 剩餘的時間
+                self.hit_cooldown_ms = max(0, t["hit_cooldown_ms"] - (frames - now) * ms_per_frame)
+
+    def ball_caught(self, who: str, count: bool) -> None:
+        """球碰到 paddle：往上彈並旋轉；count=False 時只記錄事件不重複加分。"""
+        self.ball_vy = -abs(self.ball_vy)  # 向上彈
+        self.rotate_velocity(30, 50)
+        self.ball_vy = -abs(self.ball_vy)
+        self.clamp_ball_speed()
+        if count:
+            self.round_score += 1
+            self.round_ball_catch += 1
+        self.hit_cooldown_ms = self.tuning["hit_cooldown_ms"]  # 冷卻期間不重複加分
+        self.audio.play("drum")
+        self.log_event("ball_catch", triggered_by=who)
+
+    def ball_missed(self) -> None:
+        """球落出畫面底部 → 失誤一次（paddle 不重置，球隨機重生）。"""
+        self.round_errors += 1
+        self.round_ball_miss += 1
+        self.reset_ball_random()
+        self.audio.play("denied")
+        self.log_event("ball_miss", triggered_by="system")
 
     def check_collisions(self):
+        """paddle 移動後的重疊判定：paddle 蓋到球上、paddle 互撞。"""
+        t = self.tuning
+        ball_r, paddle_w, paddle_h = t["ball_r"], t["paddle_w"], t["paddle_h"]
         # 球和人類、代理人 paddle
-        human_rect = pg.Rect(self.human_x, self.human_y, PADDLE_W, PADDLE_H)
-        agent_rect = pg.Rect(self.agent_x, self.agent_y, PADDLE_W, PADDLE_H)
+        human_rect = pg.Rect(self.human_x, self.human_y, paddle_w, paddle_h)
+        agent_rect = pg.Rect(self.agent_x, self.agent_y, paddle_w, paddle_h)
         ball_rect = pg.Rect(
-            self.ball_x - BALL_R, self.ball_y - BALL_R, BALL_R * 2, BALL_R * 2
+            self.ball_x - ball_r, self.ball_y - ball_r, ball_r * 2, ball_r * 2
         )
 
-        caught = False
+        # 多球模式的球已在 BallField.step 處理，這裡只剩 paddle 互撞
+        if self.balls is None:
+            caught = False
 
-        if ball_rect.colliderect(human_rect) and self.hit_cooldown_ms <= 0:
-            self.ball_vy = -abs(self.ball_vy)  # 向上彈
-            self.rotate_velocity(30, 50)
-            self.ball_vy = -abs(self.ball_vy)
-            self.clamp_ball_speed()
-            self.round_score += 1
-            self.round_ball_catch += 1
-            caught = True
-            self.hit_cooldown_ms = 250  # 0.25 秒內不重複加分
-            self.audio.play(self.audio.snd_drum)
-            self.log_event("ball_catch", triggered_by="human")
-
-        if ball_rect.colliderect(agent_rect) and self.hit_cooldown_ms <= 0:
-            self.ball_vy = -abs(self.ball_vy)  # 同樣往上打
-            self.rotate_velocity(30, 50)
-            self.ball_vy = -abs(self.ball_vy)
-            self.clamp_ball_speed()
-            if not caught:
-                self.round_score += 1
-                self.round_ball_catch += 1
+            if ball_rect.colliderect(human_rect) and self.hit_cooldown_ms <= 0:
+                self.ball_caught("human", count=True)
                 caught = True
-            self.hit_cooldown_ms = 250
-            self.audio.play(self.audio.snd_drum)
-            self.log_event("ball_catch", triggered_by="agent")
-
-        # 球落出畫面底部 → 失誤一次（paddle 不重置，球隨機重生）
-        if self.ball_y - BALL_R > HEIGHT:
-            self.round_errors += 1
-            self.round_ball_miss += 1
-            self.reset_ball_random()
-            self.audio.play(self.audio.snd_denied)
-            self.log_event("ball_miss", triggered_by="system")
+
+            if ball_rect.colliderect(agent_rect) and self.hit_cooldown_ms <= 0:
+                self.ball_caught("agent", count=not caught)
+
+            # 球落出畫面底部（連續碰撞通常已處理，這裡保險再檢查一次）
+            if self.ball_y - ball_r > HEIGHT:
+                self.ball_missed()
 
         # paddle 互相碰撞：彈開 + 閃爍（暫停）
         if human_rect.colliderect(agent_rect):
@@ -636,17 +1183,26 @@ class Game:
             push = overlap.height / 2 + 2
             self.human_y += push
             self.agent_y -= push
-            self.human_y = max(HEIGHT // 2, min(HEIGHT - PADDLE_H, self.human_y))
-            self.agent_y = max(HEIGHT // 2, min(HEIGHT - PADDLE_H, self.agent_y))
+            self.human_y = max(HEIGHT // 2, min(HEIGHT - paddle_h, self.human_y))
+            self.agent_y = max(HEIGHT // 2, min(HEIGHT - paddle_h, self.agent_y))
             self.round_collisions += 1
             self.conflict_flash_ms = 300
-            self.conflict_freeze_ms = 300
-            self.audio.play(self.audio.snd_wrong)
+            self.conflict_freeze_ms = t["conflict_freeze_ms"]
+            self.audio.play("wrong")
             self.log_event("paddle_collision", triggered_by="system")
 
     # --- 繪圖 ---
 
     def draw(self):
+        if self._resize_pending:
+            self.setup_window()
+        if self.state != self._drawn_state:
+            self._drawn_state = self.state
+            self._dirty_items = None
+        if self.dirty_rects and self.state == GameState.ROUND:
+            self.draw_round_dirty()
+            return
+
         self.screen.fill(BG_COLOR)
 
         if self.state == GameState.HOME:
@@ -657,8 +1213,11 @@ class Game:
             self.draw_break()
         elif self.state == GameState.DONE:
             self.draw_done()
+        if self.state != GameState.ROUND:
+            for _, img, rect in self.profiler_items():
+                self.screen.blit(img, rect)
 
-        pg.display.flip()
+        self.present()
 
     def draw_home(self):
         # 標題
@@ -673,11 +1232,11 @@ class Game:
         box_x = label_x + 200  # 左側留給標籤
 
         # condition 列
-        cond_label = self.font_medium.render("condition (1~4):", True, WHITE)
+        cond_label = TEXT_CACHE.render("condition (1~4):", self.font_medium, WHITE)
         cond_y = base_y
         self.screen.blit(cond_label, (label_x, cond_y - cond_label.get_height() // 2))
         cond_box = pg.Rect(box_x, cond_y - box_height // 2, box_width, box_height)
-        pg.draw.rect(self.screen, WHITE, cond_box, width=2, border_radius=6)
+        self.screen.blit(SPRITES.rounded_rect(box_width, box_height, WHITE, 6, width=2), cond_box)
         draw_text(
             self.screen,
             self.condition_input or "plz input 1~4",
@@ -687,11 +1246,11 @@ class Game:
         )
 
         # user_id 列
-        user_label = self.font_medium.render("user_id:", True, WHITE)
+        user_label = TEXT_CACHE.render("user_id:", self.font_medium, WHITE)
         user_y = base_y + row_gap
         self.screen.blit(user_label, (label_x, user_y - user_label.get_height() // 2))
         user_box = pg.Rect(box_x, user_y - box_height // 2, box_width, box_height)
-        pg.draw.rect(self.screen, WHITE, user_box, width=2, border_radius=6)
+        self.screen.blit(SPRITES.rounded_rect(box_width, box_height, WHITE, 6, width=2), user_box)
         draw_text(
             self.screen,
             self.user_id_input or "plz input user_id",
@@ -716,84 +1275,73 @@ class Game:
             center=True,
         )
 
-    def draw_round(self):
+    def round_items(self) -> list:
+        """回合畫面的所有元素（依繪製順序）：(key, surface, rect)。"""
+        items = []
+
         # 上方 UI
         # Pause / Home 按鈕
-        pg.draw.rect(self.screen, GRAY, self.pause_button_rect, border_radius=6)
-        draw_text(
-            self.screen,
-            "Resume" if self.round_paused else "Pause",
-            self.font_small,
-            WHITE,
-            self.pause_button_rect.center,
-            center=True,
+        pause_rect = self.pause_button_rect
+        items.append(("pause_btn", SPRITES.rounded_rect(pause_rect.w, pause_rect.h, GRAY, 6), pause_rect))
+        items.append(
+            ("pause_label",)
+            + text_sprite(
+                "Resume" if self.round_paused else "Pause",
+                self.font_small,
+                WHITE,
+                pause_rect.center,
+                center=True,
+            )
         )
 
-        pg.draw.rect(self.screen, GRAY, self.home_button_rect, border_radius=6)
-        draw_text(
-            self.screen,
-            "Home",
-            self.font_small,
-            WHITE,
-            self.home_button_rect.center,
-            center=True,
-        )
+        home_rect = self.home_button_rect
+        items.append(("home_btn", SPRITES.rounded_rect(home_rect.w, home_rect.h, GRAY, 6), home_rect))
+        items.append(("home_label",) + text_sprite("Home", self.font_small, WHITE, home_rect.center, center=True))
 
         # Score / Errors
         score_text = f"Score: {self.round_score}"
         error_text = f"Errors: {self.round_errors}"
-        draw_text(
-            self.screen,
-            score_text,
-            self.font_small,
-            WHITE,
-            (WIDTH // 2 - 80, 20),
-        )
-        draw_text(
-            self.screen,
-            error_text,
-            self.font_small,
-            WHITE,
-            (WIDTH // 2 - 80, 45),
-        )
+        items.append(("score",) + text_sprite(score_text, self.font_small, WHITE, (WIDTH // 2 - 80, 20)))
+        items.append(("errors",) + text_sprite(error_text, self.font_small, WHITE, (WIDTH // 2 - 80, 45)))
 
         # 計時
         elapsed = self.get_elapsed_ms()
         remaining_sec = max(0, int((ROUND_DURATION_MS - elapsed) / 1000))
         time_text = f"Time left: {remaining_sec}s"
-        draw_text(
-            self.screen,
-            time_text,
-            self.font_small,
-            WHITE,
-            (WIDTH // 2 + 120, 20),
-        )
-
-        # 畫球
-        pg.draw.circle(
-            self.screen,
-            WHITE,
-            (int(self.ball_x), int(self.ball_y)),
-            BALL_R,
-        )
+        items.append(("time",) + text_sprite(time_text, self.font_small, WHITE, (WIDTH // 2 + 120, 20)))
+
+        # 球
+        ball_r = self.tuning["ball_r"]
+        ball_img = SPRITES.circle(ball_r, WHITE)
+        if self.balls is not None:
+            size = ball_r * 2 + 1
+            balls = self.balls
+            for i in range(balls.n):
+                rect = pg.Rect(int(balls.x[i]) - ball_r, int(balls.y[i]) - ball_r, size, size)
+                items.append((balls.ids[i], ball_img, rect))
+        else:
+            items.append(("ball", ball_img, ball_img.get_rect(topleft=(int(self.ball_x) - ball_r, int(self.ball_y) - ball_r))))
 
         # paddles（衝突時閃爍）
+        paddle_w, paddle_h = self.tuning["paddle_w"], self.tuning["paddle_h"]
         flash = self.conflict_flash_ms > 0
         human_color = (255, 90, 90) if flash else BLUE
         agent_color = (255, 200, 90) if flash else ORANGE
 
-        pg.draw.rect(
-            self.screen,
-            human_color,
-            (int(self.human_x), int(self.human_y), PADDLE_W, PADDLE_H),
-            border_radius=6,
+        items.append(
+            (
+                "human",
+                SPRITES.rounded_rect(paddle_w, paddle_h, human_color, 6),
+                pg.Rect(int(self.human_x), int(self.human_y), paddle_w, paddle_h),
+            )
         )
         #agent 註解
-        pg.draw.rect(
-            self.screen,
-            agent_color,
-            (int(self.agent_x), int(self.agent_y), PADDLE_W, PADDLE_H),
-            border_radius=6,
+        items.append(
+            (
+                "agent",
+                SPRITES.rounded_rect(paddle_w, paddle_h, agent_color, 6),
+                pg.Rect(int(self.agent_x), int(self.agent_y), paddle_w, paddle_h),
+            )
         )
 
         # 顯示 round 與 condition
@@ -803,13 +1351,62 @@ class Game:
             f"Round {self.current_round}/{self.total_rounds} | "
             f"Condition: {cond_label}"
         )
-        draw_text(
-            self.screen,
-            info_text,
-            self.font_small,
-            LIGHT_GRAY,
-            (20, HEIGHT - 30),
-        )
+        items.append(("info",) + text_sprite(info_text, self.font_small, LIGHT_GRAY, (20, HEIGHT - 30)))
+        items.extend(self.profiler_items())
+        return items
+
+    def profiler_items(self) -> list:
+        """F3 效能資訊（每 15 幀更新一次文字，避免每幀重新 rasterize）。"""
+        if not self.show_profiler:
+            return []
+        if not self._profiler_lines or self.profiler.frames % 15 == 0:
+            self._profiler_lines = self.profiler.overlay_lines()
+        return [
+            (f"profiler_{i}",) + text_sprite(line, self.font_small, LIGHT_GRAY, (WIDTH - 360, 70 + i * 24))
+            for i, line in enumerate(self._profiler_lines)
+        ]
+
+    def draw_round(self):
+        for _, img, rect in self.round_items():
+            self.screen.blit(img, rect)
+
+    def draw_round_dirty(self):
+        """Dirty-rect 模式：只擦除 / 重畫位置或內容有變的元素，並只更新那些區域。"""
+        items = self.round_items()
+        prev = self._dirty_items
+        self._dirty_items = {key: (img, rect) for key, img, rect in items}
+
+        if prev is None:
+            # 狀態切換 / 縮放後的第一幀：整張重畫
+            self.screen.fill(BG_COLOR)
+            for _, img, rect in items:
+                self.screen.blit(img, rect)
+            self.present()
+            return
+
+        dirty = []
+        for key, img, rect in items:
+            old = prev.get(key)
+            if old is None:
+                dirty.append(rect)
+            elif old[0] is not img or old[1] != rect:
+                dirty.append(old[1])
+                dirty.append(rect)
+        for key, (_, rect) in prev.items():
+            if key not in self._dirty_items:
+                dirty.append(rect)
+        if not dirty:
+            return
+
+        # 每個 dirty 區域：清成背景，再依序重畫與之相交的元素（以 clip 限制範圍）
+        for region in dirty:
+            self.screen.set_clip(region)
+            self.screen.fill(BG_COLOR)
+            for _, img, rect in items:
+                if rect.colliderect(region):
+                    self.screen.blit(img, rect)
+        self.screen.set_clip(None)
+        self.present(dirty)
 
     def draw_break(self):
         # 回合結果畫面
@@ -849,7 +1446,7 @@ class Game:
         # 中間當作「按鈕」的區域
         center_rect = pg.Rect(0, 0, 400, 60)
         center_rect.center = (WIDTH // 2, HEIGHT // 2 + 80)
-        pg.draw.rect(self.screen, GRAY, center_rect, border_radius=8)
+        self.screen.blit(SPRITES.rounded_rect(center_rect.w, center_rect.h, GRAY, 8), center_rect)
         draw_text(
             self.screen,
             btn_text,
@@ -904,9 +1501,80 @@ class Game:
         )
 
 
-def main():
-    game = Game()
-    game.run()
+def parse_policy_args(items: list[str]) -> dict:
+    """把 ["3=intercept", ...] 轉成 {3: "intercept"}；condition 或策略名稱不存在時 ValueError。
+
+    在啟動時就檢查：否則打錯字要等實驗者按下 ENTER、begin_experiment 建立策略時才會出錯。
+    """
+    policies = {}
+    for item in items:
+        cond, _, name = item.partition("=")
+        name = name.strip()
+        try:
+            condition = int(cond)
+        except ValueError:
+            raise ValueError(f"invalid agent policy {item!r}: expected COND=NAME with an integer condition") from None
+        if condition not in CONDITIONS:
+            raise ValueError(f"unknown condition {condition} in {item!r} (choose from {', '.join(map(str, CONDITIONS))})")
+        if name not in POLICIES:
+            raise ValueError(f"unknown agent policy {name!r} in {item!r} (choose from {', '.join(sorted(POLICIES))})")
+        policies[condition] = name
+    return policies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Human-AI collaboration game")
+    parser.add_argument("--no-record", action="store_true", help="do not record session input for replay")
+    parser.add_argument("--dirty-rects", action="store_true", help="redraw only changed regions during rounds")
+    parser.add_argument("--trajectory", action="store_true", help="record per-tick ball/paddle trajectories")
+    parser.add_argument("--balls", type=int, default=0, help="multi-ball mode with this many simultaneous balls")
+    parser.add_argument(
+        "--audio-buffer",
+        type=int,
+        default=audio.DEFAULT_BUFFER,
+        help="mixer buffer in samples for low-latency cues (0 = pygame default)",
+    )
+    parser.add_argument(
+        "--agent-policy",
+        action="append",
+        default=[],
+        metavar="COND=NAME",
+        help="agent policy for a condition, e.g. 3=intercept (repeatable)",
+    )
+    parser.add_argument(
+        "--telemetry-level",
+        choices=list(LEVELS),
+        default="full",
+        help="which event types are logged (minimal = catch/miss only; standard and full currently log the same events)",
+    )
+    parser.add_argument(
+        "--event-rate",
+        action="append",
+        default=[],
+        metavar="TYPE=RATE[/BURST]",
+        help="token-bucket limit for an event type in events/s, e.g. ball_spawn=5/10 (repeatable)",
+    )
+    parser.add_argument("--no-idle", action="store_true", help="keep ticking at full frame rate on static screens")
+    parser.add_argument("--startup-only", action="store_true", help="draw the first frame, print startup timing and exit")
+    args = parser.parse_args(argv)
+    try:
+        telemetry = Telemetry(args.telemetry_level, parse_rate_args(args.event_rate))
+        agent_policies = parse_policy_args(args.agent_policy)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    record_dir = None if args.no_record else Path(__file__).resolve().parent.parent / "data" / "recordings"
+    game = Game(
+        record_dir=record_dir,
+        dirty_rects=args.dirty_rects,
+        trajectory=args.trajectory,
+        multiball=args.balls,
+        agent_policies=agent_policies,
+        audio_buffer=args.audio_buffer,
+        idle=not args.no_idle,
+        telemetry=telemetry,
+    )
+    game.run(max_frames=0 if args.startup_only else None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,340 @@
+"""衍生指標：從 backend 存下的 events.csv 計算每次接球的指標，彙整成每位受試者、每回合一列的表。
+
+每次接球（ball_catch）的指標：
+
+- catch_ms：距離同一顆球（同回合、同 ball_id）最近一次 ball_spawn 的時間（client_ns，
+  遊戲行程的單調時鐘；沒有 client_ns 欄的舊檔案才用 timestamp 的牆上時間）
+- human_dist / agent_dist：接球當下球心到兩個 paddle 中心的距離
+- 角色切換：與同回合上一次接球的接球者不同
+- 爭搶：兩個 paddle 都在 contention_px 內；爭搶後 collision_window_ms 內發生 paddle_collision
+
+單球模式中人類與代理同一 tick 接到球時會各記一筆 ball_catch，但只有人類那次得分；
+代理那筆不算一次接球（與 viewer.RoundData._duplicate_catch 相同的規則）。
+
+一位受試者的 events.csv 一次讀成 NumPy 欄位陣列，所有回合一起向量化計算（依回合分段，
+不逐列跑 Python 迴圈）。結果以 events.csv 的 (mtime, size) 與計算參數為 key 快取在
+.cache/metrics/，檔案沒變時直接讀快取。
+
+用法（於 game/ 目錄下）::
+
+    python metrics.py ../data                       # 全部 CONDITIONS 的每回合指標表
+    python metrics.py ../data --conditions 2,4 --out metrics.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from main import CONDITIONS, DEFAULT_TUNING
+
+ENGINE_VERSION = 3
+CONTENTION_PX = DEFAULT_TUNING["paddle_w"]
+COLLISION_WINDOW_MS = 1000
+
+EVENT_CODES = {"ball_spawn": 0, "ball_catch": 1, "ball_miss": 2, "paddle_collision": 3}
+CATCHER_CODES = {"human": 0, "agent": 1}
+
+TABLE_FIELDS = [
+    "condition",
+    "user_id",
+    "round_id",
+    "round_start",
+    "catches",
+    "human_catches",
+    "agent_catches",
+    "mean_catch_ms",
+    "mean_human_dist",
+    "mean_agent_dist",
+    "role_switches",
+    "switch_rate",
+    "contended_catches",
+    "contention_collisions",
+    "contention_collision_rate",
+]
+
+
+NUMERIC_COLUMNS = ("round_id", "ball_x", "ball_y", "human_x", "human_y", "agent_x", "agent_y")
+TEXT_COLUMNS = ("timestamp", "event_type", "triggered_by")
+# 舊檔案可能沒有的欄：多球模式之前沒有 ball_id，時鐘同步之前沒有 client_ns
+OPTIONAL_COLUMNS = ("ball_id", "client_ns")
+
+
+def load_events(path: Path) -> Optional[dict]:
+    """讀 events.csv 成欄位陣列（np.loadtxt 的 C parser，只讀需要的欄）；沒有資料列時回傳 None。"""
+    with path.open("r", newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+        if not f.readline():
+            return None
+
+    def read(names: tuple, dtype) -> np.ndarray:
+        usecols = [header.index(name) for name in names]
+        return np.loadtxt(path, delimiter=",", skiprows=1, usecols=usecols, dtype=dtype, quotechar='"', ndmin=2, encoding="utf-8")
+
+    numeric = read(NUMERIC_COLUMNS, np.float64)
+    optional = tuple(name for name in OPTIONAL_COLUMNS if name in header)
+    text = read(TEXT_COLUMNS + optional, str)
+    extra = {name: text[:, len(TEXT_COLUMNS) + i] for i, name in enumerate(optional)}
+
+    def codes(values: np.ndarray, table: dict) -> np.ndarray:
+        # 只對不重複的字串查表，再以 inverse 展開
+        unique, inverse = np.unique(values, return_inverse=True)
+        return np.array([table.get(v, -1) for v in unique.tolist()], dtype=np.int8)[inverse]
+
+    ball_id = np.full(len(text), -1, dtype=np.int64)
+    if "ball_id" in extra:
+        tagged = extra["ball_id"] != "NA"
+        ball_id[tagged] = extra["ball_id"][tagged].astype(np.float64).astype(np.int64)
+    round_id = numeric[:, 0].astype(np.int64)
+    stamps = np.char.rstrip(text[:, 0], "Z").astype("datetime64[us]")
+    t = (stamps - stamps[0]).astype(np.float64) / 1e6
+    if "client_ns" in extra:
+        # t 只在同一段內相減：整段都有 client_ns 才改用它，否則該段沿用 timestamp
+        seg = round_segments(round_id)
+        has = (extra["client_ns"] != "NA") & (extra["client_ns"] != "")
+        use = has & (np.bincount(seg[~has], minlength=int(seg[-1]) + 1) == 0)[seg]
+        t[use] = extra["client_ns"][use].astype(np.int64) / 1e9
+    return {
+        "round_id": round_id,
+        "t": t,
+        "stamps": stamps,
+        "kind": codes(text[:, 1], EVENT_CODES),
+        "catcher": codes(text[:, 2], CATCHER_CODES),
+        "ball_id": ball_id,
+        **{name: numeric[:, i] for i, name in enumerate(NUMERIC_COLUMNS) if i},
+    }
+
+
+def round_segments(round_id: np.ndarray) -> np.ndarray:
+    """回合分段編號：round_id 改變就是新的一段（同一受試者重跑時 round_id 會重複）。"""
+    return np.concatenate(([0], np.cumsum(round_id[1:] != round_id[:-1])))
+
+
+def catch_metrics(ev: dict, seg: np.ndarray, paddle_w: float, paddle_h: float, contention_px: float, window_ms: float) -> dict:
+    """每次接球一筆的指標陣列（依檔案順序）。"""
+    kind, t = ev["kind"], ev["t"]
+    catches = np.flatnonzero(kind == EVENT_CODES["ball_catch"])
+    # 重複的代理接球：緊接在同一段、同一球位置的人類接球之後，且沒有 ball_id（單球模式）
+    prev = np.maximum(catches - 1, 0)
+    duplicate = (
+        (catches > 0)
+        & (seg[prev] == seg[catches])
+        & (kind[prev] == EVENT_CODES["ball_catch"])
+        & (ev["catcher"][prev] == CATCHER_CODES["human"])
+        & (ev["catcher"][catches] == CATCHER_CODES["agent"])
+        & (ev["ball_id"][catches] < 0)
+        & (ev["ball_x"][prev] == ev["ball_x"][catches])
+        & (ev["ball_y"][prev] == ev["ball_y"][catches])
+    )
+    catches = catches[~duplicate]
+
+    # 每顆球最近一次 spawn：依 (段, ball_id) 穩定排序後，對 spawn 的位置做累積最大值
+    key = seg * (int(ev["ball_id"].max()) + 2) + ev["ball_id"] + 1
+    order = np.argsort(key, kind="stable")
+    pos = np.arange(len(order))
+    last = np.maximum.accumulate(np.where(kind[order] == EVENT_CODES["ball_spawn"], pos, -1))
+    spawn_of = np.full(len(t), -1, dtype=np.int64)
+    has = (last >= 0) & (key[order][np.maximum(last, 0)] == key[order])
+    spawn_of[order[has]] = order[last[has]]
+    spawn = spawn_of[catches]
+    catch_ms = np.where(spawn >= 0, (t[catches] - t[np.maximum(spawn, 0)]) * 1000, np.nan)
+
+    bx, by = ev["ball_x"][catches], ev["ball_y"][catches]
+    human_dist = np.hypot(bx - (ev["human_x"][catches] + paddle_w / 2), by - (ev["human_y"][catches] + paddle_h / 2))
+    agent_dist = np.hypot(bx - (ev["agent_x"][catches] + paddle_w / 2), by - (ev["agent_y"][catches] + paddle_h / 2))
+
+    catcher = ev["catcher"][catches]
+    cseg = seg[catches]
+    switch = np.zeros(len(catches), dtype=bool)
+    switch[1:] = (cseg[1:] == cseg[:-1]) & (catcher[1:] != catcher[:-1])
+
+    contended = (human_dist <= contention_px) & (agent_dist <= contention_px)
+    # 接球後同一段內的下一次碰撞
+    collisions = np.flatnonzero(kind == EVENT_CODES["paddle_collision"])
+    nxt = np.searchsorted(collisions, catches, side="right")
+    has_next = nxt < len(collisions)
+    after = collisions[np.minimum(nxt, max(len(collisions) - 1, 0))] if len(collisions) else catches
+    collided = has_next & (seg[after] == cseg) & ((t[after] - t[catches]) * 1000 <= window_ms)
+
+    return {
+        "seg": cseg,
+        "catcher": catcher,
+        "catch_ms": catch_ms,
+        "human_dist": human_dist,
+        "agent_dist": agent_dist,
+        "switch": switch,
+        "contended": contended,
+        "contention_collision": contended & collided,
+    }
+
+
+def round_table(ev: dict, seg: np.ndarray, cm: dict) -> dict:
+    """依回合分段彙整（bincount），回傳欄位陣列。"""
+    n = int(seg[-1]) + 1
+    first = np.flatnonzero(np.concatenate(([True], seg[1:] != seg[:-1])))
+
+    def count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(cm["seg"][mask], minlength=n)
+
+    def mean(values: np.ndarray) -> np.ndarray:
+        ok = ~np.isnan(values)
+        total = np.bincount(cm["seg"][ok], weights=values[ok], minlength=n)
+        k = np.bincount(cm["seg"][ok], minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(k > 0, total / np.maximum(k, 1), np.nan)
+
+    every = np.ones(len(cm["seg"]), dtype=bool)
+    catches = count(every)
+    switches = count(cm["switch"])
+    contended = count(cm["contended"])
+    contention_collisions = count(cm["contention_collision"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        switch_rate = np.where(catches > 1, switches / np.maximum(catches - 1, 1), np.nan)
+        collision_rate = np.where(contended > 0, contention_collisions / np.maximum(contended, 1), np.nan)
+    return {
+        "round_id": ev["round_id"][first],
+        "round_start": np.datetime_as_string(ev["stamps"][first], unit="ms"),
+        "catches": catches,
+        "human_catches": count(cm["catcher"] == CATCHER_CODES["human"]),
+        "agent_catches": count(cm["catcher"] == CATCHER_CODES["agent"]),
+        "mean_catch_ms": mean(cm["catch_ms"]),
+        "mean_human_dist": mean(cm["human_dist"]),
+        "mean_agent_dist": mean(cm["agent_dist"]),
+        "role_switches": switches,
+        "switch_rate": switch_rate,
+        "contended_catches": contended,
+        "contention_collisions": contention_collisions,
+        "contention_collision_rate": collision_rate,
+    }
+
+
+class MetricsEngine:
+    def __init__(
+        self,
+        data_dir: Path,
+        cache_dir: Optional[Path] = None,
+        paddle_w: float = DEFAULT_TUNING["paddle_w"],
+        paddle_h: float = DEFAULT_TUNING["paddle_h"],
+        contention_px: float = CONTENTION_PX,
+        collision_window_ms: float = COLLISION_WINDOW_MS,
+    ) -> None:
+        """cache_dir 為 None 時不快取。"""
+        self.data_dir = Path(data_dir)
+        self.cache_dir = cache_dir
+        self.params = (paddle_w, paddle_h, contention_px, collision_window_ms)
+        self.cache_hits = 0
+        self.computed = 0
+
+    def user_table(self, condition: int, user_id: int) -> Optional[dict]:
+        """一位受試者的每回合指標（欄位陣列）；沒有事件時回傳 None。"""
+        path = self.data_dir / CONDITIONS[condition][0] / str(user_id) / "events.csv"
+        if not path.exists():
+            return None
+        st = path.stat()
+        key = np.array([ENGINE_VERSION, st.st_mtime_ns, st.st_size], dtype=np.int64)
+        params = np.array(self.params, dtype=np.float64)
+        cache_path = self.cache_dir / f"{CONDITIONS[condition][0]}_{user_id}.npz" if self.cache_dir else None
+        if cache_path is not None:
+            try:
+                with np.load(cache_path) as cached:
+                    if np.array_equal(cached["key"], key) and np.array_equal(cached["params"], params):
+                        self.cache_hits += 1
+                        return {name: cached[name] for name in cached.files if name not in ("key", "params")}
+            except (OSError, KeyError, ValueError):
+                pass
+
+        ev = load_events(path)
+        if ev is None:
+            return None
+        seg = round_segments(ev["round_id"])
+        table = round_table(ev, seg, catch_metrics(ev, seg, *self.params))
+        self.computed += 1
+        if cache_path is not None:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = cache_path.with_suffix(".tmp.npz")
+                np.savez(tmp, key=key, params=params, **table)
+                os.replace(tmp, cache_path)
+            except OSError as exc:
+                print(f"Write metrics cache failed {cache_path}: {exc}")
+        return table
+
+    def table(self, conditions: Iterable[int] = CONDITIONS, users: Optional[set] = None) -> list[dict]:
+        """所有受試者、所有回合的指標表（每回合一個 dict，欄位見 TABLE_FIELDS）。"""
+        rows = []
+        for condition in conditions:
+            folder = self.data_dir / CONDITIONS[condition][0]
+            if not folder.is_dir():
+                continue
+            user_ids = sorted(int(p.name) for p in folder.iterdir() if p.is_dir() and p.name.isdigit())
+            for user_id in user_ids:
+                if users is not None and user_id not in users:
+                    continue
+                table = self.user_table(condition, user_id)
+                if table is None:
+                    continue
+                columns = {name: table[name].tolist() for name in TABLE_FIELDS[2:]}
+                for i in range(len(columns["round_id"])):
+                    row = {"condition": condition, "user_id": user_id}
+                    for name, values in columns.items():
+                        value = values[i]
+                        row[name] = None if isinstance(value, float) and value != value else value
+                    rows.append(row)
+        return rows
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "NA"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-user, per-round derived metrics from events.csv.")
+    parser.add_argument("data_dir", type=Path, help="backend data directory (contains one folder per condition)")
+    parser.add_argument("--conditions", default=",".join(str(c) for c in CONDITIONS))
+    parser.add_argument("--users", help="comma-separated user ids (default: all)")
+    parser.add_argument("--out", type=Path, help="write the table to CSV instead of printing it")
+    parser.add_argument("--no-cache", action="store_true", help="recompute everything and do not write the cache")
+    parser.add_argument("--contention-px", type=float, default=CONTENTION_PX)
+    parser.add_argument("--collision-window-ms", type=float, default=COLLISION_WINDOW_MS)
+    args = parser.parse_args()
+
+    conditions = [int(c) for c in args.conditions.split(",")]
+    unknown = [c for c in conditions if c not in CONDITIONS]
+    if unknown:
+        sys.exit(f"Unknown condition(s): {unknown}")
+    cache_dir = None if args.no_cache else Path(__file__).resolve().parent / ".cache" / "metrics"
+    engine = MetricsEngine(
+        args.data_dir,
+        cache_dir,
+        contention_px=args.contention_px,
+        collision_window_ms=args.collision_window_ms,
+    )
+    users = {int(u) for u in args.users.split(",")} if args.users else None
+    t0 = time.perf_counter()
+    rows = engine.table(conditions, users)
+    elapsed = time.perf_counter() - t0
+
+    if args.out:
+        with args.out.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(TABLE_FIELDS)
+            for row in rows:
+                writer.writerow(format_value(row[name]) for name in TABLE_FIELDS)
+        print(f"Wrote {len(rows)} rows to {args.out}")
+    else:
+        print("\t".join(TABLE_FIELDS))
+        for row in rows:
+            print("\t".join(format_value(row[name]) for name in TABLE_FIELDS))
+    print(f"{len(rows)} rounds, {engine.computed} computed, {engine.cache_hits} from cache, {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""多球模式：球的狀態存在連續的 array 中，以均勻格點 spatial hash 找碰撞候選。
+
+每個子步（不超過 1 frame，避免穿透）：
+    1. 積分位置、處理牆面反彈與落地
+    2. 建立格點 -> 球 index 的 hash
+    3. paddle 只檢查覆蓋格點中的球；球與球只檢查同格與相鄰格
+遊戲規則相關的反應（計分、重生、記錄事件）交回 Game 處理。
+"""
+import math
+from array import array
+
+
+class BallField:
+    def __init__(self, capacity: int, ball_r: float) -> None:
+        self.capacity = capacity
+        self.ball_r = ball_r
+        self.cell = ball_r * 4  # 格子邊長：球直徑的兩倍
+        self.x = array("d", bytes(8 * capacity))
+        self.y = array("d", bytes(8 * capacity))
+        self.vx = array("d", bytes(8 * capacity))
+        self.vy = array("d", bytes(8 * capacity))
+        self.ids = array("i", bytes(4 * capacity))
+        self.n = 0
+        self.next_id = 1
+        self.grid: dict[tuple[int, int], list[int]] = {}
+
+    def clear(self) -> None:
+        self.n = 0
+        self.grid = {}
+
+    def set_ball(self, i: int, x: float, y: float, vx: float, vy: float) -> int:
+        """把第 i 格設成一顆新球（新 id），回傳 id。"""
+        self.x[i], self.y[i], self.vx[i], self.vy[i] = x, y, vx, vy
+        ball_id = self.next_id
+        self.next_id += 1
+        self.ids[i] = ball_id
+        return ball_id
+
+    def add(self, x: float, y: float, vx: float, vy: float) -> int:
+        if self.n >= self.capacity:
+            raise ValueError("BallField is full")
+        self.n += 1
+        return self.set_ball(self.n - 1, x, y, vx, vy)
+
+    def state(self, i: int) -> tuple[float, float, float, float]:
+        return self.x[i], self.y[i], self.vx[i], self.vy[i]
+
+    def focus_index(self) -> int:
+        """最需要處理的球：往下掉且最低的一顆（沒有就取最低的）。"""
+        best, best_y, fallback, fallback_y = -1, -math.inf, 0, -math.inf
+        for i in range(self.n):
+            y = self.y[i]
+            if self.vy[i] > 0 and y > best_y:
+                best, best_y = i, y
+            if y > fallback_y:
+                fallback, fallback_y = i, y
+        return best if best >= 0 else fallback
+
+    # --- 模擬 ---
+
+    def step(self, game, frames: float, width: int, height: int) -> None:
+        substeps = max(1, math.ceil(frames))
+        h = frames / substeps
+        for _ in range(substeps):
+            self._integrate(game, h, width, height)
+            self._build_grid()
+            self._collide_paddles(game)
+            self._collide_balls()
+
+    def _integrate(self, game, h: float, width: int, height: int) -> None:
+        r = self.ball_r
+        xs, ys, vxs, vys = self.x, self.y, self.vx, self.vy
+        missed = []
+        for i in range(self.n):
+            x = xs[i] + vxs[i] * h
+            y = ys[i] + vys[i] * h
+            xs[i], ys[i] = x, y
+            if (x - r <= 0 and vxs[i] < 0) or (x + r >= width and vxs[i] > 0):
+                vx, vy = game.rotated(-vxs[i], vys[i], 30, 50)
+                vx = abs(vx) if x - r <= 0 else -abs(vx)
+                vxs[i], vys[i] = game.clamped(vx, vy)
+            if y - r <= 0 and vys[i] < 0:
+                vx, vy = game.rotated(vxs[i], -vys[i], 30, 50)
+                vxs[i], vys[i] = game.clamped(vx, abs(vy))
+            elif y - r > height:
+                missed.append(i)
+        for i in missed:
+            game.multiball_missed(i)
+
+    def _build_grid(self) -> None:
+        cell = self.cell
+        grid: dict[tuple[int, int], list[int]] = {}
+        xs, ys = self.x, self.y
+        for i in range(self.n):
+            key = (int(xs[i] // cell), int(ys[i] // cell))
+            bucket = grid.get(key)
+            if bucket is None:
+                grid[key] = [i]
+            else:
+                bucket.append(i)
+        self.grid = grid
+
+    def query_rect(self, left: float, top: float, right: float, bottom: float) -> list[int]:
+        """回傳中心可能落在矩形內的球 index（以格點為粒度的候選）。"""
+        cell = self.cell
+        found = []
+        for cx in range(int(left // cell), int(right // cell) + 1):
+            for cy in range(int(top // cell), int(bottom // cell) + 1):
+                bucket = self.grid.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def _collide_paddles(self, game) -> None:
+        r = self.ball_r
+        paddle_w, paddle_h = game.tuning["paddle_w"], game.tuning["paddle_h"]
+        xs, ys, vys = self.x, self.y, self.vy
+        for who, px, py in (("human", game.human_x, game.human_y), ("agent", game.agent_x, game.agent_y)):
+            left, top = px - r, py - r
+            right, bottom = px + paddle_w + r, py + paddle_h + r
+            for i in self.query_rect(left, top, right, bottom):
+                # 只接往下掉的球（往上彈出後不會重複計分）
+                if vys[i] > 0 and left <= xs[i] <= right and top <= ys[i] <= bottom:
+                    game.multiball_caught(i, who)
+
+    def _collide_balls(self) -> None:
+        """等質量彈性碰撞：交換兩球在法線方向的速度分量。"""
+        min_d2 = (2 * self.ball_r) ** 2
+        xs, ys, vxs, vys = self.x, self.y, self.vx, self.vy
+        grid = self.grid
+        for (cx, cy), bucket in grid.items():
+            # 同格內兩兩比對，加上右、下、右下、左下四個鄰格（每對只檢查一次）
+            candidates = [bucket]
+            for dx, dy in ((1, 0), (0, 1), (1, 1), (-1, 1)):
+                other = grid.get((cx + dx, cy + dy))
+                if other:
+                    candidates.append(other)
+            for a_pos, a in enumerate(bucket):
+                for k, group in enumerate(candidates):
+                    start = a_pos + 1 if k == 0 else 0
+                    for b in group[start:]:
+                        dx = xs[b] - xs[a]
+                        dy = ys[b] - ys[a]
+                        d2 = dx * dx + dy * dy
+                        if d2 >= min_d2 or d2 == 0:
+                            continue
+                        rvx = vxs[b] - vxs[a]
+                        rvy = vys[b] - vys[a]
+                        along = rvx * dx + rvy * dy
+                        if along >= 0:
+                            continue  # 已在分離
+                        impulse = along / d2
+                        vxs[a] += impulse * dx
+                        vys[a] += impulse * dy
+                        vxs[b] -= impulse * dx
+                        vys[b] -= impulse * dy
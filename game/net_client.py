@@ -0,0 +1,317 @@
+"""區網雙人模式的玩家端：本機預測自己的 paddle，以 server snapshot 校正。
+
+- 自己的 paddle：每個 frame 依方向鍵立即移動（與 server 相同的 move_by_keys /
+  clamp_paddle），收到 snapshot 後從 server 位置重放尚未被處理的輸入（reconcile）。
+- 球與另一位玩家：顯示時間比 server 晚 INTERP_TICKS 個 tick，在兩個 snapshot 間內插。
+- 每個 INPUT 封包附上本機量到的 RTT / jitter / 預測誤差，由 server 逐 tick 寫入 net.csv。
+
+用法（於 game/ 目錄下）::
+
+    python net_client.py 192.168.1.20
+    python net_client.py 127.0.0.1 --slot 1 --sim-latency-ms 40 --sim-jitter-ms 10
+
+BREAK 畫面兩位玩家都按 SPACE 才進入下一回合；ESC 離開。
+"""
+import argparse
+import math
+import socket
+import sys
+import time
+from collections import deque
+from typing import Optional
+
+import pygame as pg
+
+import main as game_main
+import netcode
+from main import DEFAULT_TUNING, FPS, GameState, clamp_paddle, move_by_keys
+
+INTERP_TICKS = 2 * netcode.SNAPSHOT_EVERY  # 遠端物件的顯示延遲（約 67 ms）
+MAX_PENDING = 120  # 尚未確認的輸入上限（server 停止回應時不無限增加）
+TELEPORT_PX = 100  # 兩個 snapshot 間移動超過此距離視為重生，不內插
+
+
+class NetClient:
+    """不含畫面的連線核心（可在測試中以腳本輸入驅動）。"""
+
+    def __init__(
+        self,
+        server: tuple,
+        slot: int = netcode.SLOT_ANY,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        loss: float = 0.0,
+        seed=None,
+        tuning: Optional[dict] = None,
+    ) -> None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("0.0.0.0", 0))
+        sock.setblocking(False)
+        self.sock = sock
+        self.server = server
+        self.wanted_slot = slot
+        self.link = netcode.SimLink(sock, latency_ms, jitter_ms, loss, seed=seed)
+        self.tuning = {**DEFAULT_TUNING, **(tuning or {})}
+
+        self.slot: Optional[int] = None
+        self.condition: Optional[int] = None
+        self.user_id: Optional[int] = None
+        self.history: dict[int, list] = {}  # snapshot id -> values（差分基準）
+        self._history_ids: deque = deque()
+        self.latest: Optional[list] = None
+        self.latest_id = 0
+        self.buffer: deque = deque(maxlen=32)  # (tick, values)，內插用
+        self._clock_offset: Optional[float] = None  # server tick 時間 - 本機時間（秒）
+        self.pending: list[tuple[int, int]] = []  # 已送出、server 尚未處理的 (seq, keys)
+        self.seq = 0
+        self.own: Optional[tuple[float, float]] = None  # 預測的自己 paddle 位置
+        self.rtt_ms: Optional[float] = None
+        self.jitter_ms = 0.0
+        self.pred_err = 0.0
+        self.snapshots = 0
+        self.snapshot_bytes = 0
+        self.closed = False  # server 已結束
+
+    @property
+    def own_fields(self) -> tuple[str, str, str]:
+        return ("human_x", "human_y", "human") if self.slot == 0 else ("agent_x", "agent_y", "agent")
+
+    def connect(self, timeout: float = 5.0) -> bool:
+        """送 HELLO 直到收到 WELCOME；逾時回傳 False。"""
+        deadline = time.perf_counter() + timeout
+        next_hello = 0.0
+        while time.perf_counter() < deadline:
+            now = time.perf_counter()
+            if now >= next_hello:
+                self.link.sendto(netcode.encode_hello(self.wanted_slot), self.server)
+                next_hello = now + 0.2
+            self.poll()
+            if self.slot is not None:
+                return True
+            time.sleep(0.005)
+        return False
+
+    def close(self) -> None:
+        if not self.closed:
+            self.sock.sendto(bytes([netcode.BYE]), self.server)
+        self.sock.close()
+
+    # --- 收封包 ---
+
+    def poll(self) -> None:
+        self.link.flush()
+        for data, _addr in self.link.recv_all():
+            if not data:
+                continue
+            kind = data[0]
+            if kind == netcode.WELCOME and self.slot is None:
+                welcome = netcode.decode_welcome(data)
+                self.slot = welcome["slot"]
+                self.condition = welcome["condition"]
+                self.user_id = welcome["user_id"]
+            elif kind == netcode.SNAPSHOT:
+                self.on_snapshot(data)
+            elif kind == netcode.BYE:
+                self.closed = True
+
+    def on_snapshot(self, data: bytes) -> None:
+        snap = netcode.decode_snapshot(data, self.history)
+        if snap is None:
+            return  # 基準已丟棄：等下一個以較新 ack 為基準的 snapshot
+        self.history[snap["id"]] = snap["values"]
+        self._history_ids.append(snap["id"])
+        while len(self._history_ids) > 64:
+            self.history.pop(self._history_ids.popleft(), None)
+        if snap["id"] <= self.latest_id:
+            return  # 亂序抵達的舊 snapshot 只當差分基準
+        self.latest_id = snap["id"]
+        self.latest = values = snap["values"]
+        self.snapshots += 1
+        self.snapshot_bytes = len(data)
+
+        tick = netcode.field(values, "tick")
+        self.buffer.append((tick, values))
+        offset = tick / netcode.TICK_RATE - time.perf_counter()
+        if self._clock_offset is None or offset > self._clock_offset:
+            self._clock_offset = offset  # 最早抵達的封包最接近真實的時間差
+        else:
+            self._clock_offset += (offset - self._clock_offset) * 0.05
+
+        if snap["echo_us"]:
+            rtt_us = (netcode.now_us() - snap["echo_us"] - snap["hold_us"]) & 0xFFFFFFFF
+            rtt = rtt_us / 1000
+            if self.rtt_ms is not None:
+                # RFC 3550：J += (|D| - J) / 16
+                self.jitter_ms += (abs(rtt - self.rtt_ms) - self.jitter_ms) / 16
+            self.rtt_ms = rtt
+        self.reconcile(snap["last_seq"], values)
+
+    def can_move(self, values: list) -> bool:
+        return netcode.field(values, "state") == GameState.ROUND.value and netcode.field(values, "freeze_ms") == 0
+
+    def reconcile(self, last_seq: int, values: list) -> None:
+        """從 server 位置重放尚未被處理的輸入，得到校正後的預測位置。"""
+        self.pending = [p for p in self.pending if p[0] > last_seq]
+        fx, fy, who = self.own_fields
+        x, y = netcode.field(values, fx), netcode.field(values, fy)
+        if self.can_move(values):
+            for _, keys in self.pending:
+                x, y = self.move(x, y, keys, who)
+        if self.own is not None:
+            self.pred_err = math.hypot(self.own[0] - x, self.own[1] - y)
+        self.own = (x, y)
+
+    def move(self, x: float, y: float, keys: int, who: str) -> tuple[float, float]:
+        t = self.tuning
+        x, y = move_by_keys(x, y, keys, t["human_speed"])
+        return clamp_paddle(x, y, who, t["paddle_w"], t["paddle_h"])
+
+    # --- 每個 frame ---
+
+    def step(self, keys: int) -> None:
+        """送出本 frame 的輸入並立即套用到自己的 paddle。"""
+        self.poll()
+        if self.slot is None:
+            return
+        self.seq += 1
+        self.pending.append((self.seq, keys))
+        del self.pending[:-MAX_PENDING]
+        if self.own is not None and self.latest is not None and self.can_move(self.latest):
+            self.own = self.move(*self.own, keys, self.own_fields[2])
+        rtt_us = int((self.rtt_ms or 0) * 1000)
+        packet = netcode.encode_input(
+            self.latest_id, netcode.now_us(), rtt_us, int(self.jitter_ms * 1000), self.pred_err, self.pending
+        )
+        self.link.sendto(packet, self.server)
+
+    def view(self) -> Optional[dict]:
+        """顯示用狀態：HUD 用最新 snapshot，球 / 另一位玩家內插，自己的 paddle 用預測。"""
+        if self.latest is None:
+            return None
+        view = {name: netcode.field(self.latest, name) for name in netcode.FIELDS}
+        render_tick = time.perf_counter() + self._clock_offset
+        render_tick = render_tick * netcode.TICK_RATE - INTERP_TICKS
+        fx, fy, _ = self.own_fields
+        other = ("agent_x", "agent_y") if self.slot == 0 else ("human_x", "human_y")
+        older = newer = None
+        for tick, values in self.buffer:
+            if tick <= render_tick:
+                older = (tick, values)
+            elif newer is None:
+                newer = (tick, values)
+        if older is not None:
+            a = older[1]
+            names = ("ball_x", "ball_y") + other
+            if newer is not None:
+                b = newer[1]
+                u = (render_tick - older[0]) / (newer[0] - older[0])
+                jump = math.hypot(
+                    netcode.field(b, "ball_x") - netcode.field(a, "ball_x"),
+                    netcode.field(b, "ball_y") - netcode.field(a, "ball_y"),
+                )
+                for name in names:
+                    va, vb = netcode.field(a, name), netcode.field(b, name)
+                    view[name] = va if jump > TELEPORT_PX else va + (vb - va) * u
+            else:
+                for name in names:
+                    view[name] = netcode.field(a, name)
+        if self.own is not None:
+            view[fx], view[fy] = self.own
+        return view
+
+
+def read_arrow_keys() -> int:
+    keys = pg.key.get_pressed()
+    mask = 0
+    if keys[pg.K_LEFT]:
+        mask |= game_main.KEY_LEFT
+    if keys[pg.K_RIGHT]:
+        mask |= game_main.KEY_RIGHT
+    if keys[pg.K_UP]:
+        mask |= game_main.KEY_UP
+    if keys[pg.K_DOWN]:
+        mask |= game_main.KEY_DOWN
+    return mask
+
+
+def apply_view(game, view: dict) -> None:
+    """把 snapshot 狀態套到 Game，只借用它的繪圖。"""
+    game.state = GameState(int(view["state"]))
+    game.current_round = int(view["round"])
+    game.total_rounds = int(view["total_rounds"])
+    game.round_elapsed_ms = view["elapsed_ms"]
+    game.ball_x, game.ball_y = view["ball_x"], view["ball_y"]
+    game.human_x, game.human_y = view["human_x"], view["human_y"]
+    game.agent_x, game.agent_y = view["agent_x"], view["agent_y"]
+    game.round_score = int(view["score"])
+    game.round_errors = int(view["errors"])
+    game.total_score = int(view["total_score"])
+    game.total_errors = int(view["total_errors"])
+    game.conflict_flash_ms = view["flash_ms"]
+
+
+def run_ui(client: NetClient) -> None:
+    game = game_main.Game(api=None, idle=False)
+    game.condition_code = client.condition
+    game.current_user_id = client.user_id
+    pg.display.set_caption(f"Player {client.slot + 1} ({'blue' if client.slot == 0 else 'orange'} paddle)")
+    clock = pg.time.Clock()
+    running = True
+    while running and not client.closed:
+        next_round = False
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                running = False
+            elif game.audio.handle_event(event):
+                continue
+            elif event.type == pg.VIDEORESIZE:
+                game._resize_pending = True
+            elif event.type == pg.KEYDOWN:
+                if event.key == pg.K_ESCAPE:
+                    running = False
+                elif event.key == pg.K_SPACE:
+                    next_round = True
+                elif event.key == pg.K_F3:
+                    game.show_profiler = not game.show_profiler
+        keys = read_arrow_keys() | (netcode.KEY_NEXT if next_round else 0)
+        game.profiler.begin_frame()
+        client.step(keys)
+        view = client.view()
+        if view is not None:
+            apply_view(game, view)
+        game.draw()
+        game.profiler.end_frame()
+        clock.tick(FPS)
+    client.close()
+    pg.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LAN two-player client")
+    parser.add_argument("host", help="address of the machine running net_server.py")
+    parser.add_argument("--port", type=int, default=netcode.DEFAULT_PORT)
+    parser.add_argument("--slot", type=int, choices=[0, 1], default=None, help="0 = blue paddle, 1 = orange paddle")
+    parser.add_argument("--sim-latency-ms", type=float, default=0.0, help="simulated one-way latency (testing)")
+    parser.add_argument("--sim-jitter-ms", type=float, default=0.0, help="simulated latency jitter (testing)")
+    parser.add_argument("--sim-loss", type=float, default=0.0, help="simulated packet loss ratio (testing)")
+    args = parser.parse_args(argv)
+
+    client = NetClient(
+        (args.host, args.port),
+        slot=netcode.SLOT_ANY if args.slot is None else args.slot,
+        latency_ms=args.sim_latency_ms,
+        jitter_ms=args.sim_jitter_ms,
+        loss=args.sim_loss,
+    )
+    if not client.connect():
+        print(f"No answer from {args.host}:{args.port} (server not running or full)")
+        return 1
+    print(f"Connected as player {client.slot} (user_id={client.user_id}, condition={client.condition})")
+    run_ui(client)
+    if client.rtt_ms is not None:
+        print(f"Last RTT {client.rtt_ms:.1f} ms, jitter {client.jitter_ms:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""區網雙人模式的 session server：以固定 tick 執行遊戲物理，廣播差分壓縮的 snapshot。
+
+兩位玩家各開一個 net_client.py，分別控制人類 paddle（位置 0）與原本代理的
+paddle（位置 1）。server 是唯一的權威狀態：每個 tick 從各玩家的輸入佇列取一筆
+方向鍵，跑 Game.update，每 SNAPSHOT_EVERY 個 tick 送出 snapshot（見 netcode.py）。
+回合 / 實驗紀錄照常送到 backend，另外每個 tick、每位玩家的 RTT / jitter /
+輸入佇列 / 預測誤差寫入 net.csv（/net_stats）。錄製檔可用 replay.py 重播。
+
+用法（於 game/ 目錄下）::
+
+    python net_server.py --user-id 7 --condition 4
+    python net_server.py --user-id 7 --condition 4 --sim-latency-ms 40 --sim-jitter-ms 10 --sim-loss 0.02
+
+多球模式不支援（snapshot 只帶一顆球）。
+"""
+import argparse
+import queue
+import select
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+import api_client
+import main as game_main
+import netcode
+from main import GameState
+
+HISTORY = 64  # 保留的 snapshot 數（差分基準）
+MAX_INPUT_QUEUE = 6  # 佇列超過時丟掉最舊的輸入，避免延遲累積
+CLIENT_TIMEOUT_S = 5.0
+NET_LOG_BATCH = 120  # 每 2 秒送一次 net.csv 資料
+
+
+class Player:
+    """server 端的一位玩家連線狀態。"""
+
+    def __init__(self, slot: int, addr) -> None:
+        self.slot = slot
+        self.addr = addr
+        self.inputs: deque = deque()  # 尚未處理的 (seq, keys)
+        self.newest_seq = 0  # 收到過的最大 seq
+        self.last_seq = 0  # 已處理的最後 seq（snapshot 回傳給 client 做 reconcile）
+        self.keys = 0  # 本 tick 的方向鍵；佇列空時沿用
+        self.ready_next = False  # BREAK 畫面按了下一回合
+        self.ack = 0  # client 已收到的最新 snapshot id
+        self.client_us = 0  # 最新輸入封包的 client 時間
+        self.recv_us = 0  # 收到該封包時的 server 時間
+        self.rtt_ms = 0.0
+        self.jitter_ms = 0.0
+        self.pred_err = 0.0
+        self.snapshot_bytes = 0
+        self.last_seen = time.perf_counter()
+
+
+class NetLog:
+    """逐 tick 網路紀錄，整批在背景執行緒送到 backend（不阻塞 tick）。"""
+
+    def __init__(self, api, user_id: int, condition: int) -> None:
+        self.api = api
+        self.user_id = user_id
+        self.condition = condition
+        self._rows: list[dict] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self.sent_rows = 0
+
+    def add(self, row: dict) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= NET_LOG_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows or self.api is None:
+            self._rows = []
+            return
+        self._queue.put(self._rows)
+        self._rows = []
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="net-log", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _worker(self) -> None:
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                return
+            self.api.net_stats(self.user_id, self.condition, rows)
+            self.sent_rows += len(rows)
+
+
+class NetServer:
+    def __init__(
+        self,
+        user_id: int,
+        condition: int,
+        port: int = netcode.DEFAULT_PORT,
+        host: str = "0.0.0.0",
+        api=api_client,
+        record_dir: Optional[Path] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        loss: float = 0.0,
+    ) -> None:
+        self.user_id = user_id
+        self.condition = condition
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+        sock.setblocking(False)
+        self.sock = sock
+        self.port = sock.getsockname()[1]
+        self.link = netcode.SimLink(sock, latency_ms, jitter_ms, loss)
+        self.players: dict = {}  # addr -> Player
+        self.seats: list[Optional[Player]] = [None, None]
+        self.game = game_main.Game(
+            headless=True,
+            api=api,
+            record_dir=record_dir,
+            human_policy=lambda _game: self.seat_keys(0),
+            second_player=lambda _game: self.seat_keys(1),
+        )
+        self.net_log = NetLog(api, user_id, condition)
+        self.tick_count = 0
+        self.snap_id = 0
+        self.history: dict[int, list] = {}
+        self.running = True
+        self.started = False
+        self.done_at: Optional[float] = None
+
+    def seat_keys(self, slot: int) -> int:
+        player = self.seats[slot]
+        return player.keys if player is not None else 0
+
+    # --- 封包 ---
+
+    def receive(self) -> None:
+        for data, addr in self.link.recv_all():
+            if not data:
+                continue
+            kind = data[0]
+            try:
+                if kind == netcode.HELLO:
+                    self.on_hello(data, addr)
+                elif kind == netcode.INPUT:
+                    self.on_input(data, addr)
+                elif kind == netcode.BYE:
+                    self.drop(addr, "left")
+            except Exception as exc:  # 格式錯誤的封包不應讓 server 停下
+                print(f"[net] bad packet from {addr}: {exc}")
+
+    def on_hello(self, data: bytes, addr) -> None:
+        player = self.players.get(addr)
+        if player is None:
+            wanted = data[1] if len(data) > 1 else netcode.SLOT_ANY
+            free = [i for i, p in enumerate(self.seats) if p is None]
+            if not free:
+                return  # 已滿：不回應，client 會逾時
+            slot = wanted if wanted in free else free[0]
+            player = Player(slot, addr)
+            self.players[addr] = player
+            self.seats[slot] = player
+            print(f"[net] player {slot} joined from {addr[0]}:{addr[1]}")
+        # 重複的 HELLO（WELCOME 遺失）也回應
+        self.link.sendto(netcode.encode_welcome(player.slot, self.condition, self.user_id), addr)
+
+    def on_input(self, data: bytes, addr) -> None:
+        player = self.players.get(addr)
+        if player is None:
+            return
+        msg = netcode.decode_input(data)
+        player.last_seen = time.perf_counter()
+        if msg["ack"] > player.ack:
+            player.ack = msg["ack"]
+        fresh = [(seq, keys) for seq, keys in msg["inputs"] if seq > player.newest_seq]
+        if not fresh:
+            return  # 重送 / 亂序的舊封包
+        player.newest_seq = fresh[-1][0]
+        player.inputs.extend(fresh)
+        while len(player.inputs) > MAX_INPUT_QUEUE:
+            player.inputs.popleft()
+        player.client_us = msg["client_us"]
+        player.recv_us = netcode.now_us()
+        player.rtt_ms = msg["rtt_us"] / 1000
+        player.jitter_ms = msg["jitter_us"] / 1000
+        player.pred_err = msg["pred_err"]
+
+    def drop(self, addr, reason: str) -> None:
+        player = self.players.pop(addr, None)
+        if player is not None:
+            self.seats[player.slot] = None
+            print(f"[net] player {player.slot} {reason}")
+
+    # --- tick ---
+
+    def tick(self) -> None:
+        game = self.game
+        now = time.perf_counter()
+        for addr, player in list(self.players.items()):
+            if now - player.last_seen > CLIENT_TIMEOUT_S:
+                self.drop(addr, "timed out")
+                continue
+            if player.inputs:
+                player.last_seq, keys = player.inputs.popleft()
+                player.keys = keys & 0x0F
+                if keys & netcode.KEY_NEXT and game.state == GameState.BREAK:
+                    player.ready_next = True
+
+        if not self.started:
+            if all(p is not None for p in self.seats):
+                self.started = True
+                game.begin_experiment(self.user_id, self.condition)
+                print(f"[net] experiment started: user_id={self.user_id}, condition={self.condition}")
+        elif game.state == GameState.BREAK:
+            seated = [p for p in self.seats if p is not None]
+            if seated and all(p.ready_next for p in seated):
+                for p in seated:
+                    p.ready_next = False
+                game.go_next_round_or_done()
+                print(f"[net] round {game.current_round}" if game.state == GameState.ROUND else "[net] experiment done")
+
+        was_round = game.state == GameState.ROUND
+        game.update(1.0 / netcode.TICK_RATE)
+        self.tick_count += 1
+        if self.tick_count % netcode.SNAPSHOT_EVERY == 0:
+            self.broadcast()
+        if was_round:
+            for player in self.seats:
+                if player is not None:
+                    self.net_log.add(
+                        {
+                            "round_id": game.current_round,
+                            "tick": self.tick_count,
+                            "player": player.slot,
+                            "rtt_ms": round(player.rtt_ms, 3),
+                            "jitter_ms": round(player.jitter_ms, 3),
+                            "input_queue": len(player.inputs),
+                            "pred_err_px": round(player.pred_err, 2),
+                            "snapshot_bytes": player.snapshot_bytes,
+                        }
+                    )
+            if game.state != GameState.ROUND:
+                self.net_log.flush()
+        if game.state == GameState.DONE and self.done_at is None:
+            self.done_at = now
+
+    def broadcast(self) -> None:
+        self.snap_id += 1
+        values = netcode.game_values(self.game, self.tick_count)
+        self.history[self.snap_id] = values
+        self.history.pop(self.snap_id - HISTORY, None)
+        now = netcode.now_us()
+        for player in self.players.values():
+            base = self.history.get(player.ack)
+            hold_us = (now - player.recv_us) & 0xFFFFFFFF if player.client_us else 0
+            packet = netcode.encode_snapshot(
+                self.snap_id, values, player.ack, base, player.last_seq, player.client_us, hold_us
+            )
+            player.snapshot_bytes = len(packet)
+            self.link.sendto(packet, player.addr)
+
+    # --- 主迴圈 ---
+
+    def serve(self, max_seconds: Optional[float] = None) -> None:
+        """固定 tick 執行到實驗結束（DONE 後再送 1 秒 snapshot）或 max_seconds。"""
+        period = 1.0 / netcode.TICK_RATE
+        start = time.perf_counter()
+        next_tick = start
+        print(f"[net] listening on UDP port {self.port}, waiting for 2 players")
+        try:
+            while self.running:
+                now = time.perf_counter()
+                if max_seconds is not None and now - start > max_seconds:
+                    break
+                if self.done_at is not None and now - self.done_at > 1.0:
+                    break
+                wake = next_tick
+                due = self.link.next_due()
+                if due is not None:
+                    wake = min(wake, due)
+                if wake > now:
+                    select.select([self.sock], [], [], wake - now)
+                self.receive()
+                self.link.flush()
+                now = time.perf_counter()
+                if now >= next_tick:
+                    self.tick()
+                    next_tick += period
+                    if now - next_tick > 0.25:
+                        next_tick = now  # 落後太多（例如除錯暫停）時不追趕
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        for player in list(self.players.values()):
+            self.sock.sendto(bytes([netcode.BYE]), player.addr)
+        game = self.game
+        if game.state in (GameState.ROUND, GameState.BREAK):
+            game.go_home()  # 中途結束：照常送出回合 / 實驗結束
+        game.stop_recording()
+        self.net_log.close()
+        self.sock.close()
+        self.running = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LAN two-player session server")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--condition", type=int, required=True, choices=sorted(game_main.CONDITIONS))
+    parser.add_argument("--port", type=int, default=netcode.DEFAULT_PORT)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--no-record", action="store_true", help="do not record session input for replay")
+    parser.add_argument("--sim-latency-ms", type=float, default=0.0, help="simulated one-way latency (testing)")
+    parser.add_argument("--sim-jitter-ms", type=float, default=0.0, help="simulated latency jitter (testing)")
+    parser.add_argument("--sim-loss", type=float, default=0.0, help="simulated packet loss ratio (testing)")
+    args = parser.parse_args(argv)
+
+    record_dir = None if args.no_record else Path(__file__).resolve().parent.parent / "data" / "recordings"
+    server = NetServer(
+        args.user_id,
+        args.condition,
+        port=args.port,
+        host=args.host,
+        record_dir=record_dir,
+        latency_ms=args.sim_latency_ms,
+        jitter_ms=args.sim_jitter_ms,
+        loss=args.sim_loss,
+    )
+    server.serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""區網雙人模式的 UDP 協定、snapshot 差分編碼與模擬延遲。
+
+封包（little-endian，第一個 byte 為類型）：
+
+    HELLO     <B B>              要求的位置（0 = 人類 paddle、1 = 代理 paddle、255 = 任一）
+    WELCOME   <B B H B I>        分配到的位置、server tick 頻率、condition、user_id
+    INPUT     <B I I I H H B> + n * <I B>
+              已收到的最新 snapshot、client 時間（µs）、client 量到的 RTT（µs）、
+              jitter（µs）、預測誤差（0.01 px）、n 筆尚未確認的輸入 (seq, keys)（重送防遺失）
+    SNAPSHOT  <B I I I I I> + <I> + varint...
+              snapshot id、差分基準 id（0 = 完整）、已處理的最後輸入 seq、
+              回傳的 client 時間、server 收到輸入到送出的停留時間（µs），
+              之後是欄位變動位元遮罩與各變動欄位（與基準差值的 zigzag varint）
+    BYE       <B>
+
+RTT = 現在 - 回傳的 client 時間 - server 停留時間；jitter 依 RFC 3550 平滑。
+client 每個 frame 才讀一次封包，量到的 RTT 含最多一個 frame 的等待。
+"""
+import heapq
+import random
+import socket
+import struct
+import time
+from typing import Optional
+
+HELLO, WELCOME, INPUT, SNAPSHOT, BYE = range(5)
+SLOT_ANY = 255
+DEFAULT_PORT = 47800
+TICK_RATE = 60
+SNAPSHOT_EVERY = 2  # 每 2 tick 送一次 snapshot（30 Hz）
+INPUT_REDUNDANCY = 8  # 每個 INPUT 封包附帶的最近輸入筆數
+KEY_NEXT = 0x80  # 網路輸入專用：BREAK 畫面要求下一回合（不寫入錄製檔）
+
+_HELLO = struct.Struct("<BB")
+_WELCOME = struct.Struct("<BBHBI")
+_INPUT = struct.Struct("<BIIIHHB")
+_INPUT_ITEM = struct.Struct("<IB")
+_SNAPSHOT = struct.Struct("<BIIIII")
+_MASK = struct.Struct("<I")
+
+# snapshot 欄位（全部為整數；座標與速度乘上 SCALE 的定點數）
+FIELDS = (
+    "tick",
+    "state",
+    "round",
+    "total_rounds",
+    "elapsed_ms",
+    "ball_x",
+    "ball_y",
+    "ball_vx",
+    "ball_vy",
+    "human_x",
+    "human_y",
+    "agent_x",
+    "agent_y",
+    "score",
+    "errors",
+    "total_score",
+    "total_errors",
+    "flash_ms",
+    "freeze_ms",
+)
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+SCALE = 100
+SCALED = {"ball_x", "ball_y", "ball_vx", "ball_vy", "human_x", "human_y", "agent_x", "agent_y"}
+
+
+def now_us() -> int:
+    return (time.perf_counter_ns() // 1000) & 0xFFFFFFFF
+
+
+# --- varint ---
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    z = (value << 1) ^ (value >> 63)  # zigzag：小的負數也只用少量 byte
+    while z >= 0x80:
+        out.append((z & 0x7F) | 0x80)
+        z >>= 7
+    out.append(z)
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    shift = 0
+    z = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        z |= (b & 0x7F) << shift
+        if b < 0x80:
+            break
+        shift += 7
+    return (z >> 1) ^ -(z & 1), pos
+
+
+# --- 封包 ---
+
+
+def encode_hello(slot: int = SLOT_ANY) -> bytes:
+    return _HELLO.pack(HELLO, slot)
+
+
+def encode_welcome(slot: int, condition: int, user_id: int) -> bytes:
+    return _WELCOME.pack(WELCOME, slot, TICK_RATE, condition, user_id)
+
+
+def decode_welcome(data: bytes) -> dict:
+    _, slot, tick_rate, condition, user_id = _WELCOME.unpack_from(data)
+    return {"slot": slot, "tick_rate": tick_rate, "condition": condition, "user_id": user_id}
+
+
+def encode_input(ack: int, client_us: int, rtt_us: int, jitter_us: int, pred_err: float, inputs) -> bytes:
+    inputs = inputs[-INPUT_REDUNDANCY:]
+    out = bytearray(
+        _INPUT.pack(
+            INPUT,
+            ack,
+            client_us,
+            min(rtt_us, 0xFFFFFFFF),
+            min(jitter_us, 0xFFFF),
+            min(int(pred_err * SCALE), 0xFFFF),
+            len(inputs),
+        )
+    )
+    for seq, keys in inputs:
+        out += _INPUT_ITEM.pack(seq, keys)
+    return bytes(out)
+
+
+def decode_input(data: bytes) -> dict:
+    _, ack, client_us, rtt_us, jitter_us, pred_err, n = _INPUT.unpack_from(data)
+    items = [_INPUT_ITEM.unpack_from(data, _INPUT.size + i * _INPUT_ITEM.size) for i in range(n)]
+    return {
+        "ack": ack,
+        "client_us": client_us,
+        "rtt_us": rtt_us,
+        "jitter_us": jitter_us,
+        "pred_err": pred_err / SCALE,
+        "inputs": items,
+    }
+
+
+def encode_snapshot(snap_id: int, values: list, base_id: int, base: Optional[list], last_seq: int, echo_us: int, hold_us: int) -> bytes:
+    """base 為 None 時送完整 snapshot（與全 0 的差值）。"""
+    if base is None:
+        base_id, base = 0, [0] * len(FIELDS)
+    mask = 0
+    body = bytearray()
+    for i, (v, b) in enumerate(zip(values, base)):
+        if v != b:
+            mask |= 1 << i
+            _put_varint(body, v - b)
+    header = _SNAPSHOT.pack(SNAPSHOT, snap_id, base_id, last_seq, echo_us, min(hold_us, 0xFFFFFFFF))
+    return header + _MASK.pack(mask) + bytes(body)
+
+
+def decode_snapshot(data: bytes, history: dict) -> Optional[dict]:
+    """history：已解碼的 snapshot id -> values；基準已不在 history 時回傳 None。"""
+    _, snap_id, base_id, last_seq, echo_us, hold_us = _SNAPSHOT.unpack_from(data)
+    if base_id == 0:
+        base = [0] * len(FIELDS)
+    else:
+        base = history.get(base_id)
+        if base is None:
+            return None
+    (mask,) = _MASK.unpack_from(data, _SNAPSHOT.size)
+    pos = _SNAPSHOT.size + _MASK.size
+    values = list(base)
+    for i in range(len(FIELDS)):
+        if mask & (1 << i):
+            delta, pos = _get_varint(data, pos)
+            values[i] = base[i] + delta
+    return {"id": snap_id, "last_seq": last_seq, "echo_us": echo_us, "hold_us": hold_us, "values": values}
+
+
+def game_values(game, tick: int) -> list:
+    """從 Game 取出 snapshot 欄位（順序同 FIELDS）。"""
+    return [
+        tick,
+        game.state.value,
+        game.current_round,
+        game.total_rounds,
+        int(game.round_elapsed_ms),
+        round(game.ball_x * SCALE),
+        round(game.ball_y * SCALE),
+        round(game.ball_vx * SCALE),
+        round(game.ball_vy * SCALE),
+        round(game.human_x * SCALE),
+        round(game.human_y * SCALE),
+        round(game.agent_x * SCALE),
+        round(game.agent_y * SCALE),
+        game.round_score,
+        game.round_errors,
+        game.total_score,
+        game.total_errors,
+        int(game.conflict_flash_ms),
+        int(game.conflict_freeze_ms),
+    ]
+
+
+def field(values: list, name: str) -> float:
+    v = values[FIELD_INDEX[name]]
+    return v / SCALE if name in SCALED else v
+
+
+# --- 模擬網路 ---
+
+
+class SimLink:
+    """包住 UDP socket，對送出與收到的封包加上延遲、抖動與遺失（localhost 測試用）。
+
+    latency_ms 為單向延遲；同時作用在送出與收到，所以只在一端設定時 RTT 約為 2 倍。
+    抖動可能造成封包亂序，與真實 UDP 相同。
+    """
+
+    def __init__(self, sock: socket.socket, latency_ms: float = 0.0, jitter_ms: float = 0.0, loss: float = 0.0, seed=None) -> None:
+        self.sock = sock
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self._out: list = []  # heap of (送出時間, 序號, data, addr)
+        self._in: list = []
+        self._n = 0
+        self.sent = 0
+        self.received = 0
+
+    @property
+    def simulated(self) -> bool:
+        return self.latency > 0 or self.jitter > 0 or self.loss > 0
+
+    def _delay(self) -> Optional[float]:
+        if self.loss and self.rng.random() < self.loss:
+            return None
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def sendto(self, data: bytes, addr) -> None:
+        self.sent += 1
+        if not self.simulated:
+            self.sock.sendto(data, addr)
+            return
+        delay = self._delay()
+        if delay is not None:
+            self._n += 1
+            heapq.heappush(self._out, (time.perf_counter() + delay, self._n, data, addr))
+
+    def recv_all(self) -> list:
+        """取出所有已到達（含模擬延遲）的封包 [(data, addr)]；socket 須為 non-blocking。"""
+        now = time.perf_counter()
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                continue  # Windows：對方關閉時的 ICMP 回報
+            self.received += 1
+            if not self.simulated:
+                self._n += 1
+                heapq.heappush(self._in, (now, self._n, data, addr))
+                continue
+            delay = self._delay()
+            if delay is not None:
+                self._n += 1
+                heapq.heappush(self._in, (now + delay, self._n, data, addr))
+        self.flush()
+        ready = []
+        while self._in and self._in[0][0] <= now:
+            _, _, data, addr = heapq.heappop(self._in)
+            ready.append((data, addr))
+        return ready
+
+    def flush(self) -> None:
+        """送出模擬延遲已到期的封包。"""
+        now = time.perf_counter()
+        while self._out and self._out[0][0] <= now:
+            _, _, data, addr = heapq.heappop(self._out)
+            self.sock.sendto(data, addr)
+
+    def next_due(self) -> Optional[float]:
+        """下一個延遲封包的到期時間（perf_counter 秒）；沒有則為 None。"""
+        times = [q[0][0] for q in (self._out, self._in) if q]
+        return min(times) if times else None
@@ -0,0 +1,71 @@
+"""純數學的碰撞 / 軌跡工具（不依賴 pygame）。
+
+速度單位為 px / frame，時間單位為 frame（60 FPS 下 1 frame = 1/60 秒）。
+"""
+from typing import Optional
+
+# 一個 step 內最多處理的撞擊事件數（防止退化情況無限迴圈）
+MAX_SWEEP_EVENTS = 16
+
+
+def ray_aabb(
+    x: float, y: float, vx: float, vy: float, left: float, top: float, right: float, bottom: float
+) -> Optional[tuple[float, float]]:
+    """點 (x, y) 以速度 (vx, vy) 移動時進出矩形的時間 (t_enter, t_exit)；不相交回傳 None。
+
+    t_enter 可能為負（起點已在矩形內）；呼叫端自行限制有效時間範圍。
+    球視為邊長 2r 的方塊時，把 paddle 各邊外擴 r 即可（與原本的 AABB 重疊判定一致）。
+    """
+    t_enter = float("-inf")
+    t_exit = float("inf")
+    for p, v, lo, hi in ((x, vx, left, right), (y, vy, top, bottom)):
+        if v == 0:
+            if p < lo or p > hi:
+                return None
+            continue
+        t0 = (lo - p) / v
+        t1 = (hi - p) / v
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_enter:
+            t_enter = t0
+        if t1 < t_exit:
+            t_exit = t1
+        if t_enter > t_exit:
+            return None
+    if t_exit < 0:
+        return None
+    return t_enter, t_exit
+
+
+def wall_toi(pos: float, vel: float, lo: float, hi: float) -> Optional[tuple[float, int]]:
+    """一維位置 pos 以 vel 移動，碰到 lo（回傳 -1）或 hi（回傳 +1）的時間；不會碰到回傳 None。"""
+    if vel < 0:
+        return max(0.0, (lo - pos) / vel), -1
+    if vel > 0:
+        return max(0.0, (hi - pos) / vel), 1
+    return None
+
+
+def predict_crossing(
+    x: float, y: float, vx: float, vy: float, line_y: float, left: float, right: float, top: float
+) -> Optional[tuple[float, float]]:
+    """球心到達水平線 line_y 時的 (x, 經過的 frame 數)，只預測到第一次碰牆為止。
+
+    球碰牆會隨機轉 30–50°（見 Game.sweep_ball），反彈後的軌跡無法解析預測：
+    到線之前會先碰到側牆或頂部時，改回傳碰牆點，呼叫端在反彈（速度改變）後重新預測。
+    left / right / top 是球心可到的邊界（已扣掉半徑）。
+    已經通過該線或沒有垂直速度時回傳 None。
+    """
+    if vy > 0:
+        if y > line_y:
+            return None
+        t = (line_y - y) / vy
+    elif vy < 0:
+        t = max(0.0, (y - top) / -vy)  # 往上：最多預測到頂部
+    else:
+        return None
+    side = wall_toi(x, vx, left, right)
+    if side is not None and side[0] < t:
+        t = side[0]
+    return x + vx * t, t
@@ -0,0 +1,181 @@
+"""逐幀、分階段的效能計時（perf_counter_ns），常駐開啟。
+
+Game.run 每幀以 begin_frame / enter / exit / end_frame 標記各階段；階段可巢狀，
+內層時間不重複計入外層（例如 update 不含 collisions、draw 不含 flip）。
+最近 RING_SIZE 幀的逐階段時間存在預先配置的 array 環狀緩衝區，另外累計
+幀時間直方圖與超過 16.7 ms 預算的次數，並提供每回合摘要。
+"""
+from array import array
+from time import perf_counter_ns
+
+PHASES = ("events", "update", "collisions", "api", "draw", "flip")
+FRAME_BUDGET_NS = 16_700_000
+RING_SIZE = 1024
+HIST_BUCKET_NS = 500_000  # 直方圖每格 0.5 ms
+HIST_BUCKETS = 200  # 0~100 ms，最後一格為溢位
+
+
+class FrameProfiler:
+    def __init__(self, budget_ns: int = FRAME_BUDGET_NS, ring_size: int = RING_SIZE) -> None:
+        self.budget_ns = budget_ns
+        self.ring_size = ring_size
+        self.n_cols = len(PHASES) + 1  # 各階段 + 整幀
+        self._phase_index = {name: i for i, name in enumerate(PHASES)}
+        self.ring = array("q", bytes(8 * ring_size * self.n_cols))
+        self.frames = 0  # 累計幀數（環狀緩衝區寫入位置 = frames % ring_size）
+
+        # 當前幀
+        self._acc = [0] * len(PHASES)
+        self._stack: list[int] = []
+        self._mark = 0
+        self._frame_start = 0
+
+        # 全程與本回合統計
+        self.hist = [0] * HIST_BUCKETS
+        self.missed = 0
+        self.reset_round()
+
+    def reset_round(self) -> None:
+        self.round_hist = [0] * HIST_BUCKETS
+        self.round_frames = 0
+        self.round_missed = 0
+        self.round_max_ns = 0
+        self.round_total_ns = 0
+        self.round_phase_ns = [0] * len(PHASES)
+
+    # --- 計時 ---
+
+    def begin_frame(self) -> None:
+        self._acc = [0] * len(PHASES)
+        self._stack.clear()
+        self._frame_start = perf_counter_ns()
+
+    def enter(self, phase: str) -> None:
+        now = perf_counter_ns()
+        if self._stack:
+            self._acc[self._stack[-1]] += now - self._mark
+        self._stack.append(self._phase_index[phase])
+        self._mark = now
+
+    def exit(self) -> None:
+        now = perf_counter_ns()
+        if self._stack:
+            self._acc[self._stack.pop()] += now - self._mark
+        self._mark = now
+
+    def end_frame(self) -> None:
+        total = perf_counter_ns() - self._frame_start
+        base = (self.frames % self.ring_size) * self.n_cols
+        acc = self._acc
+        for i, value in enumerate(acc):
+            self.ring[base + i] = value
+            self.round_phase_ns[i] += value
+        self.ring[base + len(PHASES)] = total
+        self.frames += 1
+
+        bucket = min(total // HIST_BUCKET_NS, HIST_BUCKETS - 1)
+        self.hist[bucket] += 1
+        self.round_hist[bucket] += 1
+        self.round_frames += 1
+        self.round_total_ns += total
+        if total > self.round_max_ns:
+            self.round_max_ns = total
+        if total > self.budget_ns:
+            self.missed += 1
+            self.round_missed += 1
+
+    def wrap_api(self, api):
+        """回傳代理物件：所有 api 呼叫計入 "api" 階段（偵測阻塞的網路呼叫）。"""
+        return _ProfiledApi(api, self)
+
+    # --- 統計 ---
+
+    def recent(self, n: int = 60) -> list[list[int]]:
+        """最近 n 幀的 [各階段..., 整幀] ns（由舊到新）。"""
+        n = min(n, self.frames, self.ring_size)
+        rows = []
+        for k in range(self.frames - n, self.frames):
+            base = (k % self.ring_size) * self.n_cols
+            rows.append(list(self.ring[base:base + self.n_cols]))
+        return rows
+
+    @staticmethod
+    def percentile_ms(hist: list[int], pct: float) -> float:
+        """由直方圖估計百分位（取該格上緣，單位 ms）。"""
+        count = sum(hist)
+        if count == 0:
+            return 0.0
+        target = count * pct / 100
+        running = 0
+        for i, c in enumerate(hist):
+            running += c
+            if running >= target:
+                return (i + 1) * HIST_BUCKET_NS / 1e6
+        return HIST_BUCKETS * HIST_BUCKET_NS / 1e6
+
+    def overlay_lines(self) -> list[str]:
+        rows = self.recent(60)
+        if not rows:
+            return ["profiler: no frames yet"]
+        n = len(rows)
+        means = [sum(r[i] for r in rows) / n / 1e6 for i in range(self.n_cols)]
+        lines = [f"frame {means[-1]:.2f} ms  p99 {self.percentile_ms(self.hist, 99):.1f} ms  missed {self.missed}"]
+        lines += [f"{name:<10} {means[i]:.2f} ms" for i, name in enumerate(PHASES)]
+        return lines
+
+    def round_summary(self) -> dict:
+        frames = self.round_frames
+        summary = {
+            "frames": frames,
+            "mean_frame_ms": round(self.round_total_ns / frames / 1e6, 3) if frames else 0.0,
+            "p50_frame_ms": self.percentile_ms(self.round_hist, 50),
+            "p95_frame_ms": self.percentile_ms(self.round_hist, 95),
+            "p99_frame_ms": self.percentile_ms(self.round_hist, 99),
+            "max_frame_ms": round(self.round_max_ns / 1e6, 3),
+            "missed_deadlines": self.round_missed,
+        }
+        for i, name in enumerate(PHASES):
+            summary[f"{name}_ms"] = round(self.round_phase_ns[i] / frames / 1e6, 4) if frames else 0.0
+        return summary
+
+
+class _ProfiledApi:
+    def __init__(self, api, profiler: FrameProfiler) -> None:
+        self._api = api
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        fn = getattr(self._api, name)
+        if not callable(fn):
+            return fn
+        profiler = self._profiler
+
+        def timed(*args, **kwargs):
+            profiler.enter("api")
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.exit()
+
+        return timed
+
+
+class StartupTimer:
+    """啟動各階段耗時：每次 mark(name) 記下距上一個 mark 的時間。"""
+
+    def __init__(self, t0_ns: int = 0) -> None:
+        self.t0 = t0_ns or perf_counter_ns()
+        self._last = self.t0
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, name: str) -> None:
+        now = perf_counter_ns()
+        self.phases.append((name, (now - self._last) / 1e6))
+        self._last = now
+
+    def total_ms(self) -> float:
+        return (self._last - self.t0) / 1e6
+
+    def report(self) -> str:
+        parts = " ".join(f"{name}={ms:.1f}ms" for name, ms in self.phases)
+        return f"[startup] {parts} total={self.total_ms():.1f}ms"
@@ -0,0 +1,102 @@
+"""Session 錄製格式：每個 tick 的 dt 與人類方向鍵，加上會改變狀態的操作。
+
+檔案為 gzip：第一行是 JSON header（seed、受試者、condition、tuning、畫面尺寸），
+之後是二進位 op 串流，依發生順序寫入：
+
+    OP_TICK   <I B>  dt（微秒）、KEY_* 位元遮罩（雙人模式：高 4 位元為第二位玩家）
+    OP_PAUSE         暫停 / 繼續
+    OP_NEXT          進入下一回合或結束
+    OP_HOME          回首頁（錄製結束）
+    OP_RESIZE <H H>  視窗尺寸改變（只出現在舊版錄製檔；現在物理固定用邏輯尺寸）
+
+重播時依序套用即可完全重現 session（見 replay.py）。
+"""
+import gzip
+import json
+import struct
+from pathlib import Path
+from typing import Iterator, Optional
+
+FORMAT_VERSION = 1
+
+OP_TICK = 0
+OP_PAUSE = 1
+OP_NEXT = 2
+OP_HOME = 3
+OP_RESIZE = 4
+
+_TICK = struct.Struct("<BIB")
+_RESIZE = struct.Struct("<BHH")
+_OP = struct.Struct("<B")
+
+
+class SessionRecorder:
+    def __init__(self, path: Path, header: dict) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = gzip.open(self.path, "wb", compresslevel=6)
+        header = {"version": FORMAT_VERSION, **header}
+        self._f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+        self.ticks = 0
+
+    def tick(self, dt: float, keys: int) -> None:
+        self._f.write(_TICK.pack(OP_TICK, int(round(dt * 1_000_000)), keys))
+        self.ticks += 1
+
+    def command(self, op: int) -> None:
+        self._f.write(_OP.pack(op))
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def _read_all(path: Path) -> bytes:
+    """讀出整個檔案；遊戲中途當掉造成 gzip 尾端不完整時，保留已寫入的部分。"""
+    chunks = []
+    with gzip.open(path, "rb") as f:
+        try:
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except EOFError:
+            pass
+    return b"".join(chunks)
+
+
+def load_session(path: Path) -> tuple[dict, bytes]:
+    """回傳 (header, op 串流)。"""
+    data = _read_all(Path(path))
+    line_end = data.index(b"\n")
+    header = json.loads(data[:line_end].decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported recording version: {header.get('version')}")
+    return header, data[line_end + 1:]
+
+
+def iter_ops(body: bytes) -> Iterator[tuple[int, Optional[tuple]]]:
+    """逐一產生 (op, 參數)；OP_TICK 的參數為 (dt 秒, keys)。"""
+    pos = 0
+    n = len(body)
+    while pos < n:
+        op = body[pos]
+        if op == OP_TICK:
+            if pos + _TICK.size > n:
+                return  # 截斷的最後一筆
+            _, dt_us, keys = _TICK.unpack_from(body, pos)
+            pos += _TICK.size
+            yield op, (dt_us / 1_000_000, keys)
+        elif op == OP_RESIZE:
+            if pos + _RESIZE.size > n:
+                return
+            _, w, h = _RESIZE.unpack_from(body, pos)
+            pos += _RESIZE.size
+            yield op, (w, h)
+        elif op in (OP_PAUSE, OP_NEXT, OP_HOME):
+            pos += 1
+            yield op, None
+        else:
+            raise ValueError(f"corrupt recording: unknown op {op} at byte {pos}")
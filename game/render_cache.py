@@ -0,0 +1,106 @@
+"""繪圖快取：文字 surface（LRU）與預先烘好的 paddle / 球 / 按鈕 sprite。
+
+文字以 (text, font, color) 為 key，只有內容變動的字串（分數、剩餘時間）才會重新
+rasterize；固定標籤與圖形只畫一次，之後每幀只做 blit。畫面固定為邏輯尺寸，視窗縮放不必清除。
+
+字型路徑解析（SysFont 會掃描整個系統字型清單，macOS / Windows 上很慢）的結果
+存到磁碟，之後啟動直接以路徑開啟字型。
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import pygame as pg
+
+# 烘 sprite 時用來當透明色的 colorkey（不會出現在 UI 配色中）
+_COLORKEY = (255, 0, 255)
+
+
+class TextCache:
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._items: "OrderedDict[tuple, pg.Surface]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text: str, font: pg.font.Font, color) -> pg.Surface:
+        key = (text, font, tuple(color))
+        img = self._items.get(key)
+        if img is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return img
+        self.misses += 1
+        img = font.render(text, True, color)
+        if pg.display.get_surface() is not None:
+            img = img.convert_alpha()
+        self._items[key] = img
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return img
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+class SpriteCache:
+    def __init__(self) -> None:
+        self._items: dict[tuple, pg.Surface] = {}
+
+    def _bake(self, key, size, draw_fn) -> pg.Surface:
+        img = self._items.get(key)
+        if img is None:
+            img = pg.Surface(size)
+            img.fill(_COLORKEY)
+            draw_fn(img)
+            if pg.display.get_surface() is not None:
+                img = img.convert()
+            img.set_colorkey(_COLORKEY, pg.RLEACCEL)
+            self._items[key] = img
+        return img
+
+    def rounded_rect(self, w: int, h: int, color, radius: int, width: int = 0) -> pg.Surface:
+        """圓角矩形（width > 0 時只畫外框）。"""
+        w, h = int(w), int(h)
+        return self._bake(
+            ("rect", w, h, tuple(color), radius, width),
+            (w, h),
+            lambda img: pg.draw.rect(img, color, (0, 0, w, h), width=width, border_radius=radius),
+        )
+
+    def circle(self, r: int, color) -> pg.Surface:
+        r = int(r)
+        return self._bake(
+            ("circle", r, tuple(color)),
+            (r * 2 + 1, r * 2 + 1),
+            lambda img: pg.draw.circle(img, color, (r, r), r),
+        )
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+_font_paths: Optional[dict] = None
+
+
+def load_font(name: str, size: int, cache_path: str) -> pg.font.Font:
+    """等同 pg.font.SysFont(name, size)，但字型路徑只解析一次並快取在 cache_path。"""
+    global _font_paths
+    if _font_paths is None:
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                _font_paths = json.load(f)
+        except (OSError, ValueError):
+            _font_paths = {}
+    path = _font_paths.get(name, "")
+    if path == "" or (path is not None and not os.path.exists(path)):
+        path = pg.font.match_font(name)  # 找不到時為 None：使用 pygame 內建字型
+        _font_paths[name] = path
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(_font_paths, f)
+        except OSError as exc:
+            print(f"Write font cache failed {cache_path}: {exc}")
+    return pg.font.Font(path, size)
@@ -0,0 +1,212 @@
+"""重播錄製的 session：以相同 seed 與逐 tick 輸入重跑遊戲邏輯，重新產生所有 log_event。
+
+用法（於 game/ 目錄下）::
+
+    python replay.py ../data/recordings/human_dom/7/session_20250101T120000.rec.gz
+    python replay.py SESSION --speed 1          # 開視窗即時重播
+    python replay.py SESSION --speed 4          # 開視窗 4 倍速
+    python replay.py SESSION --events-out replayed.csv --compare ../data/human_dom/7/events.csv
+
+不指定 --speed 時以 headless 模式盡速跑完（稽核 / 離線 profiling 用）。
+"""
+import argparse
+import csv
+import inspect
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import pygame as pg
+
+import api_client
+import main as game_main
+import recording
+from telemetry import Telemetry
+
+# 與 backend events.csv 相同的欄位順序
+EVENT_FIELDS = [
+    "user_id",
+    "condition",
+    "round_id",
+    "timestamp",
+    "event_type",
+    "ball_x",
+    "ball_y",
+    "human_x",
+    "human_y",
+    "agent_x",
+    "agent_y",
+    "triggered_by",
+    "signal_type",
+    "dir_ratio",
+    "ball_speed",
+    "ball_angle",
+    "ball_id",
+    "client_ns",
+    "clock_offset_ns",
+    "round_ms",
+]
+# 比對時忽略的欄位（重播時間必然不同）
+VOLATILE_FIELDS = {"timestamp", "client_ns", "clock_offset_ns"}
+
+
+class CapturingApi:
+    """替代 api_client：記錄所有呼叫，不送出網路請求。"""
+
+    def __init__(self) -> None:
+        self.events: list[dict] = []
+        self.calls: list[tuple[str, dict]] = []
+
+    def _capture(self, name: str, args, kwargs) -> None:
+        bound = inspect.signature(getattr(api_client, name)).bind(*args, **kwargs)
+        self.calls.append((name, dict(bound.arguments)))
+
+    def start_experiment(self, *args, **kwargs) -> None:
+        self._capture("start_experiment", args, kwargs)
+
+    def end_experiment(self, *args, **kwargs) -> None:
+        self._capture("end_experiment", args, kwargs)
+
+    def start_round(self, *args, **kwargs) -> None:
+        self._capture("start_round", args, kwargs)
+
+    def end_round(self, *args, **kwargs) -> None:
+        self._capture("end_round", args, kwargs)
+
+    def round_profile(self, *args, **kwargs) -> None:
+        self._capture("round_profile", args, kwargs)
+
+    def upload_trajectory(self, *args, **kwargs) -> None:
+        self._capture("upload_trajectory", args, kwargs)
+
+    def log_event(self, payload) -> None:
+        self.events.append(dict(payload))
+
+
+def replay_session(path: Path, speed: Optional[float] = None) -> CapturingApi:
+    """重播一個錄製檔；speed 為 None 時 headless 盡速執行，否則開視窗以該倍速播放。"""
+    header, body = recording.load_session(path)
+    headless = speed is None
+    keys = {"mask": 0}
+    capture = CapturingApi()
+
+    # 物理邊界以錄製當時的邏輯尺寸為準（舊版錄製檔為視窗尺寸）
+    game_main.WIDTH, game_main.HEIGHT = header["width"], header["height"]
+    game = game_main.Game(
+        headless=headless,
+        tuning=header["tuning"],
+        api=capture,
+        human_policy=lambda _game: keys["mask"] & 0x0F,
+        multiball=header.get("multiball", 0),
+        agent_policies={header["condition"]: header.get("agent_policy", "chase")},
+        # 區網雙人 session：第二位玩家的方向鍵在高 4 位元
+        second_player=(lambda _game: keys["mask"] >> 4) if header.get("second_player") else None,
+        telemetry=Telemetry.from_header(header.get("telemetry")),
+    )
+    game.total_rounds = header["total_rounds"]
+    game.begin_experiment(header["user_id"], header["condition"], seed=header["seed"])
+
+    prof = game.profiler
+    next_frame = time.perf_counter()
+    for op, arg in recording.iter_ops(body):
+        if op == recording.OP_TICK:
+            dt, keys["mask"] = arg
+            prof.begin_frame()
+            prof.enter("update")
+            game.update(dt)
+            prof.exit()
+            if not headless:
+                for event in pg.event.get():
+                    if event.type == pg.QUIT:
+                        return capture
+                prof.enter("draw")
+                game.draw()
+                prof.exit()
+            prof.end_frame()
+            if not headless:
+                next_frame += dt / speed
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        elif op == recording.OP_PAUSE:
+            game.toggle_pause()
+        elif op == recording.OP_NEXT:
+            game.go_next_round_or_done()
+        elif op == recording.OP_HOME:
+            game.go_home()
+        elif op == recording.OP_RESIZE:
+            game_main.WIDTH, game_main.HEIGHT = arg
+            if not headless:
+                game.setup_window()
+    return capture
+
+
+def write_events(events: list[dict], out_path: Path) -> None:
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=EVENT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for ev in events:
+            writer.writerow({k: ("NA" if v is None else v) for k, v in ev.items()})
+
+
+def compare_events(events: list[dict], csv_path: Path, user_id: int) -> int:
+    """與 backend 的 events.csv 比對（忽略時間戳），回傳不一致的筆數。"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        logged = [row for row in csv.DictReader(f) if row.get("user_id") == str(user_id)]
+    fields = [f for f in EVENT_FIELDS if f not in VOLATILE_FIELDS]
+    mismatches = 0
+    for i, (ours, theirs) in enumerate(zip(events, logged)):
+        for field in fields:
+            value = ours.get(field)
+            if str("NA" if value is None else value) != theirs.get(field, ""):
+                mismatches += 1
+                print(f"  row {i}: {field} replay={value!r} logged={theirs.get(field)!r}")
+                break
+    if len(events) != len(logged):
+        print(f"  event count differs: replay={len(events)} logged={len(logged)}")
+        mismatches += abs(len(events) - len(logged))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session deterministically.")
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--speed", type=float, default=None, help="open a window and play at this speed (1 = real time)")
+    parser.add_argument("--events-out", type=Path, help="write re-derived log_event rows to CSV")
+    parser.add_argument("--compare", type=Path, help="events.csv logged by the backend to audit against")
+    args = parser.parse_args(argv)
+
+    header, _ = recording.load_session(args.recording)
+    t0 = time.perf_counter()
+    capture = replay_session(args.recording, speed=args.speed)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"Replayed user={header['user_id']} condition={header['condition']} seed={header['seed']}: "
+        f"{len(capture.events)} events in {elapsed:.2f}s"
+    )
+    for name, call in capture.calls:
+        if name == "end_round":
+            print(
+                f"  round {call['round_id']}: score={call['score']} errors={call['errors']} "
+                f"collisions={call['collisions']} catch={call['ball_catch']} miss={call['ball_miss']}"
+            )
+        elif name == "round_profile":
+            s = call["summary"]
+            print(
+                f"    profile: frames={s['frames']} mean={s['mean_frame_ms']}ms "
+                f"p99={s['p99_frame_ms']}ms missed={s['missed_deadlines']}"
+            )
+
+    if args.events_out:
+        write_events(capture.events, args.events_out)
+        print(f"Events written to {args.events_out}")
+    if args.compare:
+        mismatches = compare_events(capture.events, args.compare, header["user_id"])
+        print("Audit OK" if mismatches == 0 else f"Audit found {mismatches} mismatching rows")
+        return 1 if mismatches else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Session 單調時鐘與 client / backend 時鐘同步。
+
+事件除了 ISO 時間（牆上時鐘，會被 NTP 調整）之外，另帶 session 開始後的單調奈秒數
+（perf_counter_ns）。與 backend 的時鐘關係以 NTP 方式估計：
+
+    t0 client 送出、t1 server 收到、t2 server 回覆、t3 client 收到
+    offset = ((t1 - t0) + (t2 - t3)) / 2      （server 時鐘 - client session 時鐘）
+    rtt    = (t3 - t0) - (t2 - t1)
+
+每次同步連送數個探測，取 RTT 最小的一個（排隊延遲最少、offset 最準）。同步在背景
+執行緒進行（實驗開始時先做一次，之後定期重做），不阻塞遊戲迴圈；第一次同步完成前
+事件的 clock_offset_ns 為 None。backend 收到事件時以
+server 時間 - (client_ns + offset) 算出單向延遲。
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class SessionClock:
+    def __init__(self, sync: Optional[Callable[[int], Optional[dict]]] = None, probes: int = 5, period_s: float = 30.0) -> None:
+        """sync(client_ns) -> {"server_recv_ns", "server_send_ns"} 或 None（例如 api_client.clock_sync）。"""
+        self.sync = sync
+        self.probes = probes
+        self.period_s = period_s
+        self.t0_ns = time.perf_counter_ns()
+        self.offset_ns: Optional[int] = None
+        self.rtt_ms: Optional[float] = None
+        self.syncs = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reset(self) -> None:
+        """新的 session：時鐘歸零，之前的 offset 不再適用。"""
+        self.stop()
+        self.t0_ns = time.perf_counter_ns()
+        self.offset_ns = None
+        self.rtt_ms = None
+
+    def now_ns(self) -> int:
+        return time.perf_counter_ns() - self.t0_ns
+
+    def sync_now(self) -> bool:
+        """做一次同步（probes 個探測），成功時更新 offset / RTT。"""
+        if self.sync is None:
+            return False
+        base = self.t0_ns
+        best = None
+        for _ in range(self.probes):
+            t0 = time.perf_counter_ns() - base
+            reply = self.sync(t0)
+            t3 = time.perf_counter_ns() - base
+            if reply is None:
+                break  # backend 沒回應：不要讓呼叫端等完所有探測
+            t1, t2 = reply["server_recv_ns"], reply["server_send_ns"]
+            rtt = (t3 - t0) - (t2 - t1)
+            if best is None or rtt < best[0]:
+                best = (rtt, ((t1 - t0) + (t2 - t3)) // 2)
+        if best is None or self.t0_ns != base:
+            return False  # 同步期間 reset() 過：結果屬於上一個 session
+        self.rtt_ms = round(best[0] / 1e6, 3)
+        self.offset_ns = best[1]
+        self.syncs += 1
+        return True
+
+    def start_periodic(self) -> None:
+        if self.sync is None or self._thread is not None:
+            return
+        self._stop = threading.Event()  # 每個執行緒各自一個，舊執行緒停止後不會被重新啟動
+        self._thread = threading.Thread(target=self._worker, args=(self._stop,), name="clock-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread = None
+
+    def _worker(self, stop: threading.Event) -> None:
+        self.sync_now()
+        while not stop.wait(self.period_s):
+            self.sync_now()
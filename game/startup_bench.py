@@ -0,0 +1,69 @@
+"""啟動時間 benchmark：重複以 --startup-only 啟動遊戲，統計各階段耗時的中位數。
+
+用法（於 game/ 目錄下）::
+
+    python startup_bench.py --runs 10
+    python startup_bench.py --runs 10 --cold     # 每次先清掉 .cache（字型路徑、PCM）
+    python startup_bench.py --dummy              # 無顯示環境（SDL dummy driver）
+
+first_frame 之前的階段即「看到 HOME 畫面」所需時間；之後的階段在畫面出現後才執行。
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+GAME_DIR = Path(__file__).resolve().parent
+_PHASE_RE = re.compile(r"(\w+)=([\d.]+)ms")
+
+
+def run_once(env: dict) -> dict:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(GAME_DIR / "main.py"), "--startup-only", "--no-record"],
+        cwd=GAME_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+    for line in proc.stdout.splitlines():
+        if line.startswith("[startup]"):
+            phases = {name: float(ms) for name, ms in _PHASE_RE.findall(line.split("(")[0])}
+            phases["process"] = wall_ms  # 含直譯器啟動與結束
+            return phases
+    raise RuntimeError(f"no startup report in output:\n{proc.stdout}\n{proc.stderr}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure game startup time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="clear the font / PCM cache before every run")
+    parser.add_argument("--dummy", action="store_true", help="use SDL dummy video/audio drivers")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    if args.dummy:
+        env["SDL_VIDEODRIVER"] = "dummy"
+        env["SDL_AUDIODRIVER"] = "dummy"
+
+    results = []
+    for _ in range(args.runs):
+        if args.cold:
+            shutil.rmtree(GAME_DIR / ".cache", ignore_errors=True)
+        results.append(run_once(env))
+
+    print(f"{'phase':<16}{'median ms':>10}{'min ms':>10}{'max ms':>10}")
+    for name in results[0]:
+        values = [r[name] for r in results if name in r]
+        print(f"{name:<16}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""參數掃描：以多程序平行跑 headless 模擬回合，彙整各組參數的表現。
+
+用法（於 game/ 目錄下）::
+
+    python sweep.py --param max_speed=10,12,14 --param agent_speed=2,3,4 --seeds 8
+    python sweep.py --grid grid.json --out sweep_results.csv
+
+grid.json 格式：{"max_speed": [10, 12, 14], "hit_cooldown_ms": [200, 250]}
+參數名稱對應 main.DEFAULT_TUNING。
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from main import (
+    CONDITIONS,
+    DEFAULT_AGENT_POLICIES,
+    DEFAULT_TUNING,
+    FPS,
+    KEY_LEFT,
+    KEY_RIGHT,
+    TOTAL_ROUNDS,
+    Game,
+    GameState,
+    parse_policy_args,
+)
+
+RESULT_FIELDS = ["catch_rate", "catches", "misses", "collisions"]
+
+
+def scripted_human(game) -> int:
+    """簡單的模擬玩家：球往下掉時水平追球中心，帶一點死區避免抖動。"""
+    if game.ball_vy <= 0:
+        return 0
+    center = game.human_x + game.tuning["paddle_w"] / 2
+    dead_zone = game.tuning["paddle_w"] / 4
+    if game.ball_x > center + dead_zone:
+        return KEY_RIGHT
+    if game.ball_x < center - dead_zone:
+        return KEY_LEFT
+    return 0
+
+
+def simulate_session(task) -> dict:
+    """跑一個完整實驗（rounds 回合），回傳各回合統計的加總。"""
+    tuning, condition, seed, rounds, step_frames, policies = task
+    game = Game(
+        headless=True,
+        tuning=tuning,
+        api=None,
+        human_policy=scripted_human,
+        dt_physics=True,
+        agent_policies=policies,
+    )
+    game.total_rounds = rounds
+    game.begin_experiment(user_id=0, condition=condition, seed=seed)
+
+    # 連續碰撞下可用較大的 step（數個 frame）加速模擬
+    step = step_frames / FPS
+    totals = {"catches": 0, "misses": 0, "collisions": 0}
+    while game.state != GameState.DONE:
+        if game.state == GameState.BREAK:
+            totals["catches"] += game.round_ball_catch
+            totals["misses"] += game.round_ball_miss
+            totals["collisions"] += game.round_collisions
+            game.go_next_round_or_done()
+        else:
+            game.update(step)
+
+    attempts = totals["catches"] + totals["misses"]
+    totals["catch_rate"] = totals["catches"] / attempts if attempts else 0.0
+    return totals
+
+
+def parse_value(text: str):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def load_grid(args) -> dict:
+    grid = {}
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid.update(json.load(f))
+    for item in args.param:
+        name, _, values = item.partition("=")
+        grid[name.strip()] = [parse_value(v) for v in values.split(",") if v.strip()]
+    unknown = set(grid) - set(DEFAULT_TUNING)
+    if unknown:
+        raise SystemExit(f"unknown parameters: {sorted(unknown)} (see DEFAULT_TUNING)")
+    return grid
+
+
+def expand_grid(grid: dict) -> list[dict]:
+    names = sorted(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+
+def run_sweep(
+    grid: dict,
+    seeds: list[int],
+    conditions: list[int],
+    rounds: int,
+    workers: int,
+    step_frames: int = 1,
+    policies: Optional[dict] = None,
+) -> list[dict]:
+    combos = expand_grid(grid)
+    tasks = [
+        (combo, cond, seed, rounds, step_frames, policies)
+        for combo in combos
+        for cond in conditions
+        for seed in seeds
+    ]
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(simulate_session, tasks, chunksize=chunksize))
+
+    # 依 (參數組合, condition) 彙整各 seed 的結果
+    table = []
+    per_group = len(seeds)
+    for i in range(0, len(tasks), per_group):
+        combo, cond = tasks[i][:2]
+        group = results[i:i + per_group]
+        row = {name: combo[name] for name in sorted(grid)}
+        row["condition"] = CONDITIONS[cond][0]
+        row["agent_policy"] = (policies or {}).get(cond, DEFAULT_AGENT_POLICIES[cond])
+        row["sessions"] = len(group)
+        row["rounds"] = rounds
+        for field in RESULT_FIELDS:
+            values = [r[field] for r in group]
+            row[f"{field}_mean"] = round(statistics.fmean(values), 4)
+            row[f"{field}_std"] = round(statistics.pstdev(values), 4)
+        table.append(row)
+    return table
+
+
+def write_table(table: list[dict], out_path: str) -> None:
+    if not table:
+        return
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(table[0].keys()))
+        writer.writeheader()
+        writer.writerows(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over simulated rounds.")
+    parser.add_argument("--grid", help="JSON file mapping parameter name -> list of values")
+    parser.add_argument("--param", action="append", default=[], help="name=v1,v2,... (repeatable)")
+    parser.add_argument("--seeds", type=int, default=4, help="number of seeds per cell (0..N-1)")
+    parser.add_argument("--conditions", default=",".join(str(c) for c in CONDITIONS))
+    parser.add_argument("--rounds", type=int, default=TOTAL_ROUNDS, help="rounds per simulated session")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--step-frames", type=int, default=1, help="physics frames per simulated tick")
+    parser.add_argument("--agent-policy", action="append", default=[], metavar="COND=NAME")
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    grid = load_grid(args)
+    try:
+        policies = parse_policy_args(args.agent_policy)
+    except ValueError as exc:
+        parser.error(str(exc))
+    conditions = [int(c) for c in args.conditions.split(",") if c.strip()]
+    seeds = list(range(args.seeds))
+
+    n_sessions = len(expand_grid(grid)) * len(conditions) * len(seeds)
+    print(f"Sweep: {n_sessions} sessions x {args.rounds} rounds on {args.workers} workers")
+    t0 = time.perf_counter()
+    table = run_sweep(grid, seeds, conditions, args.rounds, args.workers, args.step_frames, policies)
+    write_table(table, args.out)
+    print(f"Done in {time.perf_counter() - t0:.1f}s -> {args.out}")
+    for row in table:
+        print(row)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
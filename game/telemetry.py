@@ -0,0 +1,114 @@
+"""事件紀錄的取樣設定：紀錄等級與每種 event_type 的 token bucket 速率上限。
+
+Game.log_event 在組 payload 之前先問 allow()；被擋下的事件完全不產生請求，只計數。
+實驗開始時把設定（describe()）寫進 experiment.csv，結束時寫入各類型被擋下的數量，
+分析時才知道資料是怎麼取樣的。
+
+token bucket 以回合內的遊戲時間（round_elapsed_ms）計時並在每回合開始時補滿：
+與實際經過時間無關，重播（replay.py）會擋下完全相同的事件。
+"""
+from collections import Counter
+from typing import Optional
+
+# 回合 / 實驗的開始與結束不經過 log_event，任何等級都會送出
+LEVELS = {
+    "minimal": frozenset({"ball_catch", "ball_miss"}),
+    "standard": frozenset({"ball_catch", "ball_miss", "ball_spawn", "paddle_collision"}),
+    "full": None,  # 全部事件（目前 log_event 只送上面四種，與 standard 相同）
+}
+DEFAULT_LEVEL = "full"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "last_ms")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate  # 每秒補充的 token
+        self.burst = burst
+        self.tokens = burst
+        self.last_ms = 0.0
+
+    def reset(self) -> None:
+        self.tokens = self.burst
+        self.last_ms = 0.0
+
+    def take(self, now_ms: float) -> bool:
+        if now_ms > self.last_ms:
+            self.tokens = min(self.burst, self.tokens + (now_ms - self.last_ms) * self.rate / 1000)
+            self.last_ms = now_ms
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Telemetry:
+    def __init__(self, level: str = DEFAULT_LEVEL, rates: Optional[dict] = None) -> None:
+        """rates: event_type -> (每秒上限, burst)。"""
+        if level not in LEVELS:
+            raise ValueError(f"unknown telemetry level {level!r} (choose from {', '.join(LEVELS)})")
+        self.level = level
+        self.allowed = LEVELS[level]
+        self.rates = dict(rates or {})
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in self.rates.items()}
+        self.dropped: Counter = Counter()
+
+    def allow(self, event_type: str, now_ms: float) -> bool:
+        if self.allowed is not None and event_type not in self.allowed:
+            self.dropped[event_type] += 1
+            return False
+        bucket = self.buckets.get(event_type)
+        if bucket is not None and not bucket.take(now_ms):
+            self.dropped[event_type] += 1
+            return False
+        return True
+
+    def reset_round(self) -> None:
+        for bucket in self.buckets.values():
+            bucket.reset()
+
+    def reset_experiment(self) -> None:
+        self.reset_round()
+        self.dropped.clear()
+
+    def describe(self) -> str:
+        """例如 "level=standard;ball_spawn=5/10"（速率 / burst）。"""
+        parts = [f"level={self.level}"]
+        parts += [f"{name}={rate:g}/{burst:g}" for name, (rate, burst) in sorted(self.rates.items())]
+        return ";".join(parts)
+
+    def describe_dropped(self) -> str:
+        if not self.dropped:
+            return "none"
+        return ";".join(f"{name}={n}" for name, n in sorted(self.dropped.items()))
+
+    def header(self) -> dict:
+        """錄製檔 header 用（見 from_header）。"""
+        return {"level": self.level, "rates": {name: list(rb) for name, rb in self.rates.items()}}
+
+    @classmethod
+    def from_header(cls, data: Optional[dict]) -> "Telemetry":
+        if not data:
+            return cls()
+        return cls(data["level"], {name: tuple(rb) for name, rb in data.get("rates", {}).items()})
+
+
+def parse_rate_args(items: list[str]) -> dict:
+    """把 ["ball_spawn=5/10", "paddle_collision=2"] 轉成 {name: (rate, burst)}；burst 預設為 max(1, rate)。
+
+    名稱必須是 LEVELS["standard"] 中的事件類型，打錯字（例如 ball_spwn）時直接報錯而不是默默不限速。
+    """
+    known = LEVELS["standard"]
+    rates = {}
+    for item in items:
+        name, _, spec = item.partition("=")
+        name = name.strip()
+        if name not in known:
+            raise ValueError(f"unknown event type {name!r} in {item!r} (choose from {', '.join(sorted(known))})")
+        rate_s, _, burst_s = spec.partition("/")
+        rate = float(rate_s)
+        burst = float(burst_s) if burst_s else max(1.0, rate)
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"invalid event rate {item!r}: rate must be > 0 and burst >= 1")
+        rates[name] = (rate, burst)
+    return rates
@@ -0,0 +1,146 @@
+"""逐 tick 軌跡紀錄：球與兩個 paddle 的位置、人類方向鍵。
+
+每個 tick 只把整數寫進預先配置的 array('i')（不建立 dict / tuple）。緩衝區滿或回合
+結束時整塊複製出來，交給背景執行緒做差分編碼 + zlib 壓縮並送到 backend。
+
+Chunk 格式（little-endian）：
+    header  <4s I H H I q>  magic、round_id、chunk_index、欄位數、列數、round_key
+    body    zlib( int32 第一列絕對值 + int32 之後每列與前一列的差值 )
+
+backend 把同一 round_id 的 chunk 都附加到同一個檔案（不分 session），round_key（回合開始
+時間，見 round_key()）用來對應 round.csv 中的那一次回合。舊版 TRJ1 chunk 沒有 round_key。
+"""
+import datetime as dt
+import queue
+import struct
+import threading
+import zlib
+from array import array
+from typing import Callable, Optional
+
+COLUMNS = ("t_ms", "ball_x", "ball_y", "human_x", "human_y", "agent_x", "agent_y", "keys")
+N_COLS = len(COLUMNS)
+MAGIC = b"TRJ2"
+LEGACY_MAGIC = b"TRJ1"
+_HEADER = struct.Struct("<4sIHHIq")
+_LEGACY_HEADER = struct.Struct("<4sIHHI")
+DEFAULT_CAPACITY = 1024  # 約 17 秒 @ 60 FPS
+_EPOCH = dt.datetime(1970, 1, 1)
+
+
+def round_key(round_start_time: Optional[str]) -> int:
+    """回合開始時間（ISO，UTC）換成自 epoch 起的微秒數；無法解析時為 0。"""
+    try:
+        start = dt.datetime.fromisoformat(round_start_time.rstrip("Z"))
+    except (AttributeError, ValueError):
+        return 0
+    return (start - _EPOCH) // dt.timedelta(microseconds=1)
+
+
+def encode_chunk(values: array, round_id: int, chunk_index: int, key: int = 0) -> bytes:
+    n_rows = len(values) // N_COLS
+    deltas = array("i", values[:N_COLS])
+    deltas.extend(values[i] - values[i - N_COLS] for i in range(N_COLS, len(values)))
+    return _HEADER.pack(MAGIC, round_id, chunk_index, N_COLS, n_rows, key) + zlib.compress(deltas.tobytes(), 6)
+
+
+def chunk_header(data: bytes) -> dict:
+    """只解析 chunk header（不解壓縮）；TRJ1 chunk 的 round_key 為 None。"""
+    if data[:4] == LEGACY_MAGIC:
+        _, round_id, chunk_index, n_cols, n_rows = _LEGACY_HEADER.unpack_from(data)
+        key, size = None, _LEGACY_HEADER.size
+    else:
+        magic, round_id, chunk_index, n_cols, n_rows, key = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a trajectory chunk")
+        size = _HEADER.size
+    return {"round_id": round_id, "chunk_index": chunk_index, "n_cols": n_cols, "n_rows": n_rows, "round_key": key, "size": size}
+
+
+def decode_chunk(data: bytes) -> tuple[dict, array]:
+    """回傳 (header, 依列展開的 int 陣列)；列 r 欄 c 位於 r * 欄位數 + c。"""
+    header = chunk_header(data)
+    n_cols = header["n_cols"]
+    values = array("i")
+    values.frombytes(zlib.decompress(data[header["size"]:]))
+    for i in range(n_cols, len(values)):
+        values[i] += values[i - n_cols]
+    return header, values
+
+
+def iter_file_chunks(data: bytes):
+    """backend 存檔格式：每個 chunk 前綴 <I> 長度。"""
+    pos = 0
+    while pos + 4 <= len(data):
+        (length,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        yield data[pos:pos + length]
+        pos += length
+
+
+class TrajectoryRecorder:
+    def __init__(self, ship: Callable[[object, int, int, bytes], None], capacity: int = DEFAULT_CAPACITY) -> None:
+        """ship(context, round_id, chunk_index, data)：在背景執行緒呼叫，負責把 chunk 送出。"""
+        self.ship = ship
+        self.capacity = capacity
+        self.buf = array("i", bytes(4 * N_COLS * capacity))
+        self.pos = 0
+        self.context = None  # 由呼叫端決定（例如 user_id / condition），原樣傳給 ship
+        self.round_id = 0
+        self.round_key = 0
+        self.chunk_index = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+
+    def start_round(self, round_id: int, context=None, key: int = 0) -> None:
+        """key：round_key(回合開始時間)，寫進每個 chunk 的 header。"""
+        self.pos = 0
+        self.context = context
+        self.round_id = round_id
+        self.round_key = key
+        self.chunk_index = 0
+
+    def record(self, t_ms, ball_x, ball_y, human_x, human_y, agent_x, agent_y, keys) -> None:
+        buf = self.buf
+        p = self.pos
+        buf[p] = int(t_ms)
+        buf[p + 1] = int(ball_x)
+        buf[p + 2] = int(ball_y)
+        buf[p + 3] = int(human_x)
+        buf[p + 4] = int(human_y)
+        buf[p + 5] = int(agent_x)
+        buf[p + 6] = int(agent_y)
+        buf[p + 7] = keys
+        self.pos = p + N_COLS
+        if self.pos >= len(buf):
+            self.flush()
+
+    def flush(self) -> None:
+        """把目前累積的列交給背景執行緒（回合結束時也要呼叫）。"""
+        if self.pos == 0:
+            return
+        chunk = self.buf[:self.pos]  # array 切片在 C 層複製
+        self._queue.put((chunk, self.context, self.round_id, self.chunk_index, self.round_key))
+        self.chunk_index += 1
+        self.pos = 0
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="trajectory", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            chunk, context, round_id, chunk_index, key = item
+            try:
+                self.ship(context, round_id, chunk_index, encode_chunk(chunk, round_id, chunk_index, key))
+            except Exception as exc:
+                print(f"[trajectory] ship chunk {round_id}/{chunk_index} failed: {exc}")
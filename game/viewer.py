@@ -0,0 +1,493 @@
+"""回合回放檢視器：從 backend 存下的 events.csv（與軌跡檔）重現回合畫面，可跳轉與變速。
+
+與 replay.py 不同，這裡不需要錄製檔，也不重跑物理：畫面直接由紀錄資料還原。
+
+- 開啟時依 round.csv 的開始時間，在 events.csv 中二分搜尋每個回合的 byte 範圍
+  （沒有 round.csv 時才逐列掃描）；回合資料在第一次播放到時才解析。
+- 每個回合建立時間索引：跳到任一秒是對事件時間 / 軌跡 tick 做二分搜尋。事件時間取自
+  round_ms（遊戲時間，與軌跡同一時間軸），舊檔案沒有時才用 client_ns / timestamp。
+- 播放中 HUD（分數、失誤、碰撞）只處理新經過的事件；往回跳時用前綴累計值。
+- 有 trajectory/round_N.trj 時球與 paddle 位置逐 tick 精確；沒有時在事件之間線性內插（近似）。
+
+用法（於 game/ 目錄下）::
+
+    python viewer.py ../data/negotiation/7 --list
+    python viewer.py ../data/negotiation/7 --round 2 --start 30 --speed 4
+
+按鍵：SPACE 暫停、←/→ 跳 5 秒（加 SHIFT 為 1 秒）、↑/↓ 速度加倍 / 減半（0.25×–16×）、
+PAGE UP / PAGE DOWN 上一 / 下一回合、HOME 回到回合開頭、點進度條跳轉、ESC 離開。
+"""
+import argparse
+import bisect
+import csv
+import datetime as dt
+import io
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Optional
+
+import pygame as pg
+
+import main as game_main
+import trajectory
+from main import FPS, LIGHT_GRAY, ROUND_DURATION_MS, WHITE, Game, GameState, text_sprite
+
+SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16)
+SEEK_STEP_S = 5.0
+COLLISION_FLASH_MS = 300  # 與 Game.check_collisions 相同
+
+
+def parse_time(value: str) -> Optional[dt.datetime]:
+    try:
+        return dt.datetime.fromisoformat(value.rstrip("Z"))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_int(value, default=0) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class RoundSegment:
+    """一個實際進行過的回合：events.csv 中的 byte 範圍與 round.csv 的摘要。"""
+
+    def __init__(self, round_id: int, start: Optional[dt.datetime], summary: Optional[dict]) -> None:
+        self.round_id = round_id
+        self.start = start
+        self.summary = summary or {}
+        self.begin = None  # events.csv 的 byte offset
+        self.end = None
+        self.n_events = 0
+        self.occurrence = 0  # 同一 round_id 的第幾次（對應軌跡檔中的第幾組 chunk）
+
+
+class RoundData:
+    """已載入的回合：事件、時間索引、HUD 前綴累計與（可選的）軌跡。"""
+
+    def __init__(self, segment: RoundSegment, events: list[dict], traj: Optional[array]) -> None:
+        self.segment = segment
+        self.events = events
+        self.times = self._event_times(segment, events)
+        # 前綴累計：prefix[i] = 前 i 個事件之後的 (score, errors, collisions)
+        score = errors = collisions = 0
+        self.prefix = [(0, 0, 0)]
+        self.last_collision = [None]  # 前 i 個事件中最後一次 paddle 互撞的時間
+        prev = None
+        for ev, t in zip(events, self.times):
+            kind = ev["event_type"]
+            if kind == "ball_catch" and not self._duplicate_catch(prev, ev):
+                score += 1
+            elif kind == "ball_miss":
+                errors += 1
+            elif kind == "paddle_collision":
+                collisions += 1
+            self.prefix.append((score, errors, collisions))
+            self.last_collision.append(t if kind == "paddle_collision" else self.last_collision[-1])
+            prev = ev
+
+        self.traj = traj
+        self.traj_t = traj[0 :: trajectory.N_COLS] if traj is not None else None
+        duration = ROUND_DURATION_MS / 1000
+        if self.times:
+            duration = max(duration, self.times[-1])
+        self.duration = duration
+
+    @staticmethod
+    def _event_times(segment: RoundSegment, events: list[dict]) -> list[float]:
+        """每個事件的回合內秒數，都從回合開始算起（不是第一個被紀錄的事件）。
+
+        優先用 round_ms（遊戲時間，不含暫停，與軌跡的 t_ms 同一時間軸）；較舊的檔案依序改用
+        client_ns 相對於 round.csv 的 round_start_ns、timestamp 相對於回合開始時間。
+        """
+        round_ms = [parse_float(ev.get("round_ms")) for ev in events]
+        if events and None not in round_ms:
+            return [max(0.0, ms / 1000) for ms in round_ms]
+        start_ns = parse_int(segment.summary.get("round_start_ns"), None)
+        client_ns = [parse_int(ev.get("client_ns"), None) for ev in events]
+        if start_ns is not None and None not in client_ns:
+            return [max(0.0, (ns - start_ns) / 1e9) for ns in client_ns]
+        start = segment.start or (parse_time(events[0]["timestamp"]) if events else None)
+        return [max(0.0, (parse_time(ev["timestamp"]) - start).total_seconds()) if start else 0.0 for ev in events]
+
+    @staticmethod
+    def _duplicate_catch(prev: Optional[dict], ev: dict) -> bool:
+        """單球模式中人類與代理同一 tick 接到球時，代理那次不加分（見 Game.check_collisions）。"""
+        return (
+            prev is not None
+            and prev["event_type"] == "ball_catch"
+            and prev["triggered_by"] == "human"
+            and ev["triggered_by"] == "agent"
+            and ev.get("ball_id", "NA") == "NA"
+            and (prev["ball_x"], prev["ball_y"]) == (ev["ball_x"], ev["ball_y"])
+        )
+
+    def event_index(self, t: float) -> int:
+        """時間 t（秒）之前（含）已發生的事件數。"""
+        return bisect.bisect_right(self.times, t)
+
+    def positions(self, t: float) -> tuple:
+        """(ball_x, ball_y, human_x, human_y, agent_x, agent_y)，在兩筆資料間線性內插。"""
+        if self.traj_t is not None and len(self.traj_t):
+            t_ms = t * 1000
+            i = bisect.bisect_right(self.traj_t, t_ms)
+            n_cols = trajectory.N_COLS
+            rows = self.traj
+            if i == 0 or i >= len(self.traj_t):
+                r = min(i, len(self.traj_t) - 1) * n_cols
+                return tuple(rows[r + 1 : r + 7])
+            a, b = (i - 1) * n_cols, i * n_cols
+            span = rows[b] - rows[a]
+            u = (t_ms - rows[a]) / span if span else 0.0
+            return tuple(rows[a + c] + (rows[b + c] - rows[a + c]) * u for c in range(1, 7))
+
+        if not self.events:
+            return None
+        fields = ("ball_x", "ball_y", "human_x", "human_y", "agent_x", "agent_y")
+        i = self.event_index(t)
+        if i == 0 or i >= len(self.events):
+            ev = self.events[min(i, len(self.events) - 1)]
+            return tuple(parse_int(ev[f]) for f in fields)
+        ea, eb = self.events[i - 1], self.events[i]
+        ta, tb = self.times[i - 1], self.times[i]
+        u = (t - ta) / (tb - ta) if tb > ta else 0.0
+        if eb["event_type"] in ("ball_spawn", "ball_miss"):
+            u = 0.0  # 重生前後的球位置不能內插
+        return tuple(parse_int(ea[f]) + (parse_int(eb[f]) - parse_int(ea[f])) * u for f in fields)
+
+
+class SessionIndex:
+    """一位受試者 / condition 資料夾（data/<condition>/<user_id>/）的回合索引。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.events_path = self.path / "events.csv"
+        self.segments: list[RoundSegment] = []
+        self._loaded: dict[int, RoundData] = {}
+        self.fieldnames: list[str] = []
+        t0 = time.perf_counter()
+        self._index_rounds()
+        self.index_ms = (time.perf_counter() - t0) * 1000
+
+    def _index_rounds(self) -> None:
+        round_file = self.path / "round.csv"
+        if round_file.exists():
+            with round_file.open(newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    seg = RoundSegment(parse_int(row.get("round_id")), parse_time(row.get("round_start_time")), row)
+                    self.segments.append(seg)
+        if not self.events_path.exists():
+            return
+
+        with self.events_path.open("rb") as f:
+            self.fieldnames = next(csv.reader([f.readline().decode("utf-8")]))
+            data_start = f.tell()
+            size = self.events_path.stat().st_size
+            ts_col = self.fieldnames.index("timestamp")
+            if self.segments and all(seg.start for seg in self.segments):
+                # 事件依時間附加：每個回合的起點以二分搜尋找到，不必讀整個檔案
+                keys = [seg.summary["round_start_time"].encode("ascii") for seg in self.segments]
+                offsets = [self._find_offset(f, data_start, size, ts_col, key) for key in keys]
+                offsets[0] = data_start
+                for seg, begin, end in zip(self.segments, offsets, offsets[1:] + [size]):
+                    if end > begin:
+                        seg.begin, seg.end = begin, end
+                        seg.n_events = None  # 需要時才計算（count_events）
+            else:
+                self._scan_rounds(f, data_start)
+
+        seen: dict[int, int] = {}
+        for seg in self.segments:
+            seg.occurrence = seen.get(seg.round_id, 0)
+            seen[seg.round_id] = seg.occurrence + 1
+
+    @staticmethod
+    def _find_offset(f, lo: int, hi: int, ts_col: int, key: bytes) -> int:
+        """第一筆 timestamp >= key 的列的 byte offset（ISO 時間字串可直接比較大小）。"""
+
+        def ts_at(pos: int):
+            f.seek(pos)
+            if pos > lo:
+                f.readline()  # 略過被切斷的那一列
+            start = f.tell()
+            line = f.readline()
+            return start, (line.split(b",", ts_col + 1)[ts_col] if line else None)
+
+        while hi - lo > 4096:
+            mid = (lo + hi) // 2
+            start, ts = ts_at(mid)
+            if ts is None or ts >= key:
+                hi = mid
+            else:
+                lo = start
+        # 剩下的小範圍逐列找
+        f.seek(lo)
+        pos = lo
+        for line in f:
+            if line.split(b",", ts_col + 1)[ts_col] >= key:
+                return pos
+            pos += len(line)
+        return pos
+
+    def _scan_rounds(self, f, offset: int) -> None:
+        """沒有 round.csv（或缺開始時間）時：逐列掃描，以 round_id 變化切分回合。"""
+        self.segments = []
+        round_col = self.fieldnames.index("round_id")
+        last_round = None
+        seg = None
+        for line in f:
+            round_id = parse_int(line.split(b",", round_col + 1)[round_col])
+            if round_id != last_round:
+                seg = RoundSegment(round_id, None, None)
+                seg.begin = offset
+                seg.n_events = 0
+                self.segments.append(seg)
+                last_round = round_id
+            offset += len(line)
+            seg.end = offset
+            seg.n_events += 1
+
+    def count_events(self, seg: RoundSegment) -> int:
+        if seg.n_events is None:
+            n = 0
+            with self.events_path.open("rb") as f:
+                f.seek(seg.begin)
+                remaining = seg.end - seg.begin
+                while remaining > 0:
+                    block = f.read(min(remaining, 1 << 20))
+                    n += block.count(b"\n")
+                    remaining -= len(block)
+            seg.n_events = n
+        return seg.n_events
+
+    def load(self, i: int) -> RoundData:
+        """第一次播放到第 i 個回合時才讀取與解析。"""
+        data = self._loaded.get(i)
+        if data is not None:
+            return data
+        seg = self.segments[i]
+        events = []
+        if seg.begin is not None:
+            with self.events_path.open("rb") as f:
+                f.seek(seg.begin)
+                raw = f.read(seg.end - seg.begin).decode("utf-8")
+            events = list(csv.DictReader(io.StringIO(raw, newline=""), fieldnames=self.fieldnames))
+        data = RoundData(seg, events, self._load_trajectory(seg))
+        self._loaded[i] = data
+        return data
+
+    def _load_trajectory(self, seg: RoundSegment) -> Optional[array]:
+        """軌跡檔依 round_id 存放（所有 session 共用一個檔案）。
+
+        chunk 帶 round_key 時只取與 round.csv 回合開始時間相同的；舊版沒有 round_key 的 chunk
+        只能依出現順序對應：每次進行該回合從 chunk 0 開始，取第 occurrence 組（前面的 session
+        沒錄軌跡時會對錯）。
+        """
+        path = self.path / "trajectory" / f"round_{seg.round_id}.trj"
+        if not path.exists():
+            return None
+        key = trajectory.round_key(seg.summary.get("round_start_time"))
+        matched = array("i")
+        legacy = array("i")
+        group = -1
+        for chunk in trajectory.iter_file_chunks(path.read_bytes()):
+            header = trajectory.chunk_header(chunk)
+            if header["round_key"] is not None:
+                if key and header["round_key"] == key:
+                    matched.extend(trajectory.decode_chunk(chunk)[1])
+                continue
+            if header["chunk_index"] == 0:
+                group += 1
+            if group == seg.occurrence:
+                legacy.extend(trajectory.decode_chunk(chunk)[1])
+        values = matched or legacy
+        return values if values else None
+
+
+class ViewerGame(Game):
+    """借用 Game 的回合畫面，加上播放資訊與進度條。"""
+
+    def __init__(self, viewer, **kwargs) -> None:
+        self.viewer = viewer
+        super().__init__(api=None, idle=False, **kwargs)
+        self.state = GameState.ROUND
+
+    def round_items(self) -> list:
+        items = [item for item in super().round_items() if not item[0].startswith(("pause_", "home_"))]
+        v = self.viewer
+        status = f"{'paused' if v.paused else 'playing'}  {v.speed:g}x  t={v.t:6.1f}s / {v.data.duration:.0f}s"
+        items.append(("viewer_status",) + text_sprite(status, self.font_small, WHITE, (20, 20)))
+        if v.last_event:
+            items.append(("viewer_event",) + text_sprite(v.last_event, self.font_small, LIGHT_GRAY, (20, 45)))
+        bar = v.bar_rect()
+        items.append(("viewer_bar", game_main.SPRITES.rounded_rect(bar.w, bar.h, game_main.GRAY, 3), bar))
+        knob_x = bar.x + int(bar.w * min(1.0, v.t / v.data.duration))
+        knob = pg.Rect(knob_x - 4, bar.y - 4, 8, bar.h + 8)
+        items.append(("viewer_knob", game_main.SPRITES.rounded_rect(knob.w, knob.h, WHITE, 3), knob))
+        return items
+
+
+class ReplayViewer:
+    def __init__(self, index: SessionIndex, round_index: int = 0, speed: float = 1.0, dirty_rects: bool = False) -> None:
+        self.index = index
+        self.speed = speed
+        self.paused = False
+        self.t = 0.0
+        self._cursor = 0  # 已套用到 HUD 的事件數
+        self.last_event = ""
+        self.game = ViewerGame(self, dirty_rects=dirty_rects)
+        self.open_round(round_index)
+
+    def open_round(self, i: int, t: float = 0.0) -> None:
+        self.round_index = max(0, min(len(self.index.segments) - 1, i))
+        self.data = self.index.load(self.round_index)
+        seg = self.data.segment
+        game = self.game
+        game.current_round = seg.round_id
+        game.total_rounds = max(s.round_id for s in self.index.segments)
+        first = self.data.events[0] if self.data.events else {}
+        game.current_user_id = first.get("user_id", self.index.path.name)
+        game.condition_code = parse_int(first.get("condition"), None)
+        self.seek(t)
+
+    def seek(self, t: float) -> None:
+        self.t = max(0.0, min(self.data.duration, t))
+        self._cursor = self.data.event_index(self.t)
+        self.apply()
+
+    def advance(self, dt_s: float) -> None:
+        if self.paused:
+            return
+        self.t = min(self.data.duration, self.t + dt_s * self.speed)
+        if self.t >= self.data.duration:
+            if self.round_index + 1 < len(self.index.segments):
+                self.open_round(self.round_index + 1)
+            else:
+                self.paused = True
+            return
+        # 只處理新經過的事件（前綴值已算好，這裡只移動游標）
+        times, i = self.data.times, self._cursor
+        while i < len(times) and times[i] <= self.t:
+            i += 1
+        self._cursor = i
+        self.apply()
+
+    def apply(self) -> None:
+        game, data, i = self.game, self.data, self._cursor
+        game.round_score, game.round_errors, _ = data.prefix[i]
+        game.round_elapsed_ms = self.t * 1000
+        last = data.last_collision[i]
+        game.conflict_flash_ms = max(0.0, COLLISION_FLASH_MS - (self.t - last) * 1000) if last is not None else 0
+        pos = data.positions(self.t)
+        if pos is not None:
+            game.ball_x, game.ball_y, game.human_x, game.human_y, game.agent_x, game.agent_y = pos
+        if i:
+            ev = data.events[i - 1]
+            self.last_event = f"{data.times[i - 1]:.1f}s {ev['event_type']} ({ev['triggered_by']})"
+        else:
+            self.last_event = ""
+
+    def bar_rect(self) -> pg.Rect:
+        return pg.Rect(20, game_main.HEIGHT - 60, game_main.WIDTH - 40, 8)
+
+    def set_speed(self, step: int) -> None:
+        i = SPEEDS.index(self.speed) if self.speed in SPEEDS else SPEEDS.index(1)
+        self.speed = SPEEDS[max(0, min(len(SPEEDS) - 1, i + step))]
+
+    def handle_event(self, event) -> bool:
+        """回傳 False 表示離開。"""
+        if event.type == pg.QUIT:
+            return False
+        if event.type == pg.VIDEORESIZE:
+            self.game._resize_pending = True
+        elif event.type == pg.KEYDOWN:
+            step = 1.0 if event.mod & pg.KMOD_SHIFT else SEEK_STEP_S
+            if event.key == pg.K_ESCAPE:
+                return False
+            elif event.key == pg.K_SPACE:
+                self.paused = not self.paused
+            elif event.key == pg.K_RIGHT:
+                self.seek(self.t + step)
+            elif event.key == pg.K_LEFT:
+                self.seek(self.t - step)
+            elif event.key == pg.K_UP:
+                self.set_speed(1)
+            elif event.key == pg.K_DOWN:
+                self.set_speed(-1)
+            elif event.key == pg.K_PAGEDOWN:
+                self.open_round(self.round_index + 1)
+            elif event.key == pg.K_PAGEUP:
+                self.open_round(self.round_index - 1)
+            elif event.key == pg.K_HOME:
+                self.seek(0.0)
+            elif event.key == pg.K_F3:
+                self.game.show_profiler = not self.game.show_profiler
+        elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+            x, y = self.game.to_logical(event.pos)
+            bar = self.bar_rect().inflate(0, 20)
+            if bar.collidepoint(x, y):
+                self.seek((x - bar.x) / bar.w * self.data.duration)
+        return True
+
+    def run(self) -> None:
+        game = self.game
+        clock = pg.time.Clock()
+        running = True
+        while running:
+            dt_s = clock.tick(FPS) / 1000.0
+            game.profiler.begin_frame()
+            for event in pg.event.get():
+                running = self.handle_event(event) and running
+            self.advance(dt_s)
+            game.draw()
+            game.profiler.end_frame()
+        pg.quit()
+
+
+def print_rounds(index: SessionIndex) -> None:
+    print(f"{index.path}: {len(index.segments)} rounds, indexed in {index.index_ms:.1f} ms")
+    for i, seg in enumerate(index.segments):
+        s = seg.summary
+        start = seg.start.isoformat(timespec="seconds") if seg.start else "?"
+        print(
+            f"  [{i}] round {seg.round_id} start={start} events={index.count_events(seg) if seg.begin is not None else 0} "
+            f"score={s.get('score', '?')} errors={s.get('errors', '?')}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a logged round from events.csv with seek and variable speed.")
+    parser.add_argument("session_dir", type=Path, help="data/<condition>/<user_id> folder written by the backend")
+    parser.add_argument("--list", action="store_true", help="list indexed rounds and exit")
+    parser.add_argument("--round", type=int, default=None, help="index from --list (default: first round)")
+    parser.add_argument("--start", type=float, default=0.0, help="start at this second of the round")
+    parser.add_argument("--speed", type=float, default=1.0, choices=SPEEDS)
+    parser.add_argument("--dirty-rects", action="store_true", help="redraw only changed regions")
+    args = parser.parse_args(argv)
+
+    index = SessionIndex(args.session_dir)
+    if not index.segments:
+        print(f"No rounds found in {args.session_dir}")
+        return 1
+    if args.list:
+        print_rounds(index)
+        return 0
+    viewer = ReplayViewer(index, round_index=args.round or 0, speed=args.speed, dirty_rects=args.dirty_rects)
+    viewer.seek(args.start)
+    viewer.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
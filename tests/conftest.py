@@ -0,0 +1,26 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# game/ 的模組彼此以頂層名稱 import（與在 game/ 目錄下執行時相同）
+sys.path.insert(0, str(ROOT / "game"))
+
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    """載入 backend/main.py（不是套件，以檔案路徑載入）；資料寫到暫存目錄。"""
+    data_dir = ROOT / "data"
+    had_data_dir = data_dir.exists()
+    spec = importlib.util.spec_from_file_location("backend_main", ROOT / "backend" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # pydantic 解析 forward reference 時要找得到模組
+    spec.loader.exec_module(module)
+    module.DATA_DIR = tmp_path_factory.mktemp("data")
+    yield module
+    sys.modules.pop(spec.name, None)
+    if not had_data_dir:
+        data_dir.rmdir()  # import 時建立的空目錄
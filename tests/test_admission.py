@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def make(backend):
+    def make(**kwargs):
+        return backend.AdmissionControl(**{"slots": 2, "bulk_slots": 1, "max_wait_s": 5.0, **kwargs})
+
+    return make
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_bulk_limit_keeps_slot_for_lifecycle(make):
+    async def scenario():
+        adm = make()
+        assert await adm.acquire("bulk") is None
+        waiting = asyncio.create_task(adm.acquire("bulk"))
+        await settle()
+        assert not waiting.done()
+        assert await adm.acquire("lifecycle") is None
+        assert adm.in_use == {"lifecycle": 1, "bulk": 1}
+        adm.release("bulk", 0.005)
+        assert await waiting is None
+        assert adm.in_use == {"lifecycle": 1, "bulk": 1}
+
+    asyncio.run(scenario())
+
+
+def test_release_wakes_lifecycle_before_bulk(make):
+    async def scenario():
+        adm = make(slots=1)
+        order = []
+
+        async def request(cls):
+            assert await adm.acquire(cls) is None
+            order.append(cls)
+
+        assert await adm.acquire("bulk") is None
+        bulk = asyncio.create_task(request("bulk"))
+        await settle()
+        lifecycle = asyncio.create_task(request("lifecycle"))
+        await settle()
+        assert order == []
+        adm.release("bulk", 0.005)
+        await settle()
+        assert order == ["lifecycle"]
+        adm.release("lifecycle", 0.005)
+        await asyncio.gather(bulk, lifecycle)
+        assert order == ["lifecycle", "bulk"]
+        assert adm.stats()["queued"] == {"bulk": 1, "lifecycle": 1}
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejected_with_429(make):
+    async def scenario():
+        adm = make(queue_limits={"lifecycle": 1, "bulk": 1})
+        assert await adm.acquire("bulk") is None
+        waiting = asyncio.create_task(adm.acquire("bulk"))
+        await settle()
+        assert await adm.acquire("bulk") == 429
+        assert adm.stats()["rejected"] == {"bulk_429": 1}
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_wait_timeout_returns_503_and_leaves_queue(make):
+    async def scenario():
+        adm = make(max_wait_s=0.01)
+        assert await adm.acquire("bulk") is None
+        assert await adm.acquire("bulk") == 503
+        assert adm.stats()["waiting"] == {"lifecycle": 0, "bulk": 0}
+        assert adm.stats()["rejected"] == {"bulk_503": 1}
+        assert adm.retry_after("bulk") >= 1
+
+    asyncio.run(scenario())
+
+
+def test_client_disconnect_abandons_wait(backend, make):
+    async def scenario():
+        adm = make()
+        gone = asyncio.Event()
+        assert await adm.acquire("bulk") is None
+        waiting = asyncio.create_task(adm.acquire("bulk", gone.wait))
+        await settle()
+        gone.set()
+        assert await waiting == backend.CLIENT_CLOSED
+        assert adm.stats()["abandoned"] == {"bulk": 1}
+        assert adm.stats()["waiting"]["bulk"] == 0
+        assert adm.in_use["bulk"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_after_grant_returns_slot(backend, make):
+    async def scenario():
+        adm = make()
+        gone = asyncio.Event()
+        assert await adm.acquire("bulk") is None
+        waiting = asyncio.create_task(adm.acquire("bulk", gone.wait))
+        await settle()
+        adm.release("bulk", 0.005)  # 名額分配給等待者
+        gone.set()  # 同一輪 client 也斷線
+        assert await waiting == backend.CLIENT_CLOSED
+        assert adm.in_use["bulk"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue(make):
+    async def scenario():
+        adm = make()
+        assert await adm.acquire("bulk") is None
+        waiting = asyncio.create_task(adm.acquire("bulk"))
+        await settle()
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert adm.stats()["waiting"]["bulk"] == 0
+        adm.release("bulk", 0.005)
+        assert adm.in_use["bulk"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_grant_returns_slot(make):
+    async def scenario():
+        adm = make()
+        assert await adm.acquire("bulk") is None
+        waiting = asyncio.create_task(adm.acquire("bulk"))
+        await settle()
+        adm.release("bulk", 0.005)
+        assert adm.in_use["bulk"] == 1  # 已分配給等待者，但它還沒執行
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert adm.in_use["bulk"] == 0
+
+    asyncio.run(scenario())
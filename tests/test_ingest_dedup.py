@@ -0,0 +1,91 @@
+import pytest
+
+import api_client
+
+KEY = (7, 1, "client-a")
+
+
+@pytest.fixture
+def dedup(backend):
+    return backend.IngestDedup(window=64, max_streams=4)
+
+
+def claims(dedup, seqs, endpoint="/log_event", key=KEY):
+    return [dedup.claim(endpoint, key, seq) for seq in seqs]
+
+
+def test_duplicates_rejected_in_order_and_out_of_order(dedup):
+    assert claims(dedup, [1, 2, 3, 5, 4]) == [True] * 5
+    assert claims(dedup, [1, 3, 4, 5]) == [False] * 4
+    assert dedup.stats()["duplicates"] == 4
+    assert dedup.stats()["duplicates_by_endpoint"] == {"/log_event": 4}
+
+
+def test_seq_older_than_window_is_written(dedup):
+    assert claims(dedup, [100, 37]) == [True, True]
+    assert claims(dedup, [37]) == [False]  # 仍在視窗內（100 - 37 < 64）
+    assert claims(dedup, [36, 36]) == [True, True]  # 視窗外無法判斷，照常寫入
+    assert dedup.stats()["outside_window"] == 2
+
+
+def test_streams_are_per_endpoint_and_client(dedup):
+    assert claims(dedup, [1, 2]) == [True, True]
+    assert claims(dedup, [1, 2], endpoint="/start_round") == [True, True]
+    assert claims(dedup, [1], key=(7, 1, "client-b")) == [True]
+    assert claims(dedup, [2], endpoint="/start_round") == [False]
+
+
+def test_lagging_lane_stays_inside_its_own_window(dedup):
+    # bulk 佇列補送大量事件時，lifecycle 串流不受影響
+    claims(dedup, range(1, 1000))
+    assert claims(dedup, [1, 2, 3], endpoint="/start_round") == [True, True, True]
+    assert claims(dedup, [2], endpoint="/start_round") == [False]
+
+
+def test_untracked_requests_always_accepted(dedup):
+    assert claims(dedup, [None, None]) == [True, True]
+    assert claims(dedup, [1, 1], key=(7, 1, None)) == [True, True]
+    assert dedup.stats()["untracked"] == 4
+
+
+def test_oversized_jump_is_quarantined(dedup):
+    assert claims(dedup, [1, 2, 3, 10**30]) == [True] * 4
+    assert dedup.stats()["jumps"] == 1
+    # 串流沒有被推走：之後正常的 seq 照常去重
+    assert claims(dedup, [4, 5, 5, 3]) == [True, True, False, False]
+    assert claims(dedup, [10**30]) == [False]
+
+
+def test_second_seq_near_jump_adopts_it(dedup):
+    assert claims(dedup, [1, 2, 1000]) == [True, True, True]
+    assert claims(dedup, [1001]) == [True]
+    assert claims(dedup, [1000, 1001]) == [False, False]
+    assert claims(dedup, [1002, 999]) == [True, True]
+    assert claims(dedup, [2]) == [True]  # 舊區段已移出視窗
+    assert dedup.stats()["outside_window"] == 1
+
+
+def test_release_allows_retry(dedup):
+    assert claims(dedup, [1, 2]) == [True, True]
+    dedup.release("/log_event", KEY, 1)
+    assert claims(dedup, [1, 2]) == [True, False]
+
+
+def test_release_clears_quarantined_seq(dedup):
+    assert claims(dedup, [1, 500]) == [True, True]
+    dedup.release("/log_event", KEY, 500)
+    assert claims(dedup, [500]) == [True]
+
+
+def test_least_recently_used_stream_evicted(dedup):
+    for client in "abcd":
+        claims(dedup, [1], key=(7, 1, client))
+    claims(dedup, [2], key=(7, 1, "a"))  # a 最近用過，b 最久沒用
+    claims(dedup, [1], key=(7, 1, "e"))
+    assert dedup.stats()["streams"] == 4
+    assert claims(dedup, [1], key=(7, 1, "b")) == [True]
+    assert claims(dedup, [1], key=(7, 1, "a")) == [False]
+
+
+def test_default_window_covers_client_outbox(backend):
+    assert backend.IngestDedup().window >= api_client.OUTBOX_SIZE
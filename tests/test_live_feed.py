@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def feed(backend):
+    return backend.LiveFeed(size=4)
+
+
+def publish(feed, n):
+    for i in range(n):
+        feed.publish(1, 7, "event", {"i": i})
+
+
+def ids(items):
+    return [item[0] for item in items]
+
+
+def test_read_returns_items_after_id(feed):
+    publish(feed, 3)
+    items, missed = feed.read(1, asyncio.Event())
+    assert ids(items) == [2, 3]
+    assert missed == 0
+    assert items[0][1:] == ((1, 7), "event", {"i": 1})
+
+
+def test_overwritten_items_reported_as_gap(feed):
+    publish(feed, 10)
+    items, missed = feed.read(2, asyncio.Event())
+    assert ids(items) == [7, 8, 9, 10]
+    assert missed == 4  # 3..6 已被覆蓋
+
+
+def test_resume_from_last_seen_id(feed):
+    publish(feed, 10)
+    items, missed = feed.read(8, asyncio.Event())
+    assert ids(items) == [9, 10]
+    assert missed == 0
+    publish(feed, 2)
+    items, missed = feed.read(10, asyncio.Event())
+    assert ids(items) == [11, 12]
+    assert missed == 0
+
+
+def test_reader_waits_and_is_woken_by_publish(feed):
+    async def scenario():
+        publish(feed, 2)
+        event = asyncio.Event()
+        assert feed.read(feed.last_id(), event) == ([], 0)
+        assert not event.is_set()
+        publish(feed, 1)
+        await asyncio.wait_for(event.wait(), 1.0)
+        items, missed = feed.read(2, event)
+        assert ids(items) == [3]
+        assert missed == 0
+
+    asyncio.run(scenario())
+
+
+def test_unsubscribe_drops_waiter(feed):
+    async def scenario():
+        event = asyncio.Event()
+        feed.read(0, event)
+        assert event in feed._waiters
+        feed.unsubscribe(event)
+        publish(feed, 1)
+        await asyncio.sleep(0)
+        assert not event.is_set()
+
+    asyncio.run(scenario())
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+import netcode
+
+
+@pytest.mark.parametrize(
+    "value",
+    [0, 1, -1, 63, -64, 64, -65, 127, 128, 300, -300, 2**31 - 1, -(2**31), 2**62, -(2**63)],
+)
+def test_varint_round_trip(value):
+    out = bytearray()
+    netcode._put_varint(out, value)
+    assert netcode._get_varint(bytes(out), 0) == (value, len(out))
+
+
+def test_varint_zigzag_keeps_small_values_short():
+    for value in range(-64, 64):
+        out = bytearray()
+        netcode._put_varint(out, value)
+        assert len(out) == 1
+
+
+def test_varint_sequence_advances_position():
+    values = [5, -70000, 0, 123456789]
+    out = bytearray()
+    for value in values:
+        netcode._put_varint(out, value)
+    pos, decoded = 0, []
+    for _ in values:
+        value, pos = netcode._get_varint(bytes(out), pos)
+        decoded.append(value)
+    assert decoded == values
+    assert pos == len(out)
+
+
+def random_values(rng):
+    return [rng.randint(-(2**20), 2**20) for _ in netcode.FIELDS]
+
+
+def test_full_snapshot_round_trip():
+    values = random_values(random.Random(1))
+    data = netcode.encode_snapshot(7, values, 3, None, last_seq=42, echo_us=1000, hold_us=250)
+    snap = netcode.decode_snapshot(data, {})
+    assert snap == {"id": 7, "last_seq": 42, "echo_us": 1000, "hold_us": 250, "values": values}
+
+
+def test_delta_snapshot_round_trip():
+    rng = random.Random(2)
+    history = {}
+    base_id, base = 0, None
+    for snap_id in range(1, 50):
+        values = list(base) if base is not None else random_values(rng)
+        for i in rng.sample(range(len(values)), rng.randint(0, 4)):
+            values[i] += rng.randint(-500, 500)
+        data = netcode.encode_snapshot(snap_id, values, base_id, base, 0, 0, 0)
+        snap = netcode.decode_snapshot(data, history)
+        assert snap["values"] == values
+        history[snap_id] = snap["values"]
+        base_id, base = snap_id, values
+
+
+def test_unchanged_delta_has_no_body():
+    values = random_values(random.Random(3))
+    data = netcode.encode_snapshot(2, values, 1, values, 0, 0, 0)
+    assert len(data) == netcode._SNAPSHOT.size + netcode._MASK.size
+    assert netcode.decode_snapshot(data, {1: values})["values"] == values
+
+
+def test_delta_with_missing_base_is_dropped():
+    values = random_values(random.Random(4))
+    data = netcode.encode_snapshot(9, values, 8, [0] * len(values), 0, 0, 0)
+    assert netcode.decode_snapshot(data, {}) is None
+
+
+def test_input_round_trip_keeps_latest_inputs():
+    inputs = [(seq, seq % 16) for seq in range(1, 20)]
+    data = netcode.encode_input(5, 123, 4567, 89, 1.25, inputs)
+    decoded = netcode.decode_input(data)
+    assert decoded["ack"] == 5
+    assert decoded["client_us"] == 123
+    assert decoded["rtt_us"] == 4567
+    assert decoded["jitter_us"] == 89
+    assert decoded["pred_err"] == 1.25
+    assert decoded["inputs"] == inputs[-netcode.INPUT_REDUNDANCY :]